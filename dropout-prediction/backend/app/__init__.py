@@ -0,0 +1,4 @@
+import time
+
+# จุดเริ่มนับเวลา startup (ดู core/startup.py)
+IMPORT_STARTED = time.perf_counter()
@@ -1,7 +1,12 @@
 ﻿from fastapi import APIRouter
-from .endpoints import health, prediction, batch
+from .endpoints import health, prediction, batch, jobs, stats, models, students, analytics
 
 router = APIRouter()
 router.include_router(health.router, tags=["Health"])
 router.include_router(prediction.router, tags=["Prediction"])
 router.include_router(batch.router, tags=["Batch"])
+router.include_router(jobs.router, tags=["Batch Jobs"])
+router.include_router(students.router, tags=["Students"])
+router.include_router(analytics.router, tags=["Analytics"])
+router.include_router(stats.router, tags=["Monitoring"])
+router.include_router(models.router, tags=["Models"])
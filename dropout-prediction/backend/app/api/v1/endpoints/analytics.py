@@ -0,0 +1,47 @@
+import asyncio
+from fastapi import APIRouter, HTTPException, Query
+from typing import Any, Dict, List, Literal, Optional
+from ....core.students import student_service
+
+router = APIRouter()
+
+Dimension = Literal["faculty", "gender", "num_terms", "risk_level"]
+
+
+def _filters(faculty: Optional[str], gender: Optional[str], num_terms: Optional[int],
+             risk_level: Optional[str]) -> Dict[str, Any]:
+    return {"faculty": faculty, "gender": gender, "num_terms": num_terms, "risk_level": risk_level}
+
+
+@router.get("/analytics/cohort")
+async def cohort(group_by: List[Dimension] = Query([]),
+                 faculty: Optional[str] = None,
+                 gender: Optional[str] = None,
+                 num_terms: Optional[int] = None,
+                 risk_level: Optional[Literal["Low", "Medium", "High"]] = None) -> Dict[str, Any]:
+    """สรุปความเสี่ยงของนักศึกษาใน /students แยกตามกลุ่ม (เช่น ?group_by=faculty&group_by=risk_level)
+    แต่ละกลุ่มมีจำนวน ค่าเฉลี่ยความน่าจะเป็น/GPAX จำนวนตามระดับความเสี่ยง และ histogram ความน่าจะเป็น
+    """
+    # อ่านตารางสรุปใน SQLite อย่างเดียว ไม่ใช้ inference pool (ไม่แย่งที่ของการทำนาย)
+    try:
+        return await asyncio.to_thread(
+            student_service.cohort, list(dict.fromkeys(group_by)),
+            _filters(faculty, gender, num_terms, risk_level),
+        )
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+
+@router.get("/analytics/trends")
+async def trends(group_by: List[Dimension] = Query([]),
+                 faculty: Optional[str] = None,
+                 gender: Optional[str] = None,
+                 risk_level: Optional[Literal["Low", "Medium", "High"]] = None) -> Dict[str, Any]:
+    """ความเสี่ยงตามจำนวนเทอมที่มีเกรด (หนึ่ง series ต่อกลุ่มของ group_by เช่น ?group_by=faculty)"""
+    try:
+        return await asyncio.to_thread(
+            student_service.trends, list(dict.fromkeys(group_by)),
+            _filters(faculty, gender, None, risk_level),
+        )
+    except ValueError as e:
+        raise HTTPException(400, str(e))
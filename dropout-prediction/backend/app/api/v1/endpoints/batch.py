@@ -1,99 +1,176 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from typing import List, Dict, Any
-import pandas as pd
-import io
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from typing import TYPE_CHECKING, Dict, Any, List, Literal, Optional, Tuple
+from concurrent.futures.process import BrokenProcessPool
 from ....models.ml_model import predictor
 from ....utils.feature_engineering import FeatureEngineer
+from ....config import settings
+from ....core.batch_scoring import (
+    columns_to_rows, encode_csv, encode_ndjson, missing_columns, score_dataframe, score_dataframe_columns,
+)
+from ....core.executors import run_inference, run_parsing, run_stream_parsing
+from ....core.metrics import instrument_endpoint, stage_timer
+from ....core.ingestion import BATCH_COLUMNS, iter_upload_chunks, parse_batch_upload
+from ....core.score_memo import score_memo
+from ....core.result_formats import (
+    COLUMNAR_ENCODERS, RESULT_FORMATS, FormatUnavailable, dumps, ensure_available, negotiate_format,
+    result_labels,
+)
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 router = APIRouter()
 feature_engineer = FeatureEngineer()
 
 
-def _read_dataframe(upload: UploadFile) -> pd.DataFrame:
+async def read_dataframe(upload: UploadFile) -> "pd.DataFrame":
     filename = upload.filename or "uploaded"
-    content = upload.file.read()
+    content = await upload.read()
     try:
-        if filename.lower().endswith(".csv"):
-            return pd.read_csv(io.BytesIO(content))
-        elif filename.lower().endswith(".xlsx") or filename.lower().endswith(".xls"):
-            return pd.read_excel(io.BytesIO(content), engine="openpyxl")
-        else:
-            # try csv by default
-            return pd.read_csv(io.BytesIO(content))
+        with stage_timer("upload_parse"):
+            return await run_parsing(parse_batch_upload, filename, content)
+    except BrokenProcessPool:
+        raise HTTPException(503, "File parser unavailable, please retry")
     except Exception as e:
         raise HTTPException(400, f"Cannot parse file: {str(e)}")
 
 
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+ExplainMode = Literal["all", "high", "none"]
+ResultFormat = Literal["json", "columnar", "csv", "parquet", "arrow"]
+
+
+def _score_chunk(chunk: "pd.DataFrame", stream: str, first: bool, explain: Optional[str],
+                 incremental: bool) -> bytes:
+    memo = score_memo if incremental else None
+    results = score_dataframe(chunk, predictor, feature_engineer, explain=explain, memo=memo)
+    if stream == "csv":
+        return encode_csv(results, include_header=first)
+    return encode_ndjson(results)
+
+
+async def _stream_batch(upload: UploadFile, stream: str, explain: Optional[str],
+                        incremental: bool) -> StreamingResponse:
+    """
+    อ่านไฟล์ทีละ chunk (BATCH_CHUNK_SIZE แถว) ทำนาย แล้วส่งผลกลับทันทีทีละ chunk
+    หน่วยความจำขึ้นกับขนาด chunk ไม่ใช่ขนาดไฟล์
+    """
+    await upload.seek(0)
+    # ปิด generator ก่อนไฟล์อัปโหลดถูกปิด (ไม่งั้น reader ของ pandas จะถูกเก็บกวาดทีหลังและ error)
+    chunks = iter_upload_chunks(upload.file, upload.filename, settings.BATCH_CHUNK_SIZE, BATCH_COLUMNS)
+    try:
+        first_chunk = await run_stream_parsing(next, chunks, None)
+    except Exception as e:
+        chunks.close()
+        raise HTTPException(400, f"Cannot parse file: {str(e)}")
+
+    if first_chunk is not None:
+        missing = missing_columns(first_chunk)
+        if missing:
+            chunks.close()
+            raise HTTPException(400, f"Missing columns: {', '.join(missing)}")
+
+    async def body():
+        chunk = first_chunk
+        first = True
+        try:
+            while chunk is not None:
+                try:
+                    yield await run_inference(_score_chunk, chunk, stream, first, explain, incremental)
+                    chunk = await run_stream_parsing(next, chunks, None)
+                except Exception as e:
+                    # status code ถูกส่งไปแล้ว แจ้ง error เป็นบรรทัดสุดท้ายแทน
+                    if stream == "ndjson":
+                        yield encode_ndjson([{"error": f"Error processing file: {str(e)}"}])
+                    return
+                first = False
+            if first and stream == "csv":
+                yield encode_csv([], include_header=True)
+        finally:
+            chunks.close()
+
+    return StreamingResponse(body(), media_type=STREAM_MEDIA_TYPES[stream])
+
+
+def _score_columns(chunk: "pd.DataFrame", explain: Optional[str],
+                   incremental: bool) -> Tuple[Dict[str, List], Dict[str, int]]:
+    memo = score_memo if incremental else None
+    return score_dataframe_columns(chunk, predictor, feature_engineer, explain, memo)
+
+
+async def _score_in_chunks(df: "pd.DataFrame", explain: Optional[str],
+                           incremental: bool) -> Tuple[Dict[str, List], Dict[str, int]]:
+    """
+    ทำนายทีละ BATCH_CHUNK_SIZE แถว (หนึ่งงานของ inference pool ต่อ chunk เหมือน stream)
+    request ทีละคนจึงเข้า pool ได้ระหว่าง chunk ไม่ต้องรอจนไฟล์ใหญ่ทำนายเสร็จทั้งไฟล์
+    """
+    columns: Dict[str, List] = {}
+    counts = {"reused": 0, "recomputed": 0}
+    # ไฟล์ที่ไม่มีแถวข้อมูลก็ผ่าน score_dataframe_columns หนึ่งครั้ง (ได้คอลัมน์ว่างครบ)
+    for start in range(0, max(len(df), 1), settings.BATCH_CHUNK_SIZE):
+        chunk = df.iloc[start:start + settings.BATCH_CHUNK_SIZE]
+        chunk_columns, chunk_counts = await run_inference(_score_columns, chunk, explain, incremental)
+        for key, values in chunk_columns.items():
+            columns.setdefault(key, []).extend(values)
+        for key in counts:
+            counts[key] += chunk_counts[key]
+    return columns, counts
+
+
+def _encode_result(columns: Dict[str, List], counts: Dict[str, int], result_format: str) -> bytes:
+    """encode ผลลัพธ์ทั้งไฟล์เป็น format ที่เลือก (หลายหมื่นแถวใช้ CPU มาก จึงรันใน executor)"""
+    if result_format in COLUMNAR_ENCODERS:
+        return COLUMNAR_ENCODERS[result_format](columns, result_labels(predictor), counts)
+
+    results = columns_to_rows(columns, predictor, feature_engineer)
+    if result_format == "csv":
+        return encode_csv(results)
+    with stage_timer("serialization"):
+        return dumps({"count": len(results), **counts, "results": results})
+
+
 @router.post("/batch-predict")
-async def batch_predict(file: UploadFile = File(...)) -> Dict[str, Any]:
-    if not predictor.model_loaded:
+@instrument_endpoint
+async def batch_predict(request: Request,
+                        file: UploadFile = File(...),
+                        stream: Optional[Literal["ndjson", "csv"]] = None,
+                        explain: Optional[ExplainMode] = None,
+                        result_format: Optional[ResultFormat] = Query(None, alias="format"),
+                        incremental: bool = True) -> Dict[str, Any]:
+    """ทำนายแบบกลุ่มจากไฟล์ CSV/XLSX
+    stream=ndjson|csv: อ่านและส่งผลลัพธ์ทีละ chunk แทนการตอบ JSON ก้อนเดียว
+    explain=all|high|none: แถวที่คำนวณ top_features (ค่าเริ่มต้น = BATCH_EXPLAIN)
+    format=json|columnar|csv|parquet|arrow (หรือ Accept header): รูปแบบผลลัพธ์เมื่อไม่ได้ stream
+    incremental=false: คำนวณทุกแถวใหม่ (ค่าเริ่มต้นใช้ผลเดิมของ student_id ที่ข้อมูลไม่เปลี่ยน)
+    """
+    if not predictor.ready:
         raise HTTPException(503, "Model not loaded")
 
-    df = _read_dataframe(file)
+    if stream:
+        return await _stream_batch(file, stream, explain, incremental)
 
-    # Only required to column year4_term2, year5_term1/year5_term2 optional
-    required_cols = [
-        "faculty","gender","gpax","count_f",
-        "year1_term1","year1_term2","year2_term1","year2_term2",
-        "year3_term1","year3_term2","year4_term1","year4_term2"
-    ]
+    result_format = negotiate_format(result_format, request.headers.get("accept"))
+    try:
+        ensure_available(result_format)
+    except FormatUnavailable as e:
+        raise HTTPException(406, str(e))
+
+    df = await read_dataframe(file)
 
-    missing = [c for c in required_cols if c not in df.columns]
+    missing = missing_columns(df)
     if missing:
         raise HTTPException(400, f"Missing columns: {', '.join(missing)}")
 
-    # Support batch with and without year5_term1/year5_term2
-    has_y5_1 = "year5_term1" in df.columns
-    has_y5_2 = "year5_term2" in df.columns
-
-    results: List[Dict[str, Any]] = []
-    for idx, row in df.iterrows():
-        term_gpas = [
-            row.get("year1_term1"), row.get("year1_term2"),
-            row.get("year2_term1"), row.get("year2_term2"),
-            row.get("year3_term1"), row.get("year3_term2"),
-            row.get("year4_term1"), row.get("year4_term2")
-        ]
-        # Optionally add year5
-        if has_y5_1:
-            term_gpas.append(row.get("year5_term1"))
-        if has_y5_2:
-            term_gpas.append(row.get("year5_term2"))
-
-        # normalize NaNs to None
-        term_gpas = [None if pd.isna(v) else float(v) for v in term_gpas]
-
-        features = feature_engineer.create_model_features(
-            faculty=str(row.get("faculty")),
-            gender=str(row.get("gender")),
-            gpax=float(row.get("gpax")),
-            count_f=int(row.get("count_f")),
-            term_gpas=term_gpas
-        )
-
-        num_terms = len([g for g in term_gpas if g is not None])
-        pred, prob = predictor.predict(features, num_terms=num_terms)
-        risk, color = predictor.get_risk(prob)
-        explanations = feature_engineer.get_feature_explanation(features)
-        student_id = row.get("student_id") if "student_id" in df.columns else None
-        name = row.get("name") if "name" in df.columns else None
-
-        results.append({
-            "row_index": int(idx),
-            "student_id": None if pd.isna(student_id) else student_id,
-            "name": None if pd.isna(name) else name,
-            "prediction": int(pred),
-            "prediction_label": "Dropout" if pred == 1 else "Graduate",
-            "dropout_probability": float(prob),
-            "dropout_percentage": f"{prob*100:.1f}%",
-            "risk_level": risk,
-            "risk_color": color,
-            "feature_explanations": explanations,
-        })
-
-    return {
-        "count": len(results),
-        "results": results
-    }
-
-
+    columns, counts = await _score_in_chunks(df, explain, incremental)
+    # encode ไม่ใช่งาน inference: ใช้ stream parsing pool ไม่กันที่ของ request ทีละคน
+    content = await run_stream_parsing(_encode_result, columns, counts, result_format)
+    return Response(content, media_type=RESULT_FORMATS[result_format], headers={
+        "X-Rows-Reused": str(counts["reused"]),
+        "X-Rows-Recomputed": str(counts["recomputed"]),
+    })
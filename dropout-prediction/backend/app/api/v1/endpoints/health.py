@@ -8,11 +8,18 @@ router = APIRouter()
 async def health():
     loaded_terms = {k: v is not None for k, v in predictor.models.items()}
     loaded_count = sum(1 for v in loaded_terms.values() if v)
+    fallback_terms = {k: k in predictor.logistic for k in loaded_terms}
+    if predictor.model_loaded:
+        status = "healthy"
+    else:
+        # ไม่มี tree model แต่ยังตอบได้ด้วย logistic fallback
+        status = "degraded" if predictor.ready else "unhealthy"
     return HealthResponse(
-        status="healthy" if predictor.model_loaded else "unhealthy",
+        status=status,
         model_loaded=predictor.model_loaded,
         loaded_terms=loaded_terms,
-        loaded_count=loaded_count
+        loaded_count=loaded_count,
+        fallback_terms=fallback_terms
     )
 
 @router.options("/health")
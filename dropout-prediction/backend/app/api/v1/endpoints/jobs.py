@@ -0,0 +1,91 @@
+import asyncio
+from datetime import datetime
+from fastapi import APIRouter, File, HTTPException, UploadFile
+from fastapi.responses import Response, StreamingResponse
+from typing import Dict
+from ....core.executors import run_stream_parsing
+from ....core.jobs import InvalidJobInput, JobQueueFull, JobRunning, job_manager
+from ....models.ml_model import predictor
+from ....models.schemas import BatchJobStatus
+
+router = APIRouter()
+
+
+def _to_status(job: Dict) -> BatchJobStatus:
+    total = job["total_rows"]
+    progress = job["rows_done"] / total if total else (1.0 if job["status"] == "completed" else 0.0)
+    return BatchJobStatus(
+        job_id=job["id"],
+        filename=job["filename"],
+        status=job["status"],
+        total_rows=total,
+        rows_done=job["rows_done"],
+        progress=round(progress, 4),
+        error=job["error"],
+        created_at=datetime.fromtimestamp(job["created_at"]),
+        updated_at=datetime.fromtimestamp(job["updated_at"]),
+        finished_at=datetime.fromtimestamp(job["finished_at"]) if job["finished_at"] else None,
+    )
+
+
+def _get_job(job_id: str) -> Dict:
+    job = job_manager.store.get(job_id)
+    if job is None:
+        raise HTTPException(404, f"Batch job {job_id} not found")
+    return job
+
+
+@router.post("/batch-jobs", response_model=BatchJobStatus, status_code=202)
+async def create_batch_job(file: UploadFile = File(...)):
+    """สร้าง batch job จากไฟล์ CSV/XLSX แล้วตอบกลับทันทีพร้อม job id (ไฟล์ที่ขาดคอลัมน์ตอบ 400 ทันที)"""
+    if not predictor.ready:
+        raise HTTPException(503, "Model not loaded")
+    await file.seek(0)
+    try:
+        job = await run_stream_parsing(job_manager.submit, file.filename or "uploaded.csv", file.file)
+    except InvalidJobInput as e:
+        raise HTTPException(400, str(e))
+    except JobQueueFull as e:
+        raise HTTPException(429, str(e))
+    return _to_status(job)
+
+
+@router.get("/batch-jobs/{job_id}", response_model=BatchJobStatus)
+async def get_batch_job(job_id: str):
+    """สถานะและความคืบหน้า (จำนวนแถวที่ทำนายแล้ว / ทั้งหมด)"""
+    return _to_status(_get_job(job_id))
+
+
+@router.get("/batch-jobs/{job_id}/result")
+async def get_batch_job_result(job_id: str):
+    """ผลลัพธ์ของ job ที่เสร็จแล้ว ในรูปแบบเดียวกับ /batch-predict"""
+    job = _get_job(job_id)
+    if job["status"] == "failed":
+        raise HTTPException(409, f"Batch job failed: {job['error']}")
+    if job["status"] != "completed":
+        raise HTTPException(409, f"Batch job is {job['status']}")
+    result_path = job_manager.store.result_path(job_id)
+    if not result_path.exists():
+        raise HTTPException(410, "Batch job result is no longer available")
+
+    def body():
+        # แต่ละบรรทัดใน result.ndjson เป็น JSON object อยู่แล้ว จึงต่อเป็น array ได้โดยไม่ต้อง parse
+        yield f'{{"count":{job["rows_done"]},"results":['.encode("utf-8")
+        with open(result_path, "rb") as f:
+            for i, line in enumerate(f):
+                yield (b"," if i else b"") + line.rstrip(b"\n")
+        yield b"]}"
+
+    return StreamingResponse(body(), media_type="application/json")
+
+
+@router.delete("/batch-jobs/{job_id}", status_code=204)
+async def delete_batch_job(job_id: str):
+    """ลบ job พร้อมไฟล์ผลลัพธ์ (job ที่ยังรออยู่ในคิวจะไม่ถูกรัน, job ที่กำลังรันลบไม่ได้)"""
+    try:
+        deleted = await asyncio.to_thread(job_manager.delete, job_id)
+    except JobRunning as e:
+        raise HTTPException(409, str(e))
+    if not deleted:
+        raise HTTPException(404, f"Batch job {job_id} not found")
+    return Response(status_code=204)
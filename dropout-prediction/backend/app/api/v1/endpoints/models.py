@@ -0,0 +1,46 @@
+import asyncio
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse
+from typing import Any, Dict, Optional
+from ....core import prefork
+from ....core.model_registry import ModelValidationError, model_registry
+
+router = APIRouter()
+
+
+@router.get("/models")
+async def list_models() -> Dict[str, Any]:
+    """ชุด model ที่ใช้งานอยู่ ชุดที่เก็บไว้สำหรับ rollback และประวัติการ reload"""
+    return model_registry.status()
+
+
+def _ensure_shared():
+    """หลาย worker แต่ไม่มี state ร่วมกัน: การสลับจะมีผลกับ worker ที่รับ request เท่านั้น จึงไม่ยอมให้ทำ"""
+    if prefork.worker_count > 1 and not model_registry.shares_state:
+        raise HTTPException(
+            409, "Model reload/rollback with multiple workers needs MODEL_STATE_PATH and MODEL_WATCH_INTERVAL > 0"
+        )
+
+
+@router.post("/models/reload")
+async def reload_models():
+    """โหลดไฟล์ model ใหม่เบื้องหลัง ตรวจกับ holdout แล้วสลับ (ไม่กระทบ request ที่กำลังทำงาน)
+    worker อื่นสลับตามภายใน MODEL_WATCH_INTERVAL วินาที
+    """
+    _ensure_shared()
+    try:
+        return await asyncio.to_thread(model_registry.reload, "api")
+    except ModelValidationError as e:
+        return JSONResponse(status_code=409, content={"detail": str(e), "candidate": e.report})
+
+
+@router.post("/models/rollback")
+async def rollback_models(version: Optional[str] = None):
+    """กลับไปใช้ชุด model ที่ระบุ (ไม่ระบุ = ชุดก่อนหน้า) worker อื่นสลับตามภายใน MODEL_WATCH_INTERVAL วินาที"""
+    _ensure_shared()
+    try:
+        return await asyncio.to_thread(model_registry.rollback, version)
+    except LookupError as e:
+        raise HTTPException(404, str(e))
+    except ValueError as e:
+        raise HTTPException(400, str(e))
@@ -1,20 +1,36 @@
-﻿from fastapi import APIRouter, HTTPException
-from ....models.schemas import StudentInput, StudentBasicInput, PredictionOutput, FuturePredictionRequest, FuturePredictionOutput
+﻿import asyncio
+import numpy as np
+from fastapi import APIRouter, HTTPException
+from typing import List, Optional, Tuple, Union
+from ....models.schemas import StudentInput, StudentBasicInput, PredictionOutput, FuturePredictionRequest, FuturePredictionOutput, FutureCurveRequest, FutureCurveOutput, FutureCurvePoint, TrajectorySimulationRequest, TrajectorySimulationOutput
+from ....config import settings
 from ....models.ml_model import predictor
-from ....utils.feature_engineering import FeatureEngineer
+from ....utils.feature_engineering import FeatureEngineer, FeatureVector
+from ....core.batching import BatcherOverloaded, predict_explained, predict_one
+from ....core.executors import run_inference
+from ....core.metrics import instrument_endpoint, stage_timer
+from ....core.simulation import SimulationTooLarge, simulate_trajectories
 
 router = APIRouter()
 feature_engineer = FeatureEngineer()
 
 @router.post("/predict", response_model=PredictionOutput)
-async def predict(student: StudentInput):
-    """ทำนายจาก features ที่ประมวลผลแล้ว"""
-    if not predictor.model_loaded:
+@instrument_endpoint
+async def predict(student: StudentInput, explain: bool = False):
+    """ทำนายจาก features ที่ประมวลผลแล้ว
+    explain=true: แนบ top_features (features ที่มีผลต่อผลทำนายมากที่สุดจาก model คำนวณใน micro-batch เดียวกับการทำนาย)
+    """
+    if not predictor.ready:
         raise HTTPException(503, "Model not loaded")
     
     data = student.model_dump()
-    pred, prob = predictor.predict(data)
-    risk, color = predictor.get_risk(prob)
+    num_terms = predictor.count_terms(data)
+    try:
+        pred, prob, backend, top_features = await predict_explained(data, num_terms=num_terms, explain=explain)
+    except BatcherOverloaded as e:
+        raise HTTPException(503, str(e))
+    with stage_timer("risk_mapping"):
+        risk, color = predictor.get_risk(prob)
     
     return PredictionOutput(
         prediction=pred,
@@ -23,13 +39,18 @@ async def predict(student: StudentInput):
         dropout_percentage=f"{prob*100:.1f}%",
         risk_level=risk,
         risk_color=color,
-        recommendation=f"Risk level: {risk}"
+        recommendation=f"Risk level: {risk}",
+        top_features=top_features,
+        model_backend=backend
     )
 
 @router.post("/predict-from-basic", response_model=PredictionOutput)
-async def predict_from_basic(student_basic: StudentBasicInput):
-    """ทำนายจากข้อมูลพื้นฐาน"""
-    if not predictor.model_loaded:
+@instrument_endpoint
+async def predict_from_basic(student_basic: StudentBasicInput, explain: bool = False):
+    """ทำนายจากข้อมูลพื้นฐาน
+    explain=true: แนบ top_features (features ที่มีผลต่อผลทำนายมากที่สุดจาก model คำนวณใน micro-batch เดียวกับการทำนาย)
+    """
+    if not predictor.ready:
         raise HTTPException(503, "Model not loaded")
     
     try:
@@ -47,24 +68,28 @@ async def predict_from_basic(student_basic: StudentBasicInput):
             student_basic.year5_term2
         ]
         
-        # สร้าง features
-        features = feature_engineer.create_model_features(
-            faculty=student_basic.faculty,
-            gender=student_basic.gender,
-            gpax=student_basic.gpax,
-            count_f=student_basic.count_f,
-            term_gpas=term_gpas
-        )
+        # สร้าง features (buffer ขนาดคงที่ที่ model อ่านได้โดยตรง)
+        with stage_timer("feature_engineering"):
+            features = feature_engineer.create_model_vector(
+                faculty=student_basic.faculty,
+                gender=student_basic.gender,
+                gpax=student_basic.gpax,
+                count_f=student_basic.count_f,
+                term_gpas=term_gpas
+            )
         
         # ทำนาย
-        pred, prob = predictor.predict(features, num_terms=len([gpa for gpa in term_gpas if gpa is not None]))
-        risk, color = predictor.get_risk(prob)
+        num_terms = len([gpa for gpa in term_gpas if gpa is not None])
+        pred, prob, backend, top_features = await predict_explained(features, num_terms=num_terms, explain=explain)
         
-        # สร้างคำแนะนำ
-        recommendation = generate_recommendation(risk, prob, features)
-        
-        # อธิบาย features ที่สำคัญ
-        feature_explanations = feature_engineer.get_feature_explanation(features)
+        with stage_timer("risk_mapping"):
+            risk, color = predictor.get_risk(prob)
+            
+            # สร้างคำแนะนำ
+            recommendation = generate_recommendation(risk, prob, features)
+            
+            # อธิบาย features ที่สำคัญ
+            feature_explanations = feature_engineer.get_feature_explanation(features)
         
         return PredictionOutput(
             prediction=pred,
@@ -74,16 +99,21 @@ async def predict_from_basic(student_basic: StudentBasicInput):
             risk_level=risk,
             risk_color=color,
             recommendation=recommendation,
-            feature_explanations=feature_explanations
+            feature_explanations=feature_explanations,
+            top_features=top_features,
+            model_backend=backend
         )
         
+    except BatcherOverloaded as e:
+        raise HTTPException(503, str(e))
     except Exception as e:
         raise HTTPException(400, f"Error processing data: {str(e)}")
 
 @router.post("/predict-future", response_model=FuturePredictionOutput)
+@instrument_endpoint
 async def predict_future(request: FuturePredictionRequest):
     """ทำนายผลลัพธ์หากเกรดเทอมถัดไปเป็นตามที่กำหนด"""
-    if not predictor.model_loaded:
+    if not predictor.ready:
         raise HTTPException(503, "Model not loaded")
     
     try:
@@ -101,27 +131,30 @@ async def predict_future(request: FuturePredictionRequest):
             request.year5_term2
         ]
         
-        # สร้าง features ปัจจุบัน
-        current_features = feature_engineer.create_model_features(
-            faculty=request.faculty,
-            gender=request.gender,
-            gpax=request.gpax,
-            count_f=request.count_f,
-            term_gpas=term_gpas
-        )
-        
-        # คำนวณเทอมปัจจุบัน
-        current_term = len([gpa for gpa in term_gpas if gpa is not None])
-        
-        # สร้าง features สำหรับอนาคต
-        future_features = feature_engineer.predict_future_scenario(
-            current_features, request.future_gpa, current_term
-        )
+        with stage_timer("feature_engineering"):
+            # สร้าง features ปัจจุบัน
+            current_features = feature_engineer.create_model_features(
+                faculty=request.faculty,
+                gender=request.gender,
+                gpax=request.gpax,
+                count_f=request.count_f,
+                term_gpas=term_gpas
+            )
+            
+            # คำนวณเทอมปัจจุบัน
+            current_term = len([gpa for gpa in term_gpas if gpa is not None])
+            
+            # สร้าง features สำหรับอนาคต
+            future_features = feature_engineer.predict_future_scenario(
+                current_features, request.future_gpa, current_term
+            )
         
         # ทำนายทั้งสองกรณี
         current_num_terms = len([gpa for gpa in term_gpas if gpa is not None])
-        current_pred, current_prob = predictor.predict(current_features, num_terms=current_num_terms)
-        future_pred, future_prob = predictor.predict(future_features, num_terms=current_num_terms + 1)
+        (current_pred, current_prob, current_backend), (future_pred, future_prob, future_backend) = await asyncio.gather(
+            predict_one(current_features, num_terms=current_num_terms),
+            predict_one(future_features, num_terms=current_num_terms + 1)
+        )
         
         # คำนวณการปรับปรุง
         improvement = current_prob - future_prob
@@ -142,13 +175,158 @@ async def predict_future(request: FuturePredictionRequest):
             future_percentage=f"{future_prob*100:.1f}%",
             improvement=improvement,
             improvement_percentage=improvement_percentage,
-            recommendation=recommendation
+            recommendation=recommendation,
+            current_model_backend=current_backend,
+            future_model_backend=future_backend
         )
         
+    except BatcherOverloaded as e:
+        raise HTTPException(503, str(e))
     except Exception as e:
         raise HTTPException(400, f"Error processing future prediction: {str(e)}")
 
-def generate_recommendation(risk_level: str, probability: float, features: dict) -> str:
+def _score_future_curve(current_features: dict, current_term: int,
+                        gpa_min: float, gpa_max: float, gpa_step: float) -> Tuple[np.ndarray, np.ndarray, str]:
+    """สร้างทุก scenario เป็น matrix เดียวแล้วทำนายในการเรียก model ครั้งเดียว (ทุกจุดใช้ model เดียวกัน)"""
+    n_points = int(np.floor((gpa_max - gpa_min) / gpa_step + 1e-9)) + 1
+    gpas = np.round(gpa_min + gpa_step * np.arange(n_points), 4)
+    with stage_timer("feature_engineering"):
+        columns = feature_engineer.future_scenario_columns(current_features, gpas, current_term)
+    _, probs, backends = predictor.score_columns(columns, np.full(n_points, current_term + 1))
+    return gpas, probs, backends[0]
+
+def _min_gpa_reaching(gpas: np.ndarray, risks: List[str], allowed: Tuple[str, ...]) -> Optional[float]:
+    """เกรดต่ำสุดบนกราฟที่ความเสี่ยงอยู่ใน allowed ตั้งแต่จุดนั้นไปจนสุดช่วง
+    (trees ไม่จำเป็นต้อง monotonic จึงต้องการให้ทุกเกรดที่สูงกว่าผ่านด้วย)"""
+    ok = np.array([r in allowed for r in risks])
+    stays_ok = np.logical_and.accumulate(ok[::-1])[::-1]
+    idx = np.flatnonzero(stays_ok)
+    return float(gpas[idx[0]]) if len(idx) else None
+
+@router.post("/predict-future-curve", response_model=FutureCurveOutput)
+@instrument_endpoint
+async def predict_future_curve(request: FutureCurveRequest):
+    """กราฟความเสี่ยงตามเกรดเทอมถัดไปทั้งช่วง พร้อมเกรดขั้นต่ำที่ลดระดับความเสี่ยงได้"""
+    if not predictor.ready:
+        raise HTTPException(503, "Model not loaded")
+    if request.gpa_min > request.gpa_max:
+        raise HTTPException(400, "gpa_min must not be greater than gpa_max")
+    
+    try:
+        term_gpas = [
+            request.year1_term1,
+            request.year1_term2,
+            request.year2_term1,
+            request.year2_term2,
+            request.year3_term1,
+            request.year3_term2,
+            request.year4_term1,
+            request.year4_term2,
+            request.year5_term1,
+            request.year5_term2
+        ]
+        with stage_timer("feature_engineering"):
+            current_features = feature_engineer.create_model_features(
+                faculty=request.faculty,
+                gender=request.gender,
+                gpax=request.gpax,
+                count_f=request.count_f,
+                term_gpas=term_gpas
+            )
+        current_term = len([gpa for gpa in term_gpas if gpa is not None])
+        
+        (_, current_prob, current_backend), (gpas, probs, curve_backend) = await asyncio.gather(
+            predict_one(current_features, num_terms=current_term),
+            run_inference(_score_future_curve, current_features, current_term,
+                          request.gpa_min, request.gpa_max, request.gpa_step)
+        )
+        with stage_timer("risk_mapping"):
+            risks = [predictor.get_risk(p)[0] for p in probs]
+        
+        return FutureCurveOutput(
+            current_probability=current_prob,
+            current_risk_level=predictor.get_risk(current_prob)[0],
+            current_model_backend=current_backend,
+            model_key=predictor.get_model_for_term(current_term + 1),
+            model_backend=curve_backend,
+            points=[
+                FutureCurvePoint(future_gpa=float(g), probability=float(p), risk_level=r)
+                for g, p, r in zip(gpas, probs, risks)
+            ],
+            min_gpa_for_medium=_min_gpa_reaching(gpas, risks, ("Medium", "Low")),
+            min_gpa_for_low=_min_gpa_reaching(gpas, risks, ("Low",))
+        )
+        
+    except BatcherOverloaded as e:
+        raise HTTPException(503, str(e))
+    except Exception as e:
+        raise HTTPException(400, f"Error processing future curve: {str(e)}")
+
+@router.post("/simulate-trajectory", response_model=TrajectorySimulationOutput)
+@instrument_endpoint
+async def simulate_trajectory(request: TrajectorySimulationRequest):
+    """จำลองเกรดเทอมที่เหลือหลายพันเส้นทาง แล้วสรุปช่วงความเสี่ยงของแต่ละเทอม"""
+    if not predictor.ready:
+        raise HTTPException(503, "Model not loaded")
+    
+    try:
+        term_gpas = [
+            request.year1_term1,
+            request.year1_term2,
+            request.year2_term1,
+            request.year2_term2,
+            request.year3_term1,
+            request.year3_term2,
+            request.year4_term1,
+            request.year4_term2,
+            request.year5_term1,
+            request.year5_term2
+        ]
+        with stage_timer("feature_engineering"):
+            current_features = feature_engineer.create_model_vector(
+                faculty=request.faculty,
+                gender=request.gender,
+                gpax=request.gpax,
+                count_f=request.count_f,
+                term_gpas=term_gpas
+            )
+        current_term = len([gpa for gpa in term_gpas if gpa is not None])
+        
+        (_, current_prob, current_backend), simulation = await asyncio.gather(
+            predict_one(current_features, num_terms=current_term),
+            run_inference(
+                simulate_trajectories, predictor, feature_engineer,
+                faculty=request.faculty,
+                gender=request.gender,
+                gpax=request.gpax,
+                count_f=request.count_f,
+                term_gpas=term_gpas,
+                n_paths=request.n_paths,
+                distribution=request.distribution,
+                gpa_sd=request.gpa_sd,
+                recent_terms=request.recent_terms,
+                gpa_shift=request.gpa_shift,
+                percentiles=request.percentiles,
+                seed=request.seed,
+                max_rows=settings.SIMULATION_MAX_ROWS
+            )
+        )
+        
+        return TrajectorySimulationOutput(
+            current_probability=current_prob,
+            current_risk_level=predictor.get_risk(current_prob)[0],
+            current_model_backend=current_backend,
+            **simulation
+        )
+        
+    except BatcherOverloaded as e:
+        raise HTTPException(503, str(e))
+    except SimulationTooLarge as e:
+        raise HTTPException(422, str(e))
+    except Exception as e:
+        raise HTTPException(400, f"Error simulating trajectory: {str(e)}")
+
+def generate_recommendation(risk_level: str, probability: float, features: Union[dict, FeatureVector]) -> str:
     """สร้างคำแนะนำตามระดับความเสี่ยง"""
     recommendations = []
     
@@ -0,0 +1,27 @@
+from fastapi import APIRouter
+from typing import Any, Dict
+from ....core import prefork
+from ....core.batching import batcher
+from ....core.score_memo import score_memo
+from ....core.startup import startup_report
+from ....core.students import student_service
+from ....core.upload_cache import upload_cache
+from ....models.ml_model import predictor
+
+router = APIRouter()
+
+
+@router.get("/stats")
+async def stats() -> Dict[str, Any]:
+    """ตัวชี้วัดภายในของ service (micro-batching ฯลฯ)"""
+    return {
+        "model_version": predictor.model_version,
+        "process": prefork.process_info(),
+        "microbatch": batcher.stats(),
+        "prediction_cache": predictor.cache.stats(),
+        "explanation_cache": predictor.explanation_cache.stats(),
+        "upload_cache": upload_cache.stats(),
+        "score_memo": score_memo.stats(),
+        "student_store": student_service.store.stats(),
+        "startup": startup_report.report(),
+    }
@@ -0,0 +1,89 @@
+import asyncio
+from datetime import datetime
+from fastapi import APIRouter, File, HTTPException, Query, UploadFile
+from typing import Any, Dict, Literal, Optional
+from ....core.batch_scoring import missing_columns
+from ....core.executors import run_inference
+from ....core.students import StudentWriteConflict, student_service
+from ....models.ml_model import predictor
+from ....models.schemas import (
+    StudentRecord, StudentRegisterResult, TermAppendRequest, TermAppendResult,
+)
+from .batch import read_dataframe
+
+router = APIRouter()
+
+
+def _require_model():
+    if not predictor.ready:
+        raise HTTPException(503, "Model not loaded")
+
+
+@router.post("/students", response_model=StudentRegisterResult)
+async def register_students(file: UploadFile = File(...)):
+    """เพิ่ม/แทนที่นักศึกษาใน store จากไฟล์ CSV/XLSX รูปแบบเดียวกับ /batch-predict (ต้องมี student_id) แล้วทำนายทุกคน"""
+    _require_model()
+    df = await read_dataframe(file)
+    missing = missing_columns(df)
+    if "student_id" not in df.columns:
+        missing.append("student_id")
+    if missing:
+        raise HTTPException(400, f"Missing columns: {', '.join(missing)}")
+    return await run_inference(student_service.register, df)
+
+
+@router.post("/students/terms", response_model=TermAppendResult)
+async def append_term(request: TermAppendRequest):
+    """เพิ่มเกรดเทอมถัดไปให้นักศึกษาหลายคน แล้วทำนายใหม่เฉพาะคนที่ได้รับเกรด"""
+    _require_model()
+    try:
+        return await run_inference(student_service.append_term, [g.model_dump() for g in request.grades])
+    except StudentWriteConflict as e:
+        raise HTTPException(409, str(e))
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+
+@router.post("/students/rescore")
+async def rescore_students():
+    """ทำนายนักศึกษาทุกคนใน store ใหม่ (เช่น หลัง reload model)"""
+    _require_model()
+    try:
+        return await run_inference(student_service.rescore)
+    except StudentWriteConflict as e:
+        raise HTTPException(409, str(e))
+
+
+@router.get("/students/at-risk")
+async def at_risk_students(limit: int = Query(50, ge=1, le=500),
+                           faculty: Optional[str] = None,
+                           num_terms: Optional[int] = None,
+                           risk_level: Optional[Literal["Low", "Medium", "High"]] = None,
+                           cursor: Optional[str] = None) -> Dict[str, Any]:
+    """นักศึกษาใน store ที่เสี่ยงที่สุด limit คน (เรียงตาม dropout_probability จากมากไปน้อย)
+    กรองด้วย faculty (ตามกลุ่มของ /analytics/cohort), num_terms, risk_level
+    หน้าถัดไป: ส่ง next_cursor ของหน้านี้เป็น ?cursor=
+    """
+    # อ่าน index ของ SQLite อย่างเดียว ไม่ใช้ inference pool
+    try:
+        result = await asyncio.to_thread(
+            student_service.ranking, limit,
+            {"faculty": faculty, "num_terms": num_terms, "risk_level": risk_level}, cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    for student in result["students"]:
+        student["scored_at"] = datetime.fromtimestamp(student["scored_at"])
+    return result
+
+
+@router.get("/students/{student_id}", response_model=StudentRecord)
+async def get_student(student_id: str):
+    """ข้อมูลและความเสี่ยงล่าสุดของนักศึกษาจาก store (ไม่คำนวณใหม่)"""
+    student = await run_inference(student_service.get, student_id)
+    if student is None:
+        raise HTTPException(404, f"Student {student_id} not found")
+    student["updated_at"] = datetime.fromtimestamp(student["updated_at"])
+    if student["prediction"] is not None:
+        student["prediction"]["scored_at"] = datetime.fromtimestamp(student["prediction"]["scored_at"])
+    return student
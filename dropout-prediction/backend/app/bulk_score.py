@@ -0,0 +1,307 @@
+"""
+ทำนายไฟล์นักศึกษาขนาดใหญ่แบบ offline ด้วยหลาย process (เช่น export ของทะเบียนทั้งมหาวิทยาลัยทุกคืน)
+
+    cd backend
+    python -m app.bulk_score "cleaning (1).xlsx" -o predictions.parquet
+    python -m app.bulk_score students.csv -o predictions.csv --workers 4 --shard-rows 20000
+
+อ่านไฟล์ทีละ shard (--shard-rows แถว) แบบ streaming แล้วทำนายใน process pool ด้วย FeatureEngineer/DropoutPredictor
+ชุดเดียวกับ /batch-predict: process ลูกได้ model จาก parent ผ่าน fork (โหลดครั้งเดียว)
+หรือโหลดเองครั้งเดียวต่อ process เมื่อ fork ใช้ไม่ได้
+ผลของแต่ละ shard เขียนลง <output>.shards/ ทันทีที่เสร็จ: ถ้าการรันถูกขัดจังหวะ รันคำสั่งเดิมซ้ำจะข้าม shard ที่เสร็จแล้ว
+(เฉพาะเมื่อไฟล์นำเข้า, shard-rows, explain, format และเวอร์ชัน model ตรงกับครั้งก่อน)
+คอลัมน์ของผลลัพธ์ = RESULT_COLUMNS ของ /batch-predict?format=csv (feature_explanations, top_features เป็น JSON string)
+ไฟล์ export ของทะเบียน (STUDENT_ID, FAC_NAME, GENDER_NAME, GPA, COUNT_F, TERM1, ...) ถูกเปลี่ยนชื่อคอลัมน์ให้อัตโนมัติ
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import math
+import multiprocessing
+import os
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("app.bulk_score")
+
+OUTPUT_FORMATS = ("parquet", "csv")
+MANIFEST_FILE = "manifest.json"
+# shard ที่ส่งเข้า pool แล้วแต่ยังไม่เสร็จต่อ worker (จำกัดหน่วยความจำของ shard ที่รอ)
+IN_FLIGHT_PER_WORKER = 2
+PARENT_CHECK_INTERVAL_S = 1.0
+
+
+def _result_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("row_index", pa.int64()),
+        ("student_id", pa.string()),
+        ("name", pa.string()),
+        ("prediction", pa.int8()),
+        ("prediction_label", pa.string()),
+        ("dropout_probability", pa.float64()),
+        ("dropout_percentage", pa.string()),
+        ("risk_level", pa.string()),
+        ("risk_color", pa.string()),
+        ("feature_explanations", pa.string()),
+        ("model_backend", pa.string()),
+        ("top_features", pa.string()),
+    ])
+
+
+def _results_table(results: List[Dict[str, Any]]):
+    """ผลลัพธ์เป็นตาราง pyarrow ตาม RESULT_COLUMNS (ค่าเดียวกับ CSV)"""
+    import pyarrow as pa
+    from .core.batch_scoring import RESULT_COLUMNS, flatten_result
+
+    schema = _result_schema()
+    rows = [flatten_result(r) for r in results]
+    arrays = []
+    for j, col in enumerate(RESULT_COLUMNS):
+        values = [row[j] for row in rows]
+        if pa.types.is_string(schema.field(col).type):
+            # รหัส/ชื่อในไฟล์อาจเป็นตัวเลข: เก็บเป็นข้อความทั้งคอลัมน์
+            values = [None if v is None else str(v) for v in values]
+        arrays.append(pa.array(values, schema.field(col).type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def _write_part(results: List[Dict[str, Any]], path: Path, fmt: str):
+    """เขียนผลของหนึ่ง shard ผ่านไฟล์ชั่วคราว: ไฟล์ part ที่มีอยู่จึงสมบูรณ์เสมอ"""
+    from .core.batch_scoring import encode_csv
+
+    tmp = path.with_name(path.name + ".tmp")
+    if fmt == "csv":
+        tmp.write_bytes(encode_csv(results, include_header=False))
+    else:
+        import pyarrow.parquet as pq
+        pq.write_table(_results_table(results), tmp, compression="zstd")
+    os.replace(tmp, path)
+
+
+# สร้างครั้งแรกที่ process ลูกทำนาย shard
+_feature_engineer = None
+
+
+def _init_worker(parent_pid: int, load_models: bool):
+    # parent ถูก kill (เช่น OOM) process ลูกจะรองานจาก queue ไปตลอด: ออกเองเมื่อ parent หายไป
+    threading.Thread(target=_exit_with_parent, args=(parent_pid,), daemon=True).start()
+    # spawn: process ใหม่ไม่มี model ของ parent ต้องโหลดเองหนึ่งครั้ง
+    if load_models:
+        from .models.ml_model import predictor
+        predictor.load_models()
+
+
+def _exit_with_parent(parent_pid: int):
+    while os.getppid() == parent_pid:
+        time.sleep(PARENT_CHECK_INTERVAL_S)
+    os._exit(1)
+
+
+def _score_shard(index: int, chunk, path: str, fmt: str, explain: str) -> Tuple[int, int]:
+    from .core.batch_scoring import score_dataframe
+    from .core.ingestion import rename_registrar_columns
+    from .models.ml_model import predictor
+    from .utils.feature_engineering import FeatureEngineer
+
+    global _feature_engineer
+    if _feature_engineer is None:
+        _feature_engineer = FeatureEngineer()
+    results = score_dataframe(rename_registrar_columns(chunk), predictor, _feature_engineer, explain=explain)
+    _write_part(results, Path(path), fmt)
+    return index, len(results)
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _part_path(shard_dir: Path, index: int, fmt: str) -> Path:
+    return shard_dir / f"part-{index:05d}.{fmt}"
+
+
+def _prepare_shard_dir(shard_dir: Path, manifest: Dict[str, Any], resume: bool) -> bool:
+    """สร้าง/ตรวจโฟลเดอร์ shard คืน True ถ้าใช้ shard จากการรันครั้งก่อนได้"""
+    manifest_path = shard_dir / MANIFEST_FILE
+    if resume and manifest_path.exists():
+        try:
+            previous = json.loads(manifest_path.read_text(encoding="utf-8"))
+        except ValueError:
+            previous = None
+        if previous == manifest:
+            return True
+        logger.warning("⚠️ %s was written for a different input/settings, starting over", shard_dir)
+    if shard_dir.exists():
+        shutil.rmtree(shard_dir)
+    shard_dir.mkdir(parents=True)
+    manifest_path.write_text(json.dumps(manifest, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    return False
+
+
+def _merge_parts(parts: List[Path], output: Path, fmt: str):
+    """รวม part ทุกไฟล์ตามลำดับ shard เป็นไฟล์ผลลัพธ์เดียว (ผ่านไฟล์ชั่วคราวเช่นกัน)"""
+    tmp = output.with_name(output.name + ".tmp")
+    if fmt == "csv":
+        from .core.batch_scoring import encode_csv
+
+        with open(tmp, "wb") as out:
+            out.write(encode_csv([], include_header=True))
+            for part in parts:
+                with open(part, "rb") as f:
+                    shutil.copyfileobj(f, out)
+    else:
+        import pyarrow.parquet as pq
+
+        with pq.ParquetWriter(tmp, _result_schema(), compression="zstd") as writer:
+            for part in parts:
+                writer.write_table(pq.read_table(part))
+    os.replace(tmp, output)
+
+
+def _progress(done_shards: int, n_shards: int, rows: int, total_rows: int, scored: int, elapsed: float):
+    rate = scored / elapsed if elapsed > 0 else 0.0
+    eta = (total_rows - rows) / rate if rate > 0 else float("nan")
+    print(f"[{done_shards}/{n_shards}] {rows:,}/{total_rows:,} rows  {rate:,.0f} rows/s  ETA {eta:,.0f}s",
+          file=sys.stderr, flush=True)
+
+
+def run(input_path: Path, output: Path, fmt: str, workers: int, shard_rows: int, explain: str,
+        resume: bool = True, keep_shards: bool = False) -> Dict[str, Any]:
+    from .core.batch_scoring import missing_columns
+    from .core.ingestion import (
+        BATCH_COLUMNS, REGISTRAR_COLUMNS, count_upload_rows, iter_upload_chunks, rename_registrar_columns,
+    )
+    from .models.ml_model import predictor
+    import pandas as pd
+
+    started = time.perf_counter()
+    if not predictor.load_models():
+        raise RuntimeError("Models not loaded")
+
+    columns = BATCH_COLUMNS + list(REGISTRAR_COLUMNS)
+    with open(input_path, "rb") as f, closing(iter_upload_chunks(f, input_path.name, 1, columns)) as head:
+        first = next(head, None)
+    missing = missing_columns(rename_registrar_columns(first if first is not None else pd.DataFrame()))
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+    with open(input_path, "rb") as f:
+        total_rows = count_upload_rows(f, input_path.name)
+    n_shards = math.ceil(total_rows / shard_rows)
+    manifest = {
+        "input": str(input_path.resolve()),
+        "input_sha256": _file_sha256(input_path),
+        "rows": total_rows,
+        "shard_rows": shard_rows,
+        "explain": explain,
+        "format": fmt,
+        "model_version": predictor.model_version,
+        "backend": predictor.backend,
+    }
+    shard_dir = output.with_name(output.name + ".shards")
+    resumed = _prepare_shard_dir(shard_dir, manifest, resume)
+    finished = {i for i in range(n_shards) if _part_path(shard_dir, i, fmt).exists()} if resumed else set()
+    skipped = len(finished)
+    if skipped:
+        logger.info("♻️ Resuming: %d/%d shards already scored", skipped, n_shards)
+
+    # fork: process ลูกใช้ model ที่ parent โหลดแล้ว (ไม่โหลดซ้ำ) / spawn: โหลดหนึ่งครั้งต่อ process
+    method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+    rows_done = sum(min(shard_rows, total_rows - i * shard_rows) for i in finished)
+    scored = 0
+    scoring_started = time.perf_counter()
+    pending = set()
+
+    def collect():
+        nonlocal rows_done, scored
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            pending.discard(future)
+            index, rows = future.result()
+            finished.add(index)
+            rows_done += rows
+            scored += rows
+            _progress(len(finished), n_shards, rows_done, total_rows, scored,
+                      time.perf_counter() - scoring_started)
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method),
+                             initializer=_init_worker, initargs=(os.getpid(), method != "fork")) as pool:
+        with open(input_path, "rb") as f, \
+                closing(iter_upload_chunks(f, input_path.name, shard_rows, columns)) as chunks:
+            for index, chunk in enumerate(chunks):
+                if index in finished or chunk.empty:
+                    continue
+                while len(pending) >= workers * IN_FLIGHT_PER_WORKER:
+                    collect()
+                pending.add(pool.submit(_score_shard, index, chunk, str(_part_path(shard_dir, index, fmt)),
+                                        fmt, explain))
+        while pending:
+            collect()
+
+    _merge_parts([_part_path(shard_dir, i, fmt) for i in range(n_shards)], output, fmt)
+    if not keep_shards:
+        shutil.rmtree(shard_dir)
+    elapsed = time.perf_counter() - started
+    scoring_elapsed = time.perf_counter() - scoring_started
+    return {
+        "rows": total_rows,
+        "shards": n_shards,
+        "resumed_shards": skipped,
+        "scored_rows": scored,
+        "elapsed_s": round(elapsed, 2),
+        "rows_per_s": round(scored / scoring_elapsed, 1) if scoring_elapsed > 0 else None,
+        "output": str(output),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from .config import settings
+    from .core.batch_scoring import EXPLAIN_MODES
+
+    parser = argparse.ArgumentParser(description="Score a large CSV/XLSX file offline with a process pool")
+    parser.add_argument("input", type=Path, help="ไฟล์ CSV/XLSX รูปแบบเดียวกับ /batch-predict หรือ export ของทะเบียน")
+    parser.add_argument("-o", "--output", type=Path, required=True, help="ไฟล์ผลลัพธ์ .parquet หรือ .csv")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, help="ค่าเริ่มต้นตามนามสกุลของ --output")
+    parser.add_argument("--workers", type=int, default=0, help="จำนวน process (0 = จำนวน CPU)")
+    parser.add_argument("--shard-rows", type=int, default=20000, help="จำนวนแถวต่อ shard")
+    parser.add_argument("--explain", choices=EXPLAIN_MODES, default=settings.BATCH_EXPLAIN)
+    parser.add_argument("--no-resume", action="store_true", help="ไม่ใช้ shard จากการรันครั้งก่อน")
+    parser.add_argument("--keep-shards", action="store_true", help="ไม่ลบโฟลเดอร์ shard หลังรวมผลเสร็จ")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    # log ระดับ INFO ของการโหลด model ไม่จำเป็นสำหรับ CLI
+    logging.getLogger("app.models").setLevel(logging.WARNING)
+    fmt = args.format or args.output.suffix.lstrip(".").lower()
+    if fmt not in OUTPUT_FORMATS:
+        parser.error(f"cannot infer output format from {args.output.name}, use --format")
+    if args.shard_rows <= 0:
+        parser.error("--shard-rows must be positive")
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+
+    try:
+        summary = run(args.input, args.output, fmt, workers, args.shard_rows, args.explain,
+                      resume=not args.no_resume, keep_shards=args.keep_shards)
+    except (OSError, ValueError, RuntimeError) as e:
+        logger.error("❌ %s", e)
+        return 1
+    logger.info("✅ Scored %s rows in %.1fs (%s rows/s) -> %s",
+                f"{summary['rows']:,}", summary["elapsed_s"], summary["rows_per_s"], summary["output"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,111 @@
-﻿from pydantic_settings import BaseSettings
+﻿from pathlib import Path
+from pydantic_settings import BaseSettings
+
+# โฟลเดอร์ backend: path แบบ relative ใน Settings (MODEL_DIR, data/..., logs/...) อ้างอิงจากที่นี่เสมอ
+# ไม่ขึ้นกับโฟลเดอร์ที่รัน process
+BACKEND_DIR = Path(__file__).parent.parent
+
+
+def resolve_path(path: str) -> str:
+    """path จาก Settings เป็น absolute path (relative = เทียบกับ BACKEND_DIR) ค่าว่างคืนค่าว่าง (= ปิด)"""
+    if not path:
+        return path
+    return str(BACKEND_DIR / path)
 
 class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     PROJECT_NAME: str = "Dropout Prediction API"
     VERSION: str = "1.0.0"
     DEBUG: bool = True
+    # ระดับของ logger ใน package app (DEBUG, INFO, WARNING, ...)
+    LOG_LEVEL: str = "INFO"
+    # เก็บตัวชี้วัด (เวลาแต่ละขั้นตอน, จำนวน request) และเปิด GET /metrics (Prometheus)
+    METRICS_ENABLED: bool = True
+    
+    # "native" = NumPy tree engine (ไม่ต้องใช้ xgboost), "xgboost" = XGBClassifier
+    MODEL_BACKEND: str = "native"
+    
+    # Model registry: โฟลเดอร์ไฟล์ model_term{1,2,3}.json
+    # (path ทุกค่าใน Settings ที่เป็น relative อ้างอิงจากโฟลเดอร์ backend ดู resolve_path)
+    MODEL_DIR: str = "XG"
+    # ตรวจไฟล์ model ทุกกี่วินาทีแล้ว reload อัตโนมัติเมื่อเปลี่ยน, 0 = ปิด file watcher
+    MODEL_WATCH_INTERVAL: float = 5.0
+    # จำนวนชุด model ที่เก็บไว้สำหรับ rollback (รวมชุดที่ใช้งานอยู่)
+    MODEL_HISTORY_SIZE: int = 3
+    # ไฟล์เวอร์ชันชุด model ที่ใช้งาน (ใช้ร่วมกันทุก worker): reload/rollback ของ worker หนึ่ง
+    # worker อื่นสลับตามภายใน MODEL_WATCH_INTERVAL, ว่าง = ไม่ใช้ (API reload/rollback ตอบ 409 เมื่อมีหลาย worker)
+    MODEL_STATE_PATH: str = "data/model_state.json"
+    # holdout สำหรับตรวจชุดใหม่ก่อนสลับ: CSV/XLSX รูปแบบเดียวกับ /batch-predict + คอลัมน์ dropout (0/1)
+    # ว่าง = ใช้ชุดข้อมูลสังเคราะห์ (ตรวจได้เฉพาะความถูกต้องของผลและอัตราการเปลี่ยนผล)
+    MODEL_HOLDOUT_PATH: str = ""
+    MODEL_MIN_HOLDOUT_ACCURACY: float = 0.6
+    # สัดส่วนสูงสุดของแถวที่ผลทำนาย (0/1) เปลี่ยนจากชุดเดิม
+    MODEL_MAX_FLIP_RATE: float = 0.5
+    # เก็บ model ที่แปลงแล้วเป็นไฟล์ binary (.npz / .ubj) ชื่อมี hash ของ JSON ใช้แทนการ parse JSON ครั้งถัดไป
+    MODEL_BINARY_CACHE: bool = True
+    # โฟลเดอร์ของไฟล์ cache, ว่าง = โฟลเดอร์เดียวกับไฟล์ JSON
+    MODEL_CACHE_DIR: str = ""
+    
+    # Logistic models (logistic_term{1,2,3}.json) สำหรับ fallback/ensemble, ว่าง = ไม่โหลด
+    FALLBACK_MODEL_DIR: str = "Logis"
+    # ใช้ logistic model แทนเมื่อคิวของ micro-batcher เต็ม (แทนการตอบ 503)
+    FALLBACK_ON_OVERLOAD: bool = True
+    # น้ำหนักของ logistic model เมื่อผสมกับ tree model (0 = ใช้ tree อย่างเดียว, 0.3 = 70% tree + 30% logistic)
+    ENSEMBLE_LOGISTIC_WEIGHT: float = 0.0
+    
+    # รายงานเวลา startup ต่อท้ายไฟล์ (JSON หนึ่งบรรทัดต่อครั้ง), ว่าง = ไม่เขียนไฟล์
+    STARTUP_REPORT_PATH: str = "logs/startup_report.jsonl"
+    
+    # Micro-batching สำหรับ /predict, /predict-from-basic, /predict-future
+    MICROBATCH_ENABLED: bool = True
+    MICROBATCH_MAX_SIZE: int = 64
+    MICROBATCH_MAX_WAIT_MS: float = 2.0
+    MICROBATCH_MAX_QUEUE: int = 4096
+    
+    # จำนวนผลทำนายที่จำไว้ (LRU) สำหรับ request ที่ซ้ำ, 0 = ปิด
+    PREDICTION_CACHE_SIZE: int = 10000
+    
+    # คำอธิบายผลทำนาย (top_features): จำนวน features ที่มีผลมากที่สุดต่อแถว และขนาด LRU cache (0 = ปิด cache)
+    EXPLAIN_TOP_K: int = 5
+    EXPLANATION_CACHE_SIZE: int = 10000
+    # ค่าเริ่มต้นของ /batch-predict?explain=: all = ทุกแถว, high = เฉพาะความเสี่ยงสูง, none = ไม่คำนวณ
+    BATCH_EXPLAIN: str = "high"
+    
+    # จำนวน worker process ของ `python -m app.serve` (โหลด model ครั้งเดียวใน parent แล้ว fork), 0 = จำนวน CPU
+    WORKERS: int = 1
+    
+    # Executors: inference = thread pool, parsing = process pool (0 = ใช้ thread แทน)
+    INFERENCE_THREADS: int = 2
+    PARSING_PROCESSES: int = 1
+    # thread สำหรับอ่านไฟล์ทีละ chunk ของ /batch-predict?stream= (generator ส่งข้าม process ไม่ได้)
+    STREAM_PARSING_THREADS: int = 2
+    # จำนวน thread ต่อการเรียก XGBoost (backend xgboost) กัน oversubscription กับ inference pool
+    XGB_NTHREAD: int = 1
+    
+    # จำนวนแถวที่ /simulate-trajectory ทำนายได้สูงสุดต่อ request (n_paths x เทอมที่เหลือ) เกินแล้วลด n_paths
+    SIMULATION_MAX_ROWS: int = 40000
+    
+    # จำนวนแถวต่อ chunk ของ /batch-predict แบบ streaming
+    BATCH_CHUNK_SIZE: int = 5000
+    
+    # ไฟล์อัปโหลดที่ parse แล้ว (Parquet, ชื่อ = hash ของเนื้อไฟล์) อัปโหลดไฟล์เดิมซ้ำไม่ต้อง parse ใหม่
+    UPLOAD_CACHE_DIR: str = "data/upload_cache"
+    # ขนาดรวมสูงสุด (MB) ลบไฟล์ที่ใช้ล่าสุดนานที่สุดก่อน, 0 = ปิด
+    UPLOAD_CACHE_MAX_MB: int = 256
+    
+    # Batch jobs (/batch-jobs): สถานะเก็บใน SQLite, ไฟล์อินพุต/ผลลัพธ์เก็บใน JOB_DIR
+    JOB_DB_PATH: str = "data/jobs.sqlite3"
+    JOB_DIR: str = "data/jobs"
+    MAX_CONCURRENT_JOBS: int = 2
+    MAX_PENDING_JOBS: int = 100
+    # ลบ job ที่เสร็จแล้ว (สถานะและไฟล์ผลลัพธ์) หลังจากกี่ชั่วโมง, 0 = เก็บไว้ตลอด
+    JOB_RETENTION_HOURS: float = 24.0
+    
+    # ผลทำนายล่าสุดของแต่ละ student_id (SQLite) อัปโหลด roster ซ้ำคำนวณเฉพาะแถวใหม่/ที่เปลี่ยน, ว่าง = ปิด
+    SCORE_MEMO_PATH: str = "data/score_memo.sqlite3"
+    
+    # ข้อมูลนักศึกษาและผลทำนายล่าสุด (/students) ใน SQLite
+    STUDENT_DB_PATH: str = "data/students.sqlite3"
     
     class Config:
         case_sensitive = True
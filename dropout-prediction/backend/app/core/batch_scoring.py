@@ -0,0 +1,285 @@
+import csv
+import io
+import json
+import numpy as np
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+from ..config import settings
+from ..models.ml_model import DropoutPredictor
+from ..utils.feature_engineering import FEATURE_LABELS, FeatureEngineer
+from .ingestion import OPTIONAL_TERM_COLUMNS, REQUIRED_COLUMNS
+from .metrics import observe_batch_rows, stage_timer
+from .result_formats import PREDICTION_LABELS, dumps, loads
+from .score_memo import ScoreMemo
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# ลำดับคอลัมน์ของผลลัพธ์ (ใช้กับ CSV)
+RESULT_COLUMNS = [
+    "row_index", "student_id", "name", "prediction", "prediction_label",
+    "dropout_probability", "dropout_percentage", "risk_level", "risk_color",
+    "feature_explanations", "model_backend", "top_features"
+]
+# คอลัมน์ที่เก็บเป็น JSON string ใน CSV
+JSON_COLUMNS = ("feature_explanations", "top_features")
+# ค่าของ explain: แถวที่คำนวณ top_features
+EXPLAIN_MODES = ("all", "high", "none")
+
+
+def missing_columns(df: "pd.DataFrame") -> List[str]:
+    """คืนรายชื่อคอลัมน์ที่จำเป็นแต่ไม่มีในไฟล์"""
+    return [c for c in REQUIRED_COLUMNS if c not in df.columns]
+
+
+def normalize_inputs(df: "pd.DataFrame") -> Dict[str, Any]:
+    """
+    ค่าที่ใช้สร้าง features ของทุกแถว (อาร์กิวเมนต์ของ create_model_features_batch)
+    ชนิดข้อมูลเหมือนกันไม่ว่าไฟล์จะเป็น CSV หรือ XLSX
+    """
+    term_cols = REQUIRED_COLUMNS[4:] + OPTIONAL_TERM_COLUMNS
+    term_matrix = np.full((len(df), len(term_cols)), np.nan)
+    for j, col in enumerate(term_cols):
+        if col in df.columns:
+            term_matrix[:, j] = df[col].astype(float).to_numpy()
+    return {
+        "faculty": df["faculty"].astype(str).tolist(),
+        "gender": df["gender"].astype(str).tolist(),
+        "gpax": df["gpax"].astype(float).to_numpy(),
+        "count_f": df["count_f"].astype(float).astype(int).to_numpy(),
+        "term_gpas": term_matrix,
+    }
+
+
+def build_features(df: "pd.DataFrame",
+                   feature_engineer: FeatureEngineer) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+    """สร้าง features แบบ columnar และจำนวนเทอมของทุกแถวจาก DataFrame รูปแบบเดียวกับไฟล์อัปโหลด"""
+    with stage_timer("feature_engineering"):
+        inputs = normalize_inputs(df)
+        features = feature_engineer.create_model_features_batch(**inputs)
+    num_terms = (~np.isnan(inputs["term_gpas"])).sum(axis=1)
+    return features, num_terms
+
+
+def row_hashes(inputs: Dict[str, Any]) -> np.ndarray:
+    """hash (int64) ของข้อมูลนำเข้าแต่ละแถวจาก normalize_inputs: เปลี่ยนเมื่อค่าใดค่าหนึ่งที่มีผลต่อผลทำนายเปลี่ยน"""
+    import pandas as pd
+
+    frame = pd.DataFrame({
+        "faculty": inputs["faculty"],
+        "gender": inputs["gender"],
+        "gpax": inputs["gpax"],
+        "count_f": inputs["count_f"],
+        **{f"term{j}": inputs["term_gpas"][:, j] for j in range(inputs["term_gpas"].shape[1])},
+    })
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy().view(np.int64)
+
+
+def memo_signature(predictor: DropoutPredictor, explain: str) -> str:
+    """ทุกอย่างนอกจากข้อมูลนำเข้าที่มีผลต่อผลลัพธ์ของแถว: ผลใน ScoreMemo ที่ signature ต่างกันไม่ถูกใช้"""
+    return "|".join((
+        str(predictor.model_version), predictor.backend, ",".join(sorted(predictor.logistic)),
+        f"ensemble={settings.ENSEMBLE_LOGISTIC_WEIGHT}", f"explain={explain}", f"top_k={settings.EXPLAIN_TOP_K}",
+    ))
+
+
+def score_dataframe(df: "pd.DataFrame",
+                    predictor: DropoutPredictor,
+                    feature_engineer: FeatureEngineer,
+                    explain: Optional[str] = None,
+                    memo: Optional[ScoreMemo] = None) -> List[Dict[str, Any]]:
+    """
+    ทำนายทั้ง DataFrame แบบกลุ่ม
+    สร้าง features แบบ columnar แล้วเรียก model ครั้งเดียวต่อ model key (term1/term2/term3)
+    ผลลัพธ์เรียงตามลำดับแถวเดิม และเหมือนกับการทำนายทีละแถวทุกประการ
+    explain: all / high (เฉพาะความเสี่ยงสูง) / none, ค่าเริ่มต้น = BATCH_EXPLAIN
+    """
+    columns, _ = score_dataframe_columns(df, predictor, feature_engineer, explain, memo)
+    return columns_to_rows(columns, predictor, feature_engineer)
+
+
+def score_dataframe_columns(df: "pd.DataFrame",
+                            predictor: DropoutPredictor,
+                            feature_engineer: FeatureEngineer,
+                            explain: Optional[str] = None,
+                            memo: Optional[ScoreMemo] = None) -> Tuple[Dict[str, List], Dict[str, int]]:
+    """
+    ทำนายเหมือน score_dataframe แต่คืนผลแบบคอลัมน์ (หนึ่ง list ต่อ field) สำหรับ format=columnar/arrow/parquet
+    ตัด field ที่คำนวณจาก field อื่นได้ (prediction_label, dropout_percentage, risk_color)
+    explanations เป็น [รหัส, ค่า] และ top_features เป็น [feature, value, contribution]
+    ข้อความของรหัสอยู่ใน result_formats.result_labels
+    memo: ใช้ผลเดิมของ student_id ที่ข้อมูลไม่เปลี่ยนตั้งแต่ครั้งก่อน คำนวณเฉพาะแถวใหม่/แถวที่เปลี่ยน
+    คืนค่า (columns, {"reused": จำนวนแถวที่ใช้ผลเดิม, "recomputed": จำนวนแถวที่คำนวณ})
+    """
+    explain = _explain_mode(explain)
+    n_rows = len(df)
+    with stage_timer("feature_engineering"):
+        inputs = normalize_inputs(df)
+
+    student_ids = _nullable_column(df, "student_id")
+    columns: Dict[str, List] = {
+        "row_index": df.index.astype(int).tolist(),
+        "student_id": student_ids,
+        "name": _nullable_column(df, "name"),
+        "prediction": [0] * n_rows,
+        "dropout_probability": [0.0] * n_rows,
+        "risk_level": [None] * n_rows,
+        "model_backend": [None] * n_rows,
+        "explanations": [None] * n_rows,
+        "top_features": [None] * n_rows,
+    }
+
+    todo = np.arange(n_rows)
+    if memo is not None and memo.enabled:
+        with stage_timer("memo_lookup"):
+            keys = [None if sid is None else str(sid) for sid in student_ids]
+            hashes = row_hashes(inputs).tolist()
+            signature = memo_signature(predictor, explain)
+            stored = memo.lookup([k for k in keys if k is not None], signature)
+            reused = np.zeros(n_rows, dtype=bool)
+            for i, key in enumerate(keys):
+                record = stored.get(key) if key is not None else None
+                if record is None or record[0] != hashes[i]:
+                    continue
+                _, pred, prob, backend, explanations, top_features = record
+                columns["prediction"][i] = pred
+                columns["dropout_probability"][i] = prob
+                columns["risk_level"][i] = predictor.get_risk(prob)[0]
+                columns["model_backend"][i] = backend
+                columns["explanations"][i] = loads(explanations)
+                columns["top_features"][i] = None if top_features is None else loads(top_features)
+                reused[i] = True
+            todo = np.flatnonzero(~reused)
+
+    if len(todo):
+        _score_rows(columns, todo, inputs, predictor, feature_engineer, explain)
+        if memo is not None and memo.enabled:
+            memo.store([
+                (keys[i], hashes[i], signature, columns["prediction"][i], columns["dropout_probability"][i],
+                 columns["model_backend"][i], dumps(columns["explanations"][i]),
+                 None if columns["top_features"][i] is None else dumps(columns["top_features"][i]))
+                for i in todo.tolist() if keys[i] is not None
+            ])
+
+    counts = {"reused": n_rows - len(todo), "recomputed": len(todo)}
+    observe_batch_rows(**counts)
+    return columns, counts
+
+
+def _score_rows(columns: Dict[str, List], rows: np.ndarray, inputs: Dict[str, Any],
+                predictor: DropoutPredictor, feature_engineer: FeatureEngineer, explain: str):
+    """ทำนายแถว rows (index ใน DataFrame) แล้วเขียนผลลงใน columns"""
+    if len(rows) < len(inputs["gpax"]):
+        inputs = {
+            key: [value[i] for i in rows] if isinstance(value, list) else value[rows]
+            for key, value in inputs.items()
+        }
+    with stage_timer("feature_engineering"):
+        features = feature_engineer.create_model_features_batch(**inputs)
+    num_terms = (~np.isnan(inputs["term_gpas"])).sum(axis=1)
+
+    preds, probs, backends = predictor.score_columns(features, num_terms)
+
+    with stage_timer("risk_mapping"):
+        probabilities = probs.astype(float).tolist()
+        risk_levels = [predictor.get_risk(prob)[0] for prob in probabilities]
+        explanations = feature_engineer.get_feature_explanation_codes_batch(features)
+        for j, i in enumerate(rows.tolist()):
+            columns["prediction"][i] = int(preds[j])
+            columns["dropout_probability"][i] = probabilities[j]
+            columns["risk_level"][i] = risk_levels[j]
+            columns["model_backend"][i] = backends[j]
+            columns["explanations"][i] = [[code, value] for code, value in explanations[j]]
+
+    top_features = _top_features(predictor, features, num_terms, backends, risk_levels, explain)
+    if top_features is not None:
+        for j, i in enumerate(rows.tolist()):
+            if top_features[j] is not None:
+                columns["top_features"][i] = [[d["feature"], d["value"], d["contribution"]] for d in top_features[j]]
+
+
+def columns_to_rows(columns: Dict[str, List], predictor: DropoutPredictor,
+                    feature_engineer: FeatureEngineer) -> List[Dict[str, Any]]:
+    """ผลแบบคอลัมน์ -> หนึ่ง dict ต่อแถว (รูปแบบ JSON เดิมของ /batch-predict พร้อมข้อความภาษาไทย)"""
+    with stage_timer("risk_mapping"):
+        results: List[Dict[str, Any]] = []
+        for i in range(len(columns["row_index"])):
+            pred = columns["prediction"][i]
+            prob = columns["dropout_probability"][i]
+            top_features = columns["top_features"][i]
+            results.append({
+                "row_index": columns["row_index"][i],
+                "student_id": columns["student_id"][i],
+                "name": columns["name"][i],
+                "prediction": pred,
+                "prediction_label": PREDICTION_LABELS[pred],
+                "dropout_probability": prob,
+                "dropout_percentage": f"{prob*100:.1f}%",
+                "risk_level": columns["risk_level"][i],
+                "risk_color": predictor.get_risk(prob)[1],
+                "feature_explanations": {
+                    code: feature_engineer.render_explanation(code, value)
+                    for code, value in columns["explanations"][i]
+                },
+                "model_backend": columns["model_backend"][i],
+                "top_features": None if top_features is None else [
+                    {"feature": feature, "label": FEATURE_LABELS.get(feature, feature),
+                     "value": value, "contribution": contribution}
+                    for feature, value, contribution in top_features
+                ],
+            })
+    return results
+
+
+def _explain_mode(explain: Optional[str]) -> str:
+    explain = explain or settings.BATCH_EXPLAIN
+    if explain not in EXPLAIN_MODES:
+        raise ValueError(f"explain must be one of {', '.join(EXPLAIN_MODES)}")
+    return explain
+
+
+def _top_features(predictor: DropoutPredictor, features: Dict[str, np.ndarray], num_terms: np.ndarray,
+                  backends: List[str], risk_levels: List[str], explain: str) -> Optional[List]:
+    """top_features ตาม explain (None = ไม่มีแถวที่ต้องอธิบาย)"""
+    if explain == "none":
+        return None
+    rows = None if explain == "all" else np.array([risk == "High" for risk in risk_levels], dtype=bool)
+    if rows is not None and not rows.any():
+        return None
+    return predictor.explain_columns(features, num_terms, backends, rows=rows)
+
+
+def _nullable_column(df: "pd.DataFrame", column: str) -> List:
+    """ค่าของคอลัมน์ (ช่องว่าง/ไม่มีคอลัมน์ = None)"""
+    if column not in df.columns:
+        return [None] * len(df)
+    values = df[column].astype(object)
+    return values.where(values.notna(), None).tolist()
+
+
+def encode_ndjson(results: List[Dict[str, Any]]) -> bytes:
+    """แปลงผลลัพธ์เป็น NDJSON (หนึ่ง JSON object ต่อบรรทัด)"""
+    with stage_timer("serialization"):
+        return b"".join(dumps(r) + b"\n" for r in results)
+
+
+def encode_csv(results: List[Dict[str, Any]], include_header: bool = True) -> bytes:
+    """แปลงผลลัพธ์เป็น CSV ตาม RESULT_COLUMNS (feature_explanations, top_features เก็บเป็น JSON string)"""
+    with stage_timer("serialization"):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        if include_header:
+            writer.writerow(RESULT_COLUMNS)
+        for r in results:
+            writer.writerow(["" if value is None else value for value in flatten_result(r)])
+        return buffer.getvalue().encode("utf-8")
+
+
+def flatten_result(result: Dict[str, Any]) -> List[Any]:
+    """ค่าของหนึ่งแถวตามลำดับ RESULT_COLUMNS แบบเดียวกับใน CSV (คอลัมน์ JSON_COLUMNS เป็น JSON string)"""
+    row = []
+    for col in RESULT_COLUMNS:
+        value = result.get(col)
+        if col in JSON_COLUMNS and (value is not None or col == "feature_explanations"):
+            value = json.dumps(value or {}, ensure_ascii=False)
+        row.append(value)
+    return row
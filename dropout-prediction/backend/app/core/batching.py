@@ -0,0 +1,241 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from ..config import settings
+from ..models.ml_model import DropoutPredictor, predictor
+from .executors import run_inference
+from .metrics import metrics, observe_fallback, stage_timer
+
+
+class BatcherOverloaded(RuntimeError):
+    """คิวของ micro-batcher เต็ม"""
+
+
+class MicroBatcher:
+    """
+    รวม request ที่เข้ามาพร้อมกันสำหรับ model เดียวกันเป็น matrix เดียว
+    แต่ละ model key มีคิวของตัวเอง จะ flush เมื่อครบ max_batch_size แถว
+    หรือเมื่อรอครบ max_wait_ms นับจากแถวแรกในคิว แล้วส่งผลคืนให้แต่ละ request
+    request ที่ขอ explain ได้ top features ที่คำนวณใน inference job เดียวกับการทำนายของ batch นั้น
+    """
+
+    # ขอบบนของ bucket สำหรับนับขนาด batch
+    BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+    def __init__(self,
+                 predictor: DropoutPredictor,
+                 max_batch_size: int = 64,
+                 max_wait_ms: float = 2.0,
+                 max_queue: int = 4096):
+        self.predictor = predictor
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.max_queue = max_queue
+
+        self._pending: Dict[str, List[Tuple[List[float], asyncio.Future, float, bool]]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._queue_depth = 0
+        self._tasks = set()
+
+        self._requests = 0
+        self._rejected = 0
+        self._cache_hits = 0
+        self._batches = 0
+        self._rows = 0
+        self._size_flushes = 0
+        self._timeout_flushes = 0
+        self._max_batch_seen = 0
+        self._wait_seconds_total = 0.0
+        self._batch_size_counts = {b: 0 for b in self.BATCH_SIZE_BUCKETS}
+        self._batch_size_counts["+Inf"] = 0
+
+    async def predict(self, data: Dict, num_terms: Optional[int] = None,
+                      explain: bool = False) -> Tuple[int, float, Optional[List[Dict[str, Any]]]]:
+        """
+        ทำนายหนึ่งแถวผ่านคิว คืนค่า (prediction, probability) เหมือน DropoutPredictor.predict
+        และ top features ของ tree model (None ถ้า explain=False)
+        """
+        if not self.predictor.model_loaded:
+            raise RuntimeError("Models not loaded")
+        if num_terms is None:
+            num_terms = self.predictor.count_terms(data)
+        model_key = self.predictor.get_model_for_term(num_terms)
+        if self.predictor.models[model_key] is None:
+            raise RuntimeError(f"Model {model_key} not loaded")
+
+        self._requests += 1
+        with stage_timer("feature_engineering", model_key):
+            vector = self.predictor.build_feature_vector(data, model_key)
+        # ผลอยู่ใน cache แล้ว ไม่ต้องรอคิว (ยกเว้นต้องคำนวณ explanation ด้วย)
+        cached = None if explain else self.predictor.cached_prediction(model_key, vector)
+        if cached is not None:
+            self._cache_hits += 1
+            return (*cached, None)
+
+        if self._queue_depth >= self.max_queue:
+            self._rejected += 1
+            raise BatcherOverloaded(f"Prediction queue is full ({self.max_queue} pending)")
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        queue = self._pending.setdefault(model_key, [])
+        queue.append((vector, future, time.perf_counter(), explain))
+        self._queue_depth += 1
+
+        if len(queue) >= self.max_batch_size:
+            self._size_flushes += 1
+            self._flush(model_key)
+        elif model_key not in self._timers:
+            self._timers[model_key] = loop.call_later(self.max_wait_ms / 1000, self._on_timeout, model_key)
+
+        return await future
+
+    def _on_timeout(self, model_key: str):
+        self._timers.pop(model_key, None)
+        if self._pending.get(model_key):
+            self._timeout_flushes += 1
+            self._flush(model_key)
+
+    def _flush(self, model_key: str):
+        timer = self._timers.pop(model_key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(model_key, [])
+        if not batch:
+            return
+        self._queue_depth -= len(batch)
+        self._record_batch(batch)
+
+        # ทำนายใน inference thread pool เพื่อไม่ให้บล็อก event loop
+        task = asyncio.ensure_future(self._score(model_key, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _score(self, model_key: str, batch: list):
+        try:
+            vectors = [vector for vector, _, _, _ in batch]
+            explain_rows = [i for i, (_, _, _, explain) in enumerate(batch) if explain]
+            preds, probs, drivers = await run_inference(self._score_batch, model_key, vectors, explain_rows)
+        except Exception as e:
+            for _, future, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for i, (_, future, _, _) in enumerate(batch):
+            if not future.done():
+                future.set_result((int(preds[i]), float(probs[i]), drivers[i]))
+
+    def _score_batch(self, model_key: str, vectors: list, explain_rows: List[int]):
+        """ทำนายทั้ง batch แล้วคำนวณ top features ของแถวที่ขอ ด้วยชุด model เดียวกัน (รันใน inference pool)"""
+        model_set = self.predictor.active_set
+        preds, probs = self.predictor.predict_vectors(model_key, vectors, lookup=False, model_set=model_set)
+        drivers: List[Optional[List[Dict[str, Any]]]] = [None] * len(vectors)
+        if explain_rows:
+            explained = self.predictor.explain_vectors(model_key, [vectors[i] for i in explain_rows], model_set)
+            for i, row in zip(explain_rows, explained):
+                drivers[i] = row
+        return preds, probs, drivers
+
+    def _record_batch(self, batch: list):
+        size = len(batch)
+        now = time.perf_counter()
+        self._batches += 1
+        self._rows += size
+        self._max_batch_seen = max(self._max_batch_seen, size)
+        self._wait_seconds_total += sum(now - enqueued for _, _, enqueued, _ in batch)
+        for bound in self.BATCH_SIZE_BUCKETS:
+            if size <= bound:
+                self._batch_size_counts[bound] += 1
+                break
+        else:
+            self._batch_size_counts["+Inf"] += 1
+
+    def stats(self) -> Dict:
+        """ค่าตั้งค่าและตัวชี้วัดของ micro-batcher"""
+        return {
+            "enabled": settings.MICROBATCH_ENABLED,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "max_queue": self.max_queue,
+            "queue_depth": self._queue_depth,
+            "requests": self._requests,
+            "rejected": self._rejected,
+            "cache_hits": self._cache_hits,
+            "batches": self._batches,
+            "rows": self._rows,
+            "size_flushes": self._size_flushes,
+            "timeout_flushes": self._timeout_flushes,
+            "avg_batch_size": self._rows / self._batches if self._batches else 0.0,
+            "max_batch_size_seen": self._max_batch_seen,
+            "avg_wait_ms": self._wait_seconds_total / self._rows * 1000 if self._rows else 0.0,
+            "batch_size_counts": {str(k): v for k, v in self._batch_size_counts.items()},
+        }
+
+
+batcher = MicroBatcher(
+    predictor,
+    max_batch_size=settings.MICROBATCH_MAX_SIZE,
+    max_wait_ms=settings.MICROBATCH_MAX_WAIT_MS,
+    max_queue=settings.MICROBATCH_MAX_QUEUE,
+)
+
+metrics.gauge(
+    "dropout_microbatch_queue_depth", "Requests waiting in the micro-batcher queues", (),
+    lambda: [((), batcher._queue_depth)],
+)
+metrics.counter_callback(
+    "dropout_microbatch_rejected_total", "Requests rejected because the micro-batcher queue was full", (),
+    lambda: [((), batcher._rejected)],
+)
+
+
+async def predict_one(data: Dict, num_terms: Optional[int] = None) -> Tuple[int, float, str]:
+    """
+    ทางเข้าสำหรับ endpoint แบบ interactive: ผ่าน micro-batcher ถ้าเปิดใช้งาน
+    คืนค่า (prediction, probability, backend ที่ใช้: tree / logistic / ensemble)
+    ไม่มี tree model ของ term นั้น หรือคิวเต็ม (FALLBACK_ON_OVERLOAD) = ทำนายด้วย logistic model ทันที
+    """
+    pred, prob, backend, _ = await predict_explained(data, num_terms, explain=False)
+    return pred, prob, backend
+
+
+async def predict_explained(data: Dict, num_terms: Optional[int] = None,
+                            explain: bool = True) -> Tuple[int, float, str, Optional[List[Dict[str, Any]]]]:
+    """
+    เหมือน predict_one และคืน top features (ผลเดียวกับ predictor.explain) เป็นค่าที่สี่
+    tree / ensemble: คำนวณใน micro-batch เดียวกับการทำนาย (ไม่ต้องส่งงานเข้า inference pool อีกรอบ)
+    logistic: คำนวณบน event loop เหมือนการทำนาย, explain=False: top features = None
+    """
+    if num_terms is None:
+        num_terms = predictor.count_terms(data)
+    model_key = predictor.get_model_for_term(num_terms)
+    backend = predictor.serving_backend(model_key)
+    if backend == "logistic":
+        observe_fallback(model_key, "missing_model")
+        return (*predictor.predict_logistic(data, model_key), backend, _explain_logistic(data, num_terms, explain))
+
+    try:
+        if settings.MICROBATCH_ENABLED:
+            pred, prob, top_features = await batcher.predict(data, num_terms=num_terms, explain=explain)
+        else:
+            pred, prob, top_features = await run_inference(_predict_unbatched, data, num_terms, explain)
+    except BatcherOverloaded:
+        if not (settings.FALLBACK_ON_OVERLOAD and model_key in predictor.logistic):
+            raise
+        # logistic model เป็น dot product เดียว ทำบน event loop ได้โดยไม่ต้องรอคิว
+        observe_fallback(model_key, "overload")
+        return (*predictor.predict_logistic(data, model_key), "logistic", _explain_logistic(data, num_terms, explain))
+
+    if backend == "ensemble":
+        pred, prob = predictor.blend(prob, predictor.logistic_probability(data, model_key))
+    return pred, prob, backend, top_features
+
+
+def _predict_unbatched(data: Dict, num_terms: int, explain: bool):
+    pred, prob = predictor.predict(data, num_terms=num_terms)
+    return pred, prob, predictor.explain(data, num_terms, "tree") if explain else None
+
+
+def _explain_logistic(data: Dict, num_terms: int, explain: bool) -> Optional[List[Dict[str, Any]]]:
+    return predictor.explain(data, num_terms, "logistic") if explain else None
@@ -0,0 +1,141 @@
+"""
+ตัวเลขสรุปความเสี่ยงของนักศึกษาทั้งรุ่นใน StudentStore (ตาราง cohort_stats ในฐานข้อมูลเดียวกัน)
+หนึ่งแถวต่อ (คณะ, เพศ, จำนวนเทอม, ระดับความเสี่ยง, ช่อง histogram) เก็บจำนวนและผลรวม
+ทุกครั้งที่เขียนผลทำนาย: ลบค่าของแถวเดิมแล้วบวกค่าใหม่ใน transaction เดียวกัน (ไม่คำนวณใหม่ทั้งรุ่น)
+query จึงอ่านแค่ตารางสรุป (ไม่กี่ร้อยแถว) ไม่ว่าจะมีนักศึกษากี่คน
+"""
+
+import sqlite3
+from typing import Any, Dict, List, Optional, Sequence
+from ..utils.feature_engineering import FeatureEngineer
+
+# จำนวนช่องของ histogram ความน่าจะเป็น (ช่องละ 0.05) เปลี่ยนแล้วต้อง rebuild
+HISTOGRAM_BINS = 20
+DIMENSIONS = ("faculty", "gender", "num_terms", "risk_level")
+RISK_LEVELS = ("Low", "Medium", "High")
+# คณะที่ไม่อยู่ใน faculty_mapping นับรวมเป็น "อื่นๆ"
+OTHER_FACULTY = "อื่นๆ"
+
+_FACULTIES = frozenset(FeatureEngineer().faculty_mapping)
+_KNOWN_FACULTIES = ", ".join("'" + name.replace("'", "''") + "'" for name in sorted(_FACULTIES))
+# คณะตามกลุ่มของ cohort จากตาราง students (alias s)
+FACULTY_SQL = f"CASE WHEN s.faculty IN ({_KNOWN_FACULTIES}) THEN s.faculty ELSE '{OTHER_FACULTY}' END"
+
+_MEASURES = ("students", "probability_sum", "gpax_sum", "gpax_count", "predicted_dropout")
+
+# sign = 1 เพิ่ม, -1 ลบ ผลของนักศึกษาจาก {source} (นับเฉพาะคนที่มีผลทำนายแล้ว)
+_APPLY_SQL = f"""
+    INSERT INTO cohort_stats (faculty, gender, num_terms, risk_level, bucket, {", ".join(_MEASURES)})
+    SELECT {FACULTY_SQL}, s.gender, s.num_terms, p.risk_level,
+           MIN(CAST(p.probability * {HISTOGRAM_BINS} AS INTEGER), {HISTOGRAM_BINS - 1}),
+           :sign * COUNT(*), :sign * SUM(p.probability), :sign * TOTAL(s.gpax), :sign * COUNT(s.gpax),
+           :sign * SUM(p.prediction)
+    FROM {{source}}
+    GROUP BY 1, 2, 3, 4, 5
+    ON CONFLICT (faculty, gender, num_terms, risk_level, bucket) DO UPDATE SET
+        {", ".join(f"{m} = {m} + excluded.{m}" for m in _MEASURES)}
+"""
+_ALL_STUDENTS = "students s JOIN predictions p ON p.student_id = s.student_id"
+_CHANGED_STUDENTS = (
+    "cohort_ids i JOIN students s ON s.student_id = i.student_id "
+    "JOIN predictions p ON p.student_id = i.student_id"
+)
+
+
+def cohort_faculty(faculty: str) -> str:
+    """คณะตามกลุ่มของ cohort (เหมือน FACULTY_SQL)"""
+    return faculty if faculty in _FACULTIES else OTHER_FACULTY
+
+
+def create_tables(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS cohort_stats (
+            faculty TEXT NOT NULL,
+            gender TEXT NOT NULL,
+            num_terms INTEGER NOT NULL,
+            risk_level TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            students INTEGER NOT NULL,
+            probability_sum REAL NOT NULL,
+            gpax_sum REAL NOT NULL,
+            gpax_count INTEGER NOT NULL,
+            predicted_dropout INTEGER NOT NULL,
+            PRIMARY KEY (faculty, gender, num_terms, risk_level, bucket)
+        )
+    """)
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS cohort_ids (student_id TEXT PRIMARY KEY)")
+
+
+def rebuild(conn: sqlite3.Connection):
+    """คำนวณตารางสรุปใหม่จากทุกแถว (ใช้ตอนสร้างตารางครั้งแรกกับฐานข้อมูลที่มีผลทำนายอยู่แล้ว)"""
+    conn.execute("DELETE FROM cohort_stats")
+    conn.execute(_APPLY_SQL.format(source=_ALL_STUDENTS), {"sign": 1})
+
+
+def mark_changed(conn: sqlite3.Connection, student_ids: Sequence[str]):
+    """student_id ที่จะถูกเขียนใน transaction นี้ (เรียกก่อน subtract_changed/add_changed)"""
+    conn.execute("DELETE FROM cohort_ids")
+    conn.executemany("INSERT OR IGNORE INTO cohort_ids (student_id) VALUES (?)", ((sid,) for sid in student_ids))
+
+
+def subtract_changed(conn: sqlite3.Connection):
+    """ลบค่าเดิมของนักศึกษาที่ mark ไว้ (เรียกก่อนเขียน students/predictions)"""
+    conn.execute(_APPLY_SQL.format(source=_CHANGED_STUDENTS), {"sign": -1})
+
+
+def add_changed(conn: sqlite3.Connection):
+    """บวกค่าใหม่ของนักศึกษาที่ mark ไว้ (เรียกหลังเขียน)"""
+    conn.execute(_APPLY_SQL.format(source=_CHANGED_STUDENTS), {"sign": 1})
+    conn.execute("DELETE FROM cohort_stats WHERE students = 0")
+
+
+def query(conn: sqlite3.Connection, group_by: Sequence[str],
+          filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    จำนวน ค่าเฉลี่ย และ histogram ของแต่ละกลุ่มตาม group_by (ส่วนหนึ่งของ DIMENSIONS)
+    filters: {dimension: ค่า} เฉพาะนักศึกษาที่ตรงทุกเงื่อนไข
+    """
+    unknown = [dim for dim in [*group_by, *(filters or {})] if dim not in DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown cohort dimension: {', '.join(unknown)}")
+    filters = {k: v for k, v in (filters or {}).items() if v is not None}
+    where = " AND ".join(f"{dim} = :{dim}" for dim in filters) or "1"
+    keys = ", ".join([*group_by, "risk_level", "bucket"])
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    rows = cursor.execute(
+        f"SELECT {keys}, {', '.join(f'SUM({m})' for m in _MEASURES)} "
+        f"FROM cohort_stats WHERE {where} GROUP BY {keys} ORDER BY {keys}",
+        filters,
+    ).fetchall()
+
+    groups: Dict[tuple, Dict[str, Any]] = {}
+    for row in rows:
+        key = tuple(row[:len(group_by)])
+        risk_level, bucket = row[len(group_by)], row[len(group_by) + 1]
+        students, probability_sum, gpax_sum, gpax_count, predicted_dropout = row[len(group_by) + 2:]
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {
+                **dict(zip(group_by, key)),
+                "students": 0, "probability_sum": 0.0, "gpax_sum": 0.0, "gpax_count": 0, "predicted_dropout": 0,
+                "risk_levels": dict.fromkeys(RISK_LEVELS, 0),
+                "histogram": [0] * HISTOGRAM_BINS,
+            }
+        group["students"] += students
+        group["probability_sum"] += probability_sum
+        group["gpax_sum"] += gpax_sum
+        group["gpax_count"] += gpax_count
+        group["predicted_dropout"] += predicted_dropout
+        group["risk_levels"][risk_level] = group["risk_levels"].get(risk_level, 0) + students
+        group["histogram"][bucket] += students
+
+    result = []
+    for group in groups.values():
+        probability_sum = group.pop("probability_sum")
+        gpax_sum, gpax_count = group.pop("gpax_sum"), group.pop("gpax_count")
+        group["mean_probability"] = round(probability_sum / group["students"], 4)
+        group["mean_gpax"] = round(gpax_sum / gpax_count, 3) if gpax_count else None
+        group["dropout_rate"] = round(group["predicted_dropout"] / group["students"], 4)
+        result.append(group)
+    return result
@@ -0,0 +1,93 @@
+"""
+Executor แยกตามประเภทงาน เพื่อไม่ให้งานหนักไปบล็อก event loop
+- inference: thread pool ขนาดคงที่ (NumPy/XGBoost ปล่อย GIL ระหว่างคำนวณ)
+- parsing: process pool สำหรับอ่านไฟล์ CSV/XLSX ขนาดใหญ่ (pandas/openpyxl ถือ GIL นาน)
+- stream parsing: thread pool สำหรับอ่านไฟล์ทีละ chunk และ encode ผลลัพธ์ batch (ไม่แย่ง inference pool กับ request ทีละคน)
+"""
+
+import asyncio
+import functools
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+from ..config import settings
+
+_inference_executor: Optional[ThreadPoolExecutor] = None
+_parsing_executor: Optional[Executor] = None
+_stream_parsing_executor: Optional[ThreadPoolExecutor] = None
+
+
+def start_executors():
+    """
+    สร้าง pools ตามค่าใน Settings (เรียกตอน startup)
+    worker process ของ parsing pool จะถูก spawn (และ import pandas) เมื่อมีไฟล์แรกเข้ามาเท่านั้น
+    """
+    global _inference_executor, _parsing_executor, _stream_parsing_executor
+    if _inference_executor is None:
+        _inference_executor = ThreadPoolExecutor(
+            max_workers=settings.INFERENCE_THREADS,
+            thread_name_prefix="inference"
+        )
+    if _parsing_executor is None:
+        if settings.PARSING_PROCESSES > 0:
+            _parsing_executor = ProcessPoolExecutor(
+                max_workers=settings.PARSING_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        else:
+            _parsing_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="parsing")
+    if _stream_parsing_executor is None:
+        _stream_parsing_executor = ThreadPoolExecutor(
+            max_workers=settings.STREAM_PARSING_THREADS,
+            thread_name_prefix="stream-parsing"
+        )
+
+
+def shutdown_executors():
+    """ปิด pools (เรียกตอน shutdown)"""
+    global _inference_executor, _parsing_executor, _stream_parsing_executor
+    if _inference_executor is not None:
+        _inference_executor.shutdown(wait=False, cancel_futures=True)
+        _inference_executor = None
+    if _parsing_executor is not None:
+        _parsing_executor.shutdown(wait=False, cancel_futures=True)
+        _parsing_executor = None
+    if _stream_parsing_executor is not None:
+        _stream_parsing_executor.shutdown(wait=False, cancel_futures=True)
+        _stream_parsing_executor = None
+
+
+def _ensure_started():
+    if _inference_executor is None or _parsing_executor is None or _stream_parsing_executor is None:
+        start_executors()
+
+
+async def run_inference(fn: Callable, *args, **kwargs) -> Any:
+    """รันงาน feature engineering / inference ใน inference thread pool"""
+    _ensure_started()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_inference_executor, functools.partial(fn, *args, **kwargs))
+
+
+async def run_parsing(fn: Callable, *args) -> Any:
+    """รันงานอ่านไฟล์ใน parsing pool (fn และ args ต้อง pickle ได้เมื่อใช้ process pool)"""
+    global _parsing_executor
+    _ensure_started()
+    loop = asyncio.get_running_loop()
+    executor = _parsing_executor
+    try:
+        return await loop.run_in_executor(executor, fn, *args)
+    except BrokenProcessPool:
+        # worker ตาย (เช่น OOM) ให้สร้าง pool ใหม่ในการเรียกครั้งถัดไป
+        if _parsing_executor is executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+            _parsing_executor = None
+        raise
+
+
+async def run_stream_parsing(fn: Callable, *args) -> Any:
+    """รันงานอ่านไฟล์ที่ต้องอยู่ใน process เดิม (เช่น next() ของ iter_upload_chunks) หรือ encode ผลลัพธ์ ใน stream parsing pool"""
+    _ensure_started()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_stream_parsing_executor, fn, *args)
@@ -0,0 +1,158 @@
+import io
+from typing import TYPE_CHECKING, BinaryIO, Iterator, List, Optional, Sequence, Tuple
+
+# pandas/openpyxl ใช้เวลา import นาน จึง import ภายในฟังก์ชัน (ครั้งแรกที่มีการอ่านไฟล์)
+# เพื่อให้ service เริ่มทำงานได้เร็วโดยไม่ต้องรอ
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Only required to column year4_term2, year5_term1/year5_term2 optional
+REQUIRED_COLUMNS = [
+    "faculty", "gender", "gpax", "count_f",
+    "year1_term1", "year1_term2", "year2_term1", "year2_term2",
+    "year3_term1", "year3_term2", "year4_term1", "year4_term2"
+]
+OPTIONAL_TERM_COLUMNS = ["year5_term1", "year5_term2"]
+# คอลัมน์ทั้งหมดที่ batch scoring อ่าน (คอลัมน์อื่นในไฟล์ไม่ถูก parse)
+BATCH_COLUMNS = REQUIRED_COLUMNS + OPTIONAL_TERM_COLUMNS + ["student_id", "name"]
+# ชื่อคอลัมน์ในไฟล์ export ของทะเบียน (เช่น cleaning.xlsx) -> ชื่อคอลัมน์ของไฟล์อัปโหลด
+REGISTRAR_COLUMNS = {
+    "STUDENT_ID": "student_id",
+    "FAC_NAME": "faculty",
+    "GENDER_NAME": "gender",
+    "GPA": "gpax",
+    "COUNT_F": "count_f",
+    **{f"TERM{i + 1}": col for i, col in enumerate(REQUIRED_COLUMNS[4:] + OPTIONAL_TERM_COLUMNS)},
+}
+
+
+def upload_kind(filename: str) -> str:
+    """รูปแบบไฟล์จากนามสกุล: excel หรือ csv (นามสกุลอื่นลองอ่านเป็น CSV)"""
+    name = (filename or "uploaded").lower()
+    return "excel" if name.endswith(".xlsx") or name.endswith(".xls") else "csv"
+
+
+def parse_upload(filename: str, content: bytes, columns: Optional[Sequence[str]] = None) -> "pd.DataFrame":
+    """
+    แปลงไฟล์ที่อัปโหลด (CSV/XLSX) เป็น DataFrame
+    columns: อ่านเฉพาะคอลัมน์เหล่านี้ที่มีในไฟล์ (None = ทุกคอลัมน์)
+    เป็นฟังก์ชันระดับ module เพื่อให้ส่งไปรันใน process pool ได้
+    """
+    import pandas as pd
+
+    if upload_kind(filename) == "excel":
+        return _read_excel(io.BytesIO(content), columns)
+    return pd.read_csv(io.BytesIO(content), usecols=_column_filter(columns))
+
+
+def parse_batch_upload(filename: str, content: bytes) -> "pd.DataFrame":
+    """
+    parse_upload เฉพาะ BATCH_COLUMNS ผ่าน upload_cache: ไฟล์ที่เนื้อหาเหมือนเดิมไม่ต้อง parse ซ้ำ
+    (รันใน parsing process pool ได้ ทุก process ใช้ไฟล์ cache ชุดเดียวกัน)
+    """
+    from .upload_cache import upload_cache
+
+    key = upload_cache.key(content, upload_kind(filename), BATCH_COLUMNS)
+    df = upload_cache.get(key)
+    if df is None:
+        df = parse_upload(filename, content, BATCH_COLUMNS)
+        upload_cache.put(key, df)
+    return df
+
+
+def rename_registrar_columns(df: "pd.DataFrame") -> "pd.DataFrame":
+    """เปลี่ยนชื่อคอลัมน์ของไฟล์ export ทะเบียนเป็นรูปแบบไฟล์อัปโหลด (คอลัมน์ที่มีชื่อใหม่อยู่แล้วไม่ถูกแทนที่)"""
+    rename = {src: dst for src, dst in REGISTRAR_COLUMNS.items() if src in df.columns and dst not in df.columns}
+    return df.rename(columns=rename) if rename else df
+
+
+def iter_upload_chunks(fileobj: BinaryIO, filename: str, chunk_size: int,
+                       columns: Optional[Sequence[str]] = None) -> Iterator["pd.DataFrame"]:
+    """
+    อ่านไฟล์ที่อัปโหลดทีละ chunk (ไม่เกิน chunk_size แถว) โดยไม่โหลดทั้งไฟล์เข้าหน่วยความจำ
+    index ของแต่ละ chunk ต่อเนื่องกันเหมือนอ่านทั้งไฟล์ในครั้งเดียว
+    """
+    import pandas as pd
+
+    if upload_kind(filename) == "excel":
+        yield from _iter_excel_chunks(fileobj, chunk_size, columns)
+    else:
+        yield from pd.read_csv(fileobj, chunksize=chunk_size, usecols=_column_filter(columns))
+
+
+def _column_filter(columns: Optional[Sequence[str]]):
+    """usecols ของ pd.read_csv: คอลัมน์ที่ไม่มีในไฟล์ไม่ถือเป็น error"""
+    if columns is None:
+        return None
+    wanted = frozenset(columns)
+    return lambda column: column in wanted
+
+
+def _read_excel(fileobj: BinaryIO, columns: Optional[Sequence[str]]) -> "pd.DataFrame":
+    """ทั้งไฟล์เป็น DataFrame เดียว ด้วย read_only mode เดียวกับ _iter_excel_chunks (เร็วกว่า pd.read_excel)"""
+    import pandas as pd
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        names, rows = _excel_rows(workbook.active, columns)
+        return pd.DataFrame(list(rows), columns=names)
+    finally:
+        workbook.close()
+
+
+def _iter_excel_chunks(fileobj: BinaryIO, chunk_size: int,
+                       columns: Optional[Sequence[str]] = None) -> Iterator["pd.DataFrame"]:
+    # read_only mode ของ openpyxl อ่านแถวแบบ streaming แทนการสร้าง workbook ทั้งไฟล์
+    import pandas as pd
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        names, rows = _excel_rows(workbook.active, columns)
+        start = 0
+        buffer = []
+        for row in rows:
+            buffer.append(row)
+            if len(buffer) >= chunk_size:
+                yield pd.DataFrame(buffer, columns=names, index=range(start, start + len(buffer)))
+                start += len(buffer)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=names, index=range(start, start + len(buffer)))
+    finally:
+        workbook.close()
+
+
+def _excel_rows(worksheet, columns: Optional[Sequence[str]]) -> Tuple[List[str], Iterator[tuple]]:
+    """
+    ชื่อคอลัมน์ (จากแถวแรก) และ iterator ของแถวข้อมูลที่ไม่ว่าง
+    columns: เก็บเฉพาะคอลัมน์เหล่านี้ (ค่าของคอลัมน์อื่นไม่ถูกคัดลอกเข้า DataFrame)
+    """
+    rows = worksheet.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return [], iter(())
+    names = [str(c) if c is not None else f"Unnamed: {i}" for i, c in enumerate(header)]
+    keep = list(range(len(names))) if columns is None else [i for i, n in enumerate(names) if n in set(columns)]
+    width = len(names)
+
+    def data_rows() -> Iterator[tuple]:
+        for row in rows:
+            if all(v is None for v in row):
+                continue
+            if len(row) < width:
+                row = row + (None,) * (width - len(row))
+            yield tuple(row[i] for i in keep)
+
+    return [names[i] for i in keep], data_rows()
+
+
+def count_upload_rows(fileobj: BinaryIO, filename: str) -> int:
+    """นับจำนวนแถวข้อมูล (ไม่รวม header) โดยไม่โหลดทั้งไฟล์"""
+    import pandas as pd
+
+    name = (filename or "uploaded").lower()
+    if name.endswith(".xlsx") or name.endswith(".xls"):
+        return sum(len(chunk) for chunk in _iter_excel_chunks(fileobj, 10000))
+    return sum(len(chunk) for chunk in pd.read_csv(fileobj, usecols=[0], chunksize=100000))
@@ -0,0 +1,150 @@
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+JOB_STATUSES = ("queued", "running", "completed", "failed")
+
+
+class JobStore:
+    """
+    เก็บสถานะของ batch job ใน SQLite เพื่อให้อยู่รอดหลัง restart
+    ไฟล์อินพุต/ผลลัพธ์ของแต่ละ job อยู่ใน jobs_dir/<job_id>/
+    """
+
+    def __init__(self, db_path: str, jobs_dir: str):
+        self.db_path = Path(db_path)
+        self.jobs_dir = Path(jobs_dir)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def open(self):
+        if self._conn is not None:
+            return
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                filename TEXT NOT NULL,
+                status TEXT NOT NULL,
+                total_rows INTEGER,
+                rows_done INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                finished_at REAL
+            )
+        """)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def job_dir(self, job_id: str) -> Path:
+        return self.jobs_dir / job_id
+
+    def input_path(self, job_id: str, filename: str) -> Path:
+        suffix = Path(filename).suffix.lower() or ".csv"
+        return self.job_dir(job_id) / f"input{suffix}"
+
+    def result_path(self, job_id: str) -> Path:
+        return self.job_dir(job_id) / "result.ndjson"
+
+    def create(self, job_id: str, filename: str, max_unfinished: Optional[int] = None) -> bool:
+        """
+        เพิ่ม job ใหม่ (queued)
+        max_unfinished: ไม่เพิ่มและคืน False ถ้ามี job ที่ยังไม่เสร็จครบจำนวนนี้แล้ว
+        นับและเพิ่มใน transaction เดียว (BEGIN IMMEDIATE) จึงไม่เกินจำนวนแม้หลาย worker process เพิ่มพร้อมกัน
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if max_unfinished is not None:
+                    unfinished = self._conn.execute(
+                        "SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')"
+                    ).fetchone()[0]
+                    if unfinished >= max_unfinished:
+                        self._conn.execute("ROLLBACK")
+                        return False
+                self._conn.execute(
+                    "INSERT INTO jobs (id, filename, status, created_at, updated_at) VALUES (?, ?, 'queued', ?, ?)",
+                    (job_id, filename, now, now)
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return True
+
+    def delete(self, job_id: str, unless_running: bool = False) -> bool:
+        """
+        ลบสถานะและไฟล์ทั้งหมดของ job คืน False ถ้าไม่ได้ลบ
+        unless_running: ไม่ลบ job ที่กำลังรัน ตรวจสถานะและลบใน DELETE เดียว
+        จึงไม่ชนกับ claim ของ worker ที่เริ่มรัน job เดียวกันพร้อมกัน
+        """
+        query = "DELETE FROM jobs WHERE id = ?"
+        if unless_running:
+            query += " AND status != 'running'"
+        with self._lock:
+            deleted = self._conn.execute(query, (job_id,)).rowcount > 0
+        if deleted:
+            shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+        return deleted
+
+    def claim(self, job_id: str) -> Optional[Dict]:
+        """
+        เปลี่ยน job จาก queued เป็น running ใน UPDATE เดียว คืน job ที่ claim ได้
+        คืน None ถ้า job ถูกลบไปแล้วหรือไม่ได้อยู่ในสถานะ queued (เช่น worker อื่น claim ไปก่อน)
+        """
+        with self._lock:
+            claimed = self._conn.execute(
+                "UPDATE jobs SET status = 'running', rows_done = 0, error = NULL, updated_at = ? "
+                "WHERE id = ? AND status = 'queued'", (time.time(), job_id)
+            ).rowcount > 0
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone() if claimed else None
+        return dict(row) if row else None
+
+    def list_finished_before(self, timestamp: float) -> List[str]:
+        """id ของ job ที่เสร็จ (completed/failed) ก่อนเวลา timestamp"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (timestamp,)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def update(self, job_id: str, **fields):
+        if not fields:
+            return
+        fields["updated_at"] = time.time()
+        if fields.get("status") in ("completed", "failed"):
+            fields["finished_at"] = fields["updated_at"]
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list_unfinished(self) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def count_unfinished(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')"
+            ).fetchone()[0]
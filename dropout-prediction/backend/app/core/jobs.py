@@ -0,0 +1,180 @@
+import logging
+import shutil
+import time
+import uuid
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional
+from ..config import resolve_path, settings
+from ..models.ml_model import DropoutPredictor, predictor
+from ..utils.feature_engineering import FeatureEngineer
+from .batch_scoring import encode_ndjson, missing_columns, score_dataframe
+from .ingestion import BATCH_COLUMNS, REQUIRED_COLUMNS, count_upload_rows, iter_upload_chunks
+from .job_store import JobStore
+from .score_memo import score_memo
+
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFull(RuntimeError):
+    """มี job ที่ยังไม่เสร็จเกินจำนวนที่กำหนด"""
+
+
+class InvalidJobInput(ValueError):
+    """ไฟล์อินพุตอ่านไม่ได้หรือขาดคอลัมน์ที่จำเป็น"""
+
+
+class JobRunning(RuntimeError):
+    """job กำลังรันอยู่ (ลบไม่ได้)"""
+
+
+class JobManager:
+    """
+    รัน batch job เบื้องหลังด้วย worker pool ขนาดจำกัด (MAX_CONCURRENT_JOBS)
+    job ที่ค้างอยู่ (queued/running) ตอนปิด service จะถูกรันใหม่ตั้งแต่ต้นเมื่อ start อีกครั้ง
+    job ที่เสร็จแล้วเกิน retention_hours ถูกลบ (สถานะและไฟล์) ตอน start และทุกครั้งที่มี job ใหม่
+    """
+
+    def __init__(self, store: JobStore, predictor: DropoutPredictor, max_workers: int, max_pending: int,
+                 retention_hours: float = 24.0):
+        self.store = store
+        self.predictor = predictor
+        self.feature_engineer = FeatureEngineer()
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retention_hours = retention_hours
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def start(self, resume: bool = True):
+        """
+        resume: รัน job ที่ค้างจากครั้งก่อนใหม่ (เมื่อมีหลาย worker ให้ทำเพียงตัวเดียว ไม่งั้น job จะถูกรันซ้ำ)
+        """
+        if self._executor is not None:
+            return
+        self.store.open()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="batch-job")
+        self.purge_expired()
+        if not resume:
+            return
+        for job in self.store.list_unfinished():
+            logger.info("🔁 Resuming batch job %s (%s)", job["id"], job["status"])
+            self.store.update(job["id"], status="queued", rows_done=0, error=None)
+            self._executor.submit(self._run, job["id"])
+
+    def shutdown(self):
+        if self._executor is not None:
+            # job ที่ยังไม่เสร็จยังเป็น queued/running ใน store และจะถูกรันใหม่ตอน start
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self.store.close()
+
+    def submit(self, filename: str, fileobj) -> Dict:
+        """
+        บันทึกไฟล์อินพุตลงดิสก์ ตรวจคอลัมน์จากส่วนต้นของไฟล์ สร้าง job แล้วส่งเข้าคิว
+        ไฟล์ที่อ่านไม่ได้หรือขาดคอลัมน์ถูกปฏิเสธทันที (InvalidJobInput) ไม่ต้องรอให้ job รันแล้ว failed
+        """
+        self.start()
+        self.purge_expired()
+        # ตรวจคร่าวๆ ก่อนเขียนไฟล์ (จำนวนที่แน่นอนตรวจอีกครั้งใน transaction เดียวกับการเพิ่ม job)
+        if self.store.count_unfinished() >= self.max_pending:
+            raise JobQueueFull(f"Too many pending batch jobs (limit {self.max_pending})")
+
+        job_id = uuid.uuid4().hex
+        input_path = self.store.input_path(job_id, filename)
+        input_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            with open(input_path, "wb") as out:
+                while True:
+                    block = fileobj.read(1 << 20)
+                    if not block:
+                        break
+                    out.write(block)
+            self._check_columns(input_path, filename)
+            if not self.store.create(job_id, filename, max_unfinished=self.max_pending):
+                raise JobQueueFull(f"Too many pending batch jobs (limit {self.max_pending})")
+        except BaseException:
+            shutil.rmtree(input_path.parent, ignore_errors=True)
+            raise
+
+        self._executor.submit(self._run, job_id)
+        return self.store.get(job_id)
+
+    def delete(self, job_id: str) -> bool:
+        """
+        ลบ job และไฟล์อินพุต/ผลลัพธ์ (job ที่ยัง queued จะไม่ถูกรัน)
+        คืน False ถ้าไม่มี job นี้, job ที่กำลังรันลบไม่ได้ (JobRunning)
+        """
+        if self.store.delete(job_id, unless_running=True):
+            return True
+        if self.store.get(job_id) is None:
+            return False
+        raise JobRunning(f"Batch job {job_id} is running")
+
+    def purge_expired(self) -> int:
+        """ลบ job ที่เสร็จแล้วนานเกิน retention_hours (0 = เก็บไว้ตลอด) คืนจำนวนที่ลบ"""
+        if self.retention_hours <= 0:
+            return 0
+        expired = self.store.list_finished_before(time.time() - self.retention_hours * 3600)
+        for job_id in expired:
+            self.store.delete(job_id)
+        if expired:
+            logger.info("🧹 Removed %d expired batch jobs", len(expired))
+        return len(expired)
+
+    @staticmethod
+    def _check_columns(input_path: Path, filename: str):
+        try:
+            with open(input_path, "rb") as f, \
+                    closing(iter_upload_chunks(f, filename, 1, BATCH_COLUMNS)) as head:
+                first = next(head, None)
+        except Exception as e:
+            raise InvalidJobInput(f"Cannot parse file: {str(e)}")
+        missing = missing_columns(first) if first is not None else list(REQUIRED_COLUMNS)
+        if missing:
+            raise InvalidJobInput(f"Missing columns: {', '.join(missing)}")
+
+    def _run(self, job_id: str):
+        # queued -> running ใน UPDATE เดียว: job ที่ถูกลบระหว่างรอคิวจะไม่ถูกรัน (และลบไม่ได้อีกเมื่อเริ่มรันแล้ว)
+        job = self.store.claim(job_id)
+        if job is None:
+            return
+        input_path = self.store.input_path(job_id, job["filename"])
+        result_path = self.store.result_path(job_id)
+
+        try:
+            with open(input_path, "rb") as f:
+                total = count_upload_rows(f, job["filename"])
+            self.store.update(job_id, total_rows=total)
+
+            rows_done = 0
+            with open(input_path, "rb") as f, open(result_path, "wb") as out, \
+                    closing(iter_upload_chunks(f, job["filename"], settings.BATCH_CHUNK_SIZE,
+                                               BATCH_COLUMNS)) as chunks:
+                for i, chunk in enumerate(chunks):
+                    if i == 0:
+                        missing = missing_columns(chunk)
+                        if missing:
+                            raise ValueError(f"Missing columns: {', '.join(missing)}")
+                    results = score_dataframe(chunk, self.predictor, self.feature_engineer, memo=score_memo)
+                    out.write(encode_ndjson(results))
+                    out.flush()
+                    rows_done += len(results)
+                    self.store.update(job_id, rows_done=rows_done)
+
+            self.store.update(job_id, status="completed", total_rows=rows_done, rows_done=rows_done)
+        except Exception as e:
+            logger.exception("❌ Batch job %s failed: %s", job_id, e)
+            self.store.update(job_id, status="failed", error=str(e))
+        # ไฟล์อินพุตใช้เฉพาะตอนรัน (หรือรันใหม่หลัง restart) เก็บไว้แค่ผลลัพธ์
+        input_path.unlink(missing_ok=True)
+
+
+job_manager = JobManager(
+    JobStore(resolve_path(settings.JOB_DB_PATH), resolve_path(settings.JOB_DIR)),
+    predictor,
+    max_workers=settings.MAX_CONCURRENT_JOBS,
+    max_pending=settings.MAX_PENDING_JOBS,
+    retention_hours=settings.JOB_RETENTION_HOURS,
+)
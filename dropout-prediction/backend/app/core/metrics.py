@@ -0,0 +1,283 @@
+"""
+ตัวชี้วัดของ service ในรูปแบบ Prometheus text format (GET /metrics)
+เขียนเองแบบเบา ๆ ไม่ต้องพึ่ง prometheus_client: counter / histogram เก็บค่าใน dict ต่อชุด label
+การบันทึกหนึ่งครั้งใช้เวลาระดับไมโครวินาที จึงเปิดไว้ใน production ได้
+"""
+
+import contextvars
+import functools
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from ..config import settings
+
+# ขอบบนของ bucket (วินาที) สำหรับเวลาแต่ละขั้นตอน: 50µs - 10s
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+# ขอบบนของ bucket สำหรับจำนวนแถวต่อการเรียก model หนึ่งครั้ง
+BATCH_ROWS_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384, 65536)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[Any]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount: float = 1.0):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labelvalues, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # ต่อชุด label: [จำนวนต่อ bucket (ไม่สะสม) + ช่อง +Inf, ผลรวม]
+        self._values: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labelvalues)
+            if state is None:
+                state = self._values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1])) for k, v in self._values.items())
+        names = self.labelnames + ("le",)
+        for labelvalues, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                labels = _format_labels(names, labelvalues + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class CallbackMetric:
+    """
+    ค่าที่อ่านตอน scrape จาก callback ของส่วนที่เก็บตัวเลขไว้อยู่แล้ว (ความยาวคิว, สถิติ cache)
+    collect() คืนค่า [(label values, value), ...]
+    """
+
+    def __init__(self, name: str, documentation: str, kind: str, labelnames: Sequence[str],
+                 collect: Callable[[], Iterable[Tuple[Tuple, float]]]):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labelvalues, value in self.collect():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._metrics: Dict[str, Any] = {}
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str],
+              collect: Callable[[], Iterable[Tuple[Tuple, float]]]) -> CallbackMetric:
+        return self._register(CallbackMetric(name, documentation, "gauge", labelnames, collect))
+
+    def counter_callback(self, name: str, documentation: str, labelnames: Sequence[str],
+                         collect: Callable[[], Iterable[Tuple[Tuple, float]]]) -> CallbackMetric:
+        return self._register(CallbackMetric(name, documentation, "counter", labelnames, collect))
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry(enabled=settings.METRICS_ENABLED)
+
+REQUESTS = metrics.counter(
+    "dropout_http_requests_total", "HTTP requests by endpoint, method and status code",
+    ("endpoint", "method", "status"),
+)
+REQUEST_LATENCY = metrics.histogram(
+    "dropout_http_request_duration_seconds", "Total HTTP request latency by endpoint", ("endpoint",),
+)
+STAGE_LATENCY = metrics.histogram(
+    "dropout_stage_duration_seconds",
+    "Latency of each processing stage (request_parse, feature_engineering, memo_lookup, inference, explanation, risk_mapping, serialization)",
+    ("stage", "model_key"),
+)
+PREDICTIONS = metrics.counter(
+    "dropout_predictions_total", "Rows scored by each term model", ("model_key",),
+)
+INFERENCE_BATCH_ROWS = metrics.histogram(
+    "dropout_inference_batch_rows", "Rows per model call", ("model_key",), buckets=BATCH_ROWS_BUCKETS,
+)
+
+FALLBACKS = metrics.counter(
+    "dropout_fallback_predictions_total",
+    "Rows scored by the logistic model instead of the tree model (reason: missing_model, overload)",
+    ("model_key", "reason"),
+)
+
+BATCH_ROWS = metrics.counter(
+    "dropout_batch_rows_total",
+    "Batch rows by source (reused: unchanged student row served from the score memo, recomputed)",
+    ("source",),
+)
+
+
+def observe_stage(stage: str, seconds: float, model_key: str = ""):
+    if metrics.enabled:
+        STAGE_LATENCY.observe(seconds, stage, model_key)
+
+
+def observe_inference(model_key: str, rows: int, seconds: float):
+    """บันทึกการเรียก model หนึ่งครั้ง: เวลา จำนวนแถว และจำนวนผลทำนายของ model นั้น"""
+    if metrics.enabled:
+        STAGE_LATENCY.observe(seconds, "inference", model_key)
+        INFERENCE_BATCH_ROWS.observe(rows, model_key)
+        PREDICTIONS.inc(model_key, amount=rows)
+
+
+def observe_fallback(model_key: str, reason: str, rows: int = 1):
+    if metrics.enabled:
+        FALLBACKS.inc(model_key, reason, amount=rows)
+
+
+def observe_batch_rows(reused: int, recomputed: int):
+    if metrics.enabled:
+        BATCH_ROWS.inc("reused", amount=reused)
+        BATCH_ROWS.inc("recomputed", amount=recomputed)
+
+
+class stage_timer:
+    """จับเวลาขั้นตอนหนึ่ง: with stage_timer("feature_engineering"): ..."""
+
+    __slots__ = ("stage", "model_key", "_started")
+
+    def __init__(self, stage: str, model_key: str = ""):
+        self.stage = stage
+        self.model_key = model_key
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe_stage(self.stage, time.perf_counter() - self._started, self.model_key)
+        return False
+
+
+# เวลาต่าง ๆ ของ request ปัจจุบัน: [เริ่มรับ request, endpoint ทำงานเสร็จ]
+_request_times: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("request_times", default=None)
+
+
+def instrument_endpoint(endpoint: Callable) -> Callable:
+    """
+    ครอบ async endpoint เพื่อแยกเวลา request_parse (อ่าน body + ตรวจด้วย pydantic ก่อนเข้า endpoint)
+    และ serialization (หลัง endpoint คืนค่าจนเริ่มส่ง response) ร่วมกับ MetricsMiddleware
+    """
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        times = _request_times.get()
+        if times is not None:
+            observe_stage("request_parse", time.perf_counter() - times[0])
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            if times is not None:
+                times[1] = time.perf_counter()
+    return wrapper
+
+
+class MetricsMiddleware:
+    """ASGI middleware: นับ request และเวลารวมต่อ endpoint (ใช้ path template ของ route)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not metrics.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        times = [started, None]
+        token = _request_times.set(times)
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                if times[1] is not None:
+                    observe_stage("serialization", time.perf_counter() - times[1])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_times.reset(token)
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            REQUESTS.inc(endpoint, scope.get("method", ""), str(status[0]))
+            REQUEST_LATENCY.observe(time.perf_counter() - started, endpoint)
@@ -0,0 +1,384 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from ..config import resolve_path, settings
+from ..models.ml_model import DropoutPredictor, ModelSet, predictor
+from ..utils.feature_engineering import MAX_TERMS, FeatureEngineer
+from . import prefork
+from .batch_scoring import build_features, missing_columns
+from .ingestion import parse_upload
+
+logger = logging.getLogger(__name__)
+
+# คอลัมน์ผลจริง (0 = จบการศึกษา, 1 = ออกกลางคัน) ในไฟล์ holdout
+HOLDOUT_LABEL_COLUMN = "dropout"
+
+
+class ModelValidationError(RuntimeError):
+    """ชุด model ใหม่ไม่ผ่านการตรวจกับ holdout batch"""
+
+    def __init__(self, message: str, report: Dict[str, Any]):
+        super().__init__(message)
+        self.report = report
+
+
+class ModelRegistry:
+    """
+    จัดการชุด model แบบมีเวอร์ชัน: โหลดชุดใหม่ทั้งชุดเบื้องหลัง ตรวจกับ holdout batch
+    แล้วสลับเข้า predictor ในครั้งเดียว (request ที่กำลังทำงานใช้ชุดเดิมจนจบ)
+    เก็บชุดก่อนหน้าไว้สำหรับ rollback และมี file watcher คอยดูไฟล์ใน MODEL_DIR
+    เมื่อมีหลาย worker process: ทุกครั้งที่สลับชุด จะบันทึกเวอร์ชันที่ใช้งานลง state_path
+    watcher ของ worker อื่นอ่านไฟล์นี้แล้วสลับตาม (reload/rollback ผ่าน API จึงมีผลกับทุก worker)
+    """
+
+    def __init__(self,
+                 predictor: DropoutPredictor,
+                 history_size: int = 3,
+                 watch_interval: float = 5.0,
+                 holdout_path: str = "",
+                 min_accuracy: float = 0.6,
+                 max_flip_rate: float = 0.5,
+                 state_path: str = ""):
+        self.predictor = predictor
+        self.feature_engineer = FeatureEngineer()
+        self.history_size = max(1, history_size)
+        self.watch_interval = watch_interval
+        self.holdout_path = holdout_path
+        self.min_accuracy = min_accuracy
+        self.max_flip_rate = max_flip_rate
+        self.state_path = Path(state_path) if state_path else None
+
+        self._history: List[ModelSet] = []
+        self._events = deque(maxlen=50)
+        self._lock = threading.Lock()
+        self._holdout: Optional[Tuple[Dict[str, np.ndarray], np.ndarray, Optional[np.ndarray], str]] = None
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self._signature: Optional[Tuple] = None
+        # id ของ state ล่าสุดที่ worker นี้บันทึกหรือทำตามแล้ว
+        self._state_id: Optional[str] = None
+
+    def preload(self):
+        """
+        โหลดและตรวจชุดแรก (ไม่เริ่ม file watcher)
+        app.serve เรียกใน parent ก่อน fork เพื่อให้ทุก worker ใช้ model ชุดเดียวกันร่วมกัน (copy-on-write)
+        """
+        if self._signature is not None:
+            return
+        self._signature = self._file_signature()
+        with self._lock:
+            if self.predictor.load_models():
+                model_set = self.predictor.active_set
+                model_set.validation = self.validate(model_set)
+                self._remember(model_set)
+                self._record("load", model_set.version, "startup", "activated")
+                self._publish("load", self._signature)
+
+    def start(self):
+        """โหลดชุดแรกตอนเริ่ม service (ถ้ายังไม่ได้ preload) แล้วเริ่ม file watcher"""
+        self.preload()
+        # worker ที่ถูก fork ใหม่แทนตัวที่ตายมี model ชุดที่ parent โหลดตอนเริ่ม:
+        # ทำตาม state ปัจจุบันก่อนรับ request แทนที่จะรอ watcher รอบแรก
+        last_seen = self._follow_state() or self._signature
+        # thread ไม่ติดไปกับ fork: worker แต่ละตัวเริ่ม watcher ของตัวเองและ reload เองเมื่อไฟล์เปลี่ยน
+        if self.watch_interval > 0 and self._watcher is None:
+            self._stop.clear()
+            self._watcher = threading.Thread(
+                target=self._watch, args=(last_seen,), name="model-watcher", daemon=True
+            )
+            self._watcher.start()
+
+    @property
+    def shares_state(self) -> bool:
+        """reload/rollback ของ worker หนึ่งไปถึง worker อื่นหรือไม่ (ต้องมี state_path และ watcher)"""
+        return self.state_path is not None and self.watch_interval > 0
+
+    def shutdown(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=self.watch_interval + 1)
+            self._watcher = None
+
+    def reload(self, reason: str = "manual") -> Dict[str, Any]:
+        """โหลดไฟล์ model ชุดใหม่ ตรวจ แล้วสลับ (ชุดเดิมยังใช้งานต่อถ้าไม่ผ่าน)"""
+        with self._lock:
+            signature = self._file_signature()
+            candidate = self.predictor.build_model_set()
+            active = self.predictor.active_set
+            if active is not None and candidate.version == active.version:
+                self._record("reload", candidate.version, reason, "unchanged")
+                return {"status": "unchanged", "active": active.describe()}
+
+            candidate.validation = self.validate(candidate)
+            if not candidate.validation["passed"]:
+                errors = "; ".join(candidate.validation["errors"])
+                self._record("reload", candidate.version, reason, "rejected", errors)
+                raise ModelValidationError(f"Model set {candidate.version} rejected: {errors}",
+                                           candidate.describe())
+
+            self.predictor.activate(candidate)
+            self._remember(candidate)
+            self._record("reload", candidate.version, reason, "activated")
+            self._publish("reload", signature)
+            logger.info("✅ Activated model set %s (%s)", candidate.version, reason)
+            return {"status": "activated", "active": candidate.describe()}
+
+    def rollback(self, version: Optional[str] = None) -> Dict[str, Any]:
+        """กลับไปใช้ชุดที่ระบุ หรือชุดก่อนหน้าชุดที่ใช้งานอยู่"""
+        with self._lock:
+            active = self.predictor.active_set
+            if version is None:
+                position = next((i for i, s in enumerate(self._history) if s is active), None)
+                if not position:
+                    raise ValueError("No previous model set to roll back to")
+                target = self._history[position - 1]
+            else:
+                target = next((s for s in self._history if s.version == version), None)
+                if target is None:
+                    raise LookupError(f"Unknown model version: {version}")
+
+            if target is not active:
+                self.predictor.activate(target)
+            self._record("rollback", target.version, "manual", "activated")
+            self._publish("rollback", self._file_signature())
+            logger.info("↩️ Rolled back to model set %s", target.version)
+            return {"status": "activated", "active": target.describe()}
+
+    def status(self) -> Dict[str, Any]:
+        active = self.predictor.active_set
+        return {
+            "active_version": active.version if active is not None else None,
+            "model_dir": settings.MODEL_DIR,
+            "watch_interval": self.watch_interval,
+            "watching": self._watcher is not None and self._watcher.is_alive(),
+            "history": [
+                {**s.describe(), "active": s is active} for s in reversed(self._history)
+            ],
+            "events": list(reversed(self._events)),
+            "shared_state": self._read_state(),
+        }
+
+    def validate(self, candidate: ModelSet) -> Dict[str, Any]:
+        """ทำนาย holdout batch ด้วยชุดใหม่ ตรวจความถูกต้องของผลและเทียบกับชุดที่ใช้งานอยู่"""
+        started = time.perf_counter()
+        report: Dict[str, Any] = {
+            "source": None, "rows": 0, "accuracy": None, "flip_rate": None, "mean_abs_diff": None,
+        }
+        errors = []
+        if not candidate.complete:
+            missing = [k for k, model in candidate.models.items() if model is None]
+            errors.append(f"Missing models: {', '.join(missing)}")
+        else:
+            try:
+                features, num_terms, labels, source = self._holdout_batch()
+                report["source"] = source
+                preds, probs = self.predictor.predict_columns(features, num_terms, model_set=candidate)
+                report["rows"] = len(probs)
+                if not np.all(np.isfinite(probs)) or probs.min() < 0 or probs.max() > 1:
+                    errors.append("Probabilities outside [0, 1]")
+
+                if labels is not None:
+                    report["accuracy"] = float((preds == labels).mean())
+                    if report["accuracy"] < self.min_accuracy:
+                        errors.append(f"Holdout accuracy {report['accuracy']:.3f} below {self.min_accuracy}")
+
+                active = self.predictor.active_set
+                if active is not None and active is not candidate and active.complete:
+                    active_preds, active_probs = self.predictor.predict_columns(
+                        features, num_terms, model_set=active
+                    )
+                    report["flip_rate"] = float((active_preds != preds).mean())
+                    report["mean_abs_diff"] = float(np.abs(active_probs - probs).mean())
+                    if report["flip_rate"] > self.max_flip_rate:
+                        errors.append(f"Flip rate {report['flip_rate']:.3f} above {self.max_flip_rate}")
+            except Exception as e:
+                errors.append(f"Holdout scoring failed: {e}")
+
+        report["errors"] = errors
+        report["passed"] = not errors
+        report["ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return report
+
+    def _holdout_batch(self) -> Tuple[Dict[str, np.ndarray], np.ndarray, Optional[np.ndarray], str]:
+        if self._holdout is None:
+            if self.holdout_path:
+                self._holdout = self._load_holdout_file(self.holdout_path)
+            else:
+                self._holdout = self._synthetic_holdout()
+        return self._holdout
+
+    def _load_holdout_file(self, holdout_path: str):
+        path = Path(resolve_path(holdout_path))
+        df = parse_upload(path.name, path.read_bytes())
+        missing = missing_columns(df)
+        if HOLDOUT_LABEL_COLUMN not in df.columns:
+            missing.append(HOLDOUT_LABEL_COLUMN)
+        if missing:
+            raise ValueError(f"Holdout file missing columns: {', '.join(missing)}")
+        features, num_terms = build_features(df, self.feature_engineer)
+        labels = df[HOLDOUT_LABEL_COLUMN].astype(int).to_numpy()
+        return features, num_terms, labels, str(path)
+
+    def _synthetic_holdout(self, n_rows: int = 512, seed: int = 0):
+        """นักศึกษาสังเคราะห์ (seed คงที่) ครอบคลุมทุกจำนวนเทอม ใช้เมื่อไม่มีไฟล์ holdout"""
+        rng = np.random.default_rng(seed)
+        num_terms = rng.integers(1, MAX_TERMS + 1, n_rows)
+        level = rng.uniform(1.0, 3.8, n_rows)[:, None]
+        gpas = np.clip(rng.normal(level, 0.4, (n_rows, MAX_TERMS)), 0.0, 4.0).round(2)
+        gpas[np.arange(MAX_TERMS)[None, :] >= num_terms[:, None]] = np.nan
+        features = self.feature_engineer.create_model_features_batch(
+            faculty=rng.choice(list(self.feature_engineer.faculty_mapping), n_rows).tolist(),
+            gender=rng.choice(list(self.feature_engineer.gender_mapping), n_rows).tolist(),
+            gpax=np.nanmean(gpas, axis=1).round(2),
+            count_f=rng.poisson(0.7, n_rows),
+            term_gpas=gpas
+        )
+        return features, num_terms, None, "synthetic"
+
+    def _remember(self, model_set: ModelSet):
+        self._history = [s for s in self._history if s.version != model_set.version]
+        self._history.append(model_set)
+        active = self.predictor.active_set
+        while len(self._history) > self.history_size:
+            oldest = next(s for s in self._history if s is not active)
+            self._history.remove(oldest)
+
+    def _record(self, action: str, version: Optional[str], reason: str, status: str, detail: str = None):
+        self._events.append({
+            "time": datetime.now().isoformat(),
+            "action": action,
+            "version": version,
+            "reason": reason,
+            "status": status,
+            "detail": detail,
+        })
+
+    def _file_signature(self) -> Tuple:
+        signature = []
+        for term in self.predictor.model_paths:
+            try:
+                stat = self.predictor.model_path(term).stat()
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _publish(self, action: str, signature: Tuple):
+        """
+        บันทึกชุดที่ใช้งานอยู่ลง state_path ให้ worker อื่นทำตาม
+        signature: ไฟล์ model ตอนที่ตัดสินใจ (worker ที่ทำตามไม่นับไฟล์ชุดนี้เป็นการเปลี่ยนแปลงใหม่)
+        """
+        if self.state_path is None:
+            return
+        state = {
+            "id": uuid.uuid4().hex,
+            "version": self.predictor.active_set.version,
+            "action": action,
+            "signature": signature,
+            "worker": prefork.worker_index,
+            "time": datetime.now().isoformat(),
+        }
+        try:
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            # เขียนไฟล์ชั่วคราวแล้ว rename: worker อื่นไม่มีทางอ่านได้ไฟล์ที่เขียนไม่ครบ
+            tmp = self.state_path.with_name(f"{self.state_path.name}.{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(state), encoding="utf-8")
+            os.replace(tmp, self.state_path)
+            self._state_id = state["id"]
+        except OSError as e:
+            logger.warning("⚠️ Cannot write model state %s: %s", self.state_path, e)
+
+    def _read_state(self) -> Optional[Dict[str, Any]]:
+        if self.state_path is None:
+            return None
+        try:
+            state = json.loads(self.state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        state["signature"] = tuple(tuple(s) if s is not None else None for s in state.get("signature") or ())
+        return state
+
+    def _follow(self, state: Dict[str, Any]):
+        """สลับไปใช้ชุดตาม state ที่ worker อื่นบันทึกไว้ (ชุดใน history หรือโหลดใหม่จากไฟล์)"""
+        self._state_id = state["id"]
+        version = state["version"]
+        reason = f"worker {state.get('worker')} {state['action']}"
+        with self._lock:
+            active = self.predictor.active_set
+            if active is not None and active.version == version:
+                return
+            target = next((s for s in self._history if s.version == version), None)
+            if target is None:
+                candidate = self.predictor.build_model_set()
+                if candidate.version != version:
+                    detail = f"model files are version {candidate.version}"
+                    self._record("follow", version, reason, "unavailable", detail)
+                    logger.error("❌ Cannot follow model set %s (%s): %s", version, reason, detail)
+                    return
+                candidate.validation = self.validate(candidate)
+                self.predictor.activate(candidate)
+                self._remember(candidate)
+            else:
+                self.predictor.activate(target)
+            self._record("follow", version, reason, "activated")
+            logger.info("🔄 Switched to model set %s (%s)", version, reason)
+
+    def _follow_state(self) -> Optional[Tuple]:
+        """
+        ทำตาม state ใหม่ของ worker อื่น (ถ้ามี)
+        คืน signature ของไฟล์ที่ worker ต้นทางเห็นตอนตัดสินใจ หรือ None ถ้าไม่มี state ใหม่
+        """
+        state = self._read_state()
+        if state is None or state["id"] == self._state_id:
+            return None
+        try:
+            self._follow(state)
+        except Exception as e:
+            logger.exception("❌ Following model state failed: %s", e)
+        return state["signature"]
+
+    def _watch(self, last_seen: Tuple):
+        pending = None
+        while not self._stop.wait(self.watch_interval):
+            followed = self._follow_state()
+            if followed is not None:
+                # ไฟล์ที่ worker ต้นทางเห็นแล้วไม่ต้อง reload ซ้ำ (และไม่ทับ rollback ที่ทำหลังไฟล์เปลี่ยน)
+                last_seen = followed
+                pending = None
+            signature = self._file_signature()
+            if signature == last_seen:
+                pending = None
+                continue
+            if signature != pending:
+                # รอให้ไฟล์นิ่งอย่างน้อยหนึ่งรอบ (อาจกำลังถูกเขียน/คัดลอกอยู่)
+                pending = signature
+                continue
+
+            last_seen = signature
+            pending = None
+            logger.info("🔁 Model files changed, reloading...")
+            try:
+                self.reload(reason="file watcher")
+            except ModelValidationError as e:
+                logger.error("❌ %s", e)
+            except Exception as e:
+                logger.exception("❌ Model reload failed: %s", e)
+
+
+model_registry = ModelRegistry(
+    predictor,
+    history_size=settings.MODEL_HISTORY_SIZE,
+    watch_interval=settings.MODEL_WATCH_INTERVAL,
+    holdout_path=settings.MODEL_HOLDOUT_PATH,
+    min_accuracy=settings.MODEL_MIN_HOLDOUT_ACCURACY,
+    max_flip_rate=settings.MODEL_MAX_FLIP_RATE,
+    state_path=resolve_path(settings.MODEL_STATE_PATH),
+)
@@ -0,0 +1,67 @@
+"""
+ข้อมูลของ worker process เมื่อรันด้วย `python -m app.serve` (pre-fork) และการใช้หน่วยความจำของแต่ละ process
+worker ทุกตัวถูก fork จาก parent ที่โหลด model ไว้แล้ว: หน้า memory ของ model/library ใช้ร่วมกัน (copy-on-write)
+จนกว่า worker จะเขียนทับ ส่วนที่เป็นของ worker เองจริง ๆ คือ USS (Private_Clean + Private_Dirty)
+"""
+
+import os
+from typing import Any, Dict, Optional
+
+# None = process เดียว (uvicorn app.main:app หรือ WORKERS=1)
+worker_index: Optional[int] = None
+worker_count: int = 1
+# worker ที่ถูก fork ใหม่แทนตัวที่ตาย (ไม่ใช่ตอนเริ่ม service)
+respawned = False
+
+# field ใน /proc/<pid>/smaps_rollup (kB) -> ชื่อใน process_memory()
+_SMAPS_FIELDS = {
+    "Rss": "rss_mb",
+    "Pss": "pss_mb",
+    "Shared_Clean": "shared_mb",
+    "Shared_Dirty": "shared_mb",
+    "Private_Clean": "uss_mb",
+    "Private_Dirty": "uss_mb",
+}
+
+
+def set_worker(index: Optional[int], count: int, respawn: bool = False):
+    global worker_index, worker_count, respawned
+    worker_index = index
+    worker_count = count
+    respawned = respawn
+
+
+def is_primary() -> bool:
+    """
+    worker ที่ทำงานตอนเริ่มซึ่งต้องมีแค่ตัวเดียว (เช่น รัน batch job ที่ค้างจากครั้งก่อน)
+    worker 0 ที่ถูก fork ใหม่ภายหลังไม่นับ: job ที่ worker อื่นกำลังรันอยู่จะไม่ถูกรันซ้ำ
+    """
+    return worker_index in (None, 0) and not respawned
+
+
+def process_memory(pid: Any = "self") -> Dict[str, float]:
+    """
+    rss / pss / shared / uss (MB) ของ process จาก smaps_rollup (Linux)
+    pss = ส่วนแบ่งของหน้าที่ใช้ร่วมกันตามจำนวน process ที่ใช้, uss = หน้าที่เป็นของ process นี้เท่านั้น
+    คืน {} เมื่ออ่านไม่ได้ (ไม่ใช่ Linux หรือ process จบไปแล้ว)
+    """
+    memory = dict.fromkeys(dict.fromkeys(_SMAPS_FIELDS.values()), 0.0)
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in _SMAPS_FIELDS:
+                    memory[_SMAPS_FIELDS[key]] += int(value.split()[0]) / 1024
+    except (OSError, ValueError):
+        return {}
+    return {key: round(value, 1) for key, value in memory.items()}
+
+
+def process_info() -> Dict[str, Any]:
+    return {
+        "pid": os.getpid(),
+        "worker": worker_index,
+        "workers": worker_count,
+        "respawned": respawned,
+        "memory": process_memory(),
+    }
@@ -0,0 +1,180 @@
+"""
+รูปแบบผลลัพธ์ของ /batch-predict: เลือกด้วย ?format= หรือ Accept header
+json (ค่าเริ่มต้น, หนึ่ง object ต่อแถว) / columnar (หนึ่ง array ต่อ field) / csv / parquet / arrow (IPC stream)
+columnar, parquet และ arrow ส่งคำอธิบายเป็นรหัส พร้อมตารางข้อความ (labels) ให้ client แปลเอง
+"""
+
+import io
+import json
+from typing import Any, Dict, List, Optional
+from ..models.ml_model import DropoutPredictor
+from ..utils.feature_engineering import EXPLANATION_TEMPLATES, FEATURE_LABELS
+from .metrics import stage_timer
+
+try:
+    import orjson
+except ImportError:  # ใช้ json มาตรฐานแทน (ช้ากว่าหลายเท่าสำหรับผลลัพธ์ขนาดใหญ่)
+    orjson = None
+
+RESULT_FORMATS = {
+    "json": "application/json",
+    "columnar": "application/vnd.dropout.columnar+json",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+# media type ใน Accept -> format (รวมชื่อเรียกอื่นที่ client นิยมใช้)
+ACCEPT_FORMATS = {
+    **{media_type: name for name, media_type in RESULT_FORMATS.items()},
+    "application/x-parquet": "parquet",
+    "application/vnd.apache.arrow.file": "arrow",
+}
+# format ที่ต้องใช้ pyarrow
+ARROW_FORMATS = ("parquet", "arrow")
+PREDICTION_LABELS = ("Graduate", "Dropout")
+
+
+class FormatUnavailable(RuntimeError):
+    """format ที่ขอต้องใช้ dependency ที่ไม่ได้ติดตั้ง"""
+
+
+def dumps(obj: Any) -> bytes:
+    """JSON เป็น bytes ด้วย orjson (ถ้ามี) รองรับ numpy scalar/array"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    # separators แบบเดียวกับ orjson: ผลลัพธ์เหมือนกันทุก byte ไม่ว่าติดตั้ง orjson หรือไม่
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_json_default).encode("utf-8")
+
+
+def loads(data: Any) -> Any:
+    """อ่าน JSON (str หรือ bytes) ด้วย orjson ถ้ามี"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _json_default(value: Any) -> Any:
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def negotiate_format(requested: Optional[str], accept: Optional[str]) -> str:
+    """
+    format ของผลลัพธ์: ?format= มาก่อน ไม่งั้นเลือก media type ใน Accept ที่ q สูงสุดและรู้จัก
+    Accept ที่ไม่รู้จัก (เช่น */* จาก browser) ได้ json
+    """
+    if requested:
+        return requested
+    candidates = []
+    for position, part in enumerate((accept or "").split(",")):
+        media_type, *params = [p.strip() for p in part.split(";")]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0 and media_type.lower() in ACCEPT_FORMATS:
+            candidates.append((-quality, position, ACCEPT_FORMATS[media_type.lower()]))
+    return min(candidates)[2] if candidates else "json"
+
+
+def ensure_available(result_format: str):
+    if result_format in ARROW_FORMATS:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise FormatUnavailable(f"format={result_format} requires pyarrow")
+
+
+def result_labels(predictor: DropoutPredictor) -> Dict[str, Any]:
+    """ตารางข้อความสำหรับแปลรหัสในผลแบบ columnar/parquet/arrow"""
+    return {
+        "prediction": list(PREDICTION_LABELS),
+        # สีของแต่ละระดับ: ค่าต่ำสุดของแต่ละช่วงใน get_risk
+        "risk_colors": dict(predictor.get_risk(prob) for prob in (0.0, 0.3, 0.6)),
+        "explanations": EXPLANATION_TEMPLATES,
+        "features": FEATURE_LABELS,
+    }
+
+
+def encode_columnar(columns: Dict[str, List], labels: Dict[str, Any],
+                    summary: Optional[Dict[str, Any]] = None) -> bytes:
+    """summary: ค่าระดับผลลัพธ์ที่ใส่ไว้ข้าง count (เช่น จำนวนแถวที่ใช้ผลเดิม/คำนวณใหม่)"""
+    with stage_timer("serialization"):
+        return dumps({
+            "format": "columnar",
+            "count": len(columns["row_index"]),
+            **(summary or {}),
+            "columns": columns,
+            "labels": labels,
+        })
+
+
+def _to_arrow_table(columns: Dict[str, List], labels: Dict[str, Any], summary: Optional[Dict[str, Any]]):
+    import pyarrow as pa
+
+    def text(values: List) -> List[Optional[str]]:
+        # รหัส/ชื่อในไฟล์อาจเป็นตัวเลข: เก็บเป็นข้อความทั้งคอลัมน์
+        return [None if v is None else str(v) for v in values]
+
+    explanation_type = pa.list_(pa.struct([("code", pa.string()), ("value", pa.float64())]))
+    driver_type = pa.list_(pa.struct([
+        ("feature", pa.string()), ("value", pa.float64()), ("contribution", pa.float64()),
+    ]))
+    arrays = {
+        "row_index": pa.array(columns["row_index"], pa.int64()),
+        "student_id": pa.array(text(columns["student_id"]), pa.string()),
+        "name": pa.array(text(columns["name"]), pa.string()),
+        "prediction": pa.array(columns["prediction"], pa.int8()),
+        "dropout_probability": pa.array(columns["dropout_probability"], pa.float64()),
+        "risk_level": pa.array(columns["risk_level"], pa.string()).dictionary_encode(),
+        "model_backend": pa.array(columns["model_backend"], pa.string()).dictionary_encode(),
+        "explanations": pa.array(
+            [[{"code": c, "value": v} for c, v in row] for row in columns["explanations"]],
+            explanation_type,
+        ),
+        "top_features": pa.array(
+            [None if row is None else [{"feature": f, "value": v, "contribution": c} for f, v, c in row]
+             for row in columns["top_features"]],
+            driver_type,
+        ),
+    }
+    metadata = {"dropout.labels": json.dumps(labels, ensure_ascii=False)}
+    if summary:
+        metadata["dropout.summary"] = json.dumps(summary)
+    return pa.table(arrays, metadata=metadata)
+
+
+def encode_arrow(columns: Dict[str, List], labels: Dict[str, Any],
+                 summary: Optional[Dict[str, Any]] = None) -> bytes:
+    """Arrow IPC stream: ตารางข้อความและ summary อยู่ใน schema metadata (dropout.labels, dropout.summary)"""
+    import pyarrow as pa
+
+    with stage_timer("serialization"):
+        table = _to_arrow_table(columns, labels, summary)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+
+def encode_parquet(columns: Dict[str, List], labels: Dict[str, Any],
+                   summary: Optional[Dict[str, Any]] = None) -> bytes:
+    """Parquet (zstd): ตารางข้อความและ summary อยู่ใน schema metadata (dropout.labels, dropout.summary)"""
+    import pyarrow.parquet as pq
+
+    with stage_timer("serialization"):
+        buffer = io.BytesIO()
+        pq.write_table(_to_arrow_table(columns, labels, summary), buffer, compression="zstd")
+        return buffer.getvalue()
+
+
+COLUMNAR_ENCODERS = {
+    "columnar": encode_columnar,
+    "arrow": encode_arrow,
+    "parquet": encode_parquet,
+}
@@ -0,0 +1,109 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from ..config import resolve_path, settings
+
+# จำนวน student_id ต่อหนึ่ง query (ต่ำกว่าขีดจำกัดจำนวน parameter ของ SQLite)
+LOOKUP_CHUNK = 500
+
+
+class ScoreMemo:
+    """
+    ผลทำนายล่าสุดของแต่ละ student_id พร้อม hash ของข้อมูลนำเข้าของแถวนั้น (SQLite)
+    อัปโหลด roster เดิมซ้ำ: แถวที่ hash และ signature (ชุด model + ค่าตั้งที่มีผลต่อผลลัพธ์) ตรงกัน
+    ใช้ผลเดิมได้โดยไม่ต้องสร้าง features/ทำนายใหม่ (หนึ่งแถวต่อ student_id ขนาดจึงไม่เกินจำนวนนักศึกษา)
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = Path(db_path) if db_path else None
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.db_path is not None
+
+    def open(self):
+        with self._lock:
+            if self._conn is not None:
+                return
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS scores (
+                    student_id TEXT PRIMARY KEY,
+                    row_hash INTEGER NOT NULL,
+                    signature TEXT NOT NULL,
+                    prediction INTEGER NOT NULL,
+                    probability REAL NOT NULL,
+                    model_backend TEXT NOT NULL,
+                    explanations BLOB NOT NULL,
+                    top_features BLOB,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            self._conn = conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def lookup(self, student_ids: Iterable[str], signature: str) -> Dict[str, Tuple]:
+        """
+        ผลที่เก็บไว้ของ student_id เหล่านี้ภายใต้ signature เดียวกัน
+        คืนค่า {student_id: (row_hash, prediction, probability, model_backend, explanations, top_features)}
+        """
+        self.open()
+        ids = list(dict.fromkeys(student_ids))
+        found: Dict[str, Tuple] = {}
+        with self._lock:
+            for start in range(0, len(ids), LOOKUP_CHUNK):
+                chunk = ids[start:start + LOOKUP_CHUNK]
+                rows = self._conn.execute(
+                    "SELECT student_id, row_hash, prediction, probability, model_backend, explanations, top_features "
+                    f"FROM scores WHERE signature = ? AND student_id IN ({','.join('?' * len(chunk))})",
+                    [signature, *chunk],
+                )
+                for row in rows:
+                    found[row[0]] = row[1:]
+        return found
+
+    def store(self, records: List[Tuple]):
+        """
+        บันทึก/แทนที่ผลของหลายแถวใน transaction เดียว
+        records: [(student_id, row_hash, signature, prediction, probability, model_backend,
+                   explanations, top_features), ...]
+        """
+        if not records:
+            return
+        self.open()
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO scores (student_id, row_hash, signature, prediction, probability, "
+                    "model_backend, explanations, top_features, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(*record, now) for record in records],
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def stats(self) -> Dict[str, Optional[int]]:
+        if not self.enabled:
+            return {"students": None}
+        self.open()
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM scores").fetchone()
+        return {"students": count}
+
+
+score_memo = ScoreMemo(resolve_path(settings.SCORE_MEMO_PATH))
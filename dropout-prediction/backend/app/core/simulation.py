@@ -0,0 +1,136 @@
+import numpy as np
+from typing import Any, Dict, Optional, Sequence
+from ..models.ml_model import DropoutPredictor
+from ..utils.feature_engineering import MAX_TERMS, FeatureEngineer
+from .metrics import stage_timer
+
+# ชื่อเทอมตามคอลัมน์อินพุต (year1_term1 ... year5_term2)
+TERM_NAMES = [f"year{year}_term{term}" for year in range(1, 6) for term in (1, 2)]
+DISTRIBUTIONS = ("normal", "random_walk")
+# จำนวนเส้นทางเมื่อไม่ระบุ n_paths (ถ้าไม่เกิน max_rows)
+DEFAULT_PATHS = 10000
+
+
+class SimulationTooLarge(ValueError):
+    """n_paths x จำนวนเทอมที่เหลือเกิน max_rows"""
+
+
+def sample_gpa_paths(center: float,
+                     sd: float,
+                     n_paths: int,
+                     n_terms: int,
+                     distribution: str,
+                     rng: np.random.Generator) -> np.ndarray:
+    """
+    สุ่มเกรดรายเทอมขนาด (n_paths x n_terms) ตัดให้อยู่ในช่วง 0-4
+    normal: แต่ละเทอมสุ่มอิสระรอบค่ากลาง, random_walk: เกรดเทอมถัดไปเปลี่ยนจากเทอมก่อนหน้า
+    """
+    noise = rng.standard_normal((n_paths, n_terms)) * sd
+    if distribution == "normal":
+        paths = center + noise
+    elif distribution == "random_walk":
+        paths = center + np.cumsum(noise, axis=1)
+    else:
+        raise ValueError(f"Unknown distribution: {distribution}")
+    return np.clip(paths, 0.0, 4.0)
+
+
+def simulate_trajectories(predictor: DropoutPredictor,
+                          feature_engineer: FeatureEngineer,
+                          faculty: str,
+                          gender: str,
+                          gpax: float,
+                          count_f: int,
+                          term_gpas: Sequence[Optional[float]],
+                          n_paths: Optional[int] = None,
+                          distribution: str = "normal",
+                          gpa_sd: float = 0.4,
+                          recent_terms: int = 2,
+                          gpa_shift: float = 0.0,
+                          percentiles: Sequence[float] = (5, 25, 50, 75, 95),
+                          seed: Optional[int] = None,
+                          max_rows: int = 0) -> Dict[str, Any]:
+    """
+    จำลองเส้นทางเกรดของเทอมที่เหลือ (จนถึง year5_term2) แบบ Monte Carlo
+    สร้าง features ใหม่ทั้งชุดสำหรับทุก (path, เทอม) แล้วทำนายในครั้งเดียวต่อ model
+    โดยแทนค่า features ที่คงที่ (ประวัติเดิม, คณะ, เพศ, ...) ลงใน trees ก่อน
+    คืนค่า percentile ของความน่าจะเป็นการออกกลางคันในแต่ละเทอมอนาคต
+    n_paths: จำนวนเส้นทาง ไม่ระบุ = DEFAULT_PATHS หรือเท่าที่ไม่เกิน max_rows
+    max_rows: จำนวนแถวที่ทำนายได้สูงสุด (n_paths x จำนวนเทอมที่เหลือ, 0 = ไม่จำกัด)
+    n_paths ที่ระบุมาแล้วเกิน = SimulationTooLarge (ไม่ลดจำนวนให้เอง)
+    เวลาทำนายแปรตามจำนวนแถว นักศึกษาที่มีเกรดน้อยเทอมจึงมีเทอมให้จำลองมากและช้ากว่า
+    """
+    history = np.full(MAX_TERMS, np.nan)
+    for i, gpa in enumerate(list(term_gpas)[:MAX_TERMS]):
+        if gpa is not None:
+            history[i] = gpa
+    filled = np.flatnonzero(~np.isnan(history))
+    # เทอมอนาคตเริ่มถัดจากเทอมล่าสุดที่มีเกรด
+    start = int(filled[-1]) + 1 if len(filled) else 0
+    horizon = MAX_TERMS - start
+    if horizon <= 0:
+        raise ValueError("No future terms left to simulate (year5_term2 already recorded)")
+
+    max_paths = max(1, max_rows // horizon) if max_rows > 0 else None
+    if n_paths is None:
+        n_paths = DEFAULT_PATHS if max_paths is None else min(DEFAULT_PATHS, max_paths)
+    elif max_paths is not None and n_paths > max_paths:
+        raise SimulationTooLarge(
+            f"n_paths {n_paths} x {horizon} future terms exceeds {max_rows} rows "
+            f"(at most {max_paths} paths for this student)"
+        )
+
+    recent = history[filled[-recent_terms:]] if len(filled) else np.array([gpax])
+    center = float(np.clip(recent.mean() + gpa_shift, 0.0, 4.0))
+    rng = np.random.default_rng(seed)
+    paths = sample_gpa_paths(center, gpa_sd, n_paths, horizon, distribution, rng)
+
+    # หนึ่งแถวต่อ (เทอมอนาคตที่ s, path): มีเกรดจำลองตั้งแต่เทอมอนาคตแรกจนถึงเทอม s
+    n_rows = horizon * n_paths
+    term_matrix = np.tile(history, (n_rows, 1))
+    for s in range(horizon):
+        term_matrix[s * n_paths:(s + 1) * n_paths, start:start + s + 1] = paths[:, :s + 1]
+    num_terms = len(filled) + 1 + np.repeat(np.arange(horizon), n_paths)
+
+    with stage_timer("feature_engineering"):
+        features = feature_engineer.create_model_features_batch(
+            faculty=faculty,
+            gender=gender,
+            gpax=np.full(n_rows, float(gpax)),
+            count_f=np.full(n_rows, int(count_f)),
+            term_gpas=term_matrix
+        )
+    preds, probs, backends = predictor.score_columns(features, num_terms, specialize=True)
+    preds = preds.reshape(horizon, n_paths)
+    probs = probs.reshape(horizon, n_paths)
+    backends = backends.reshape(horizon, n_paths)
+
+    percentiles = [float(q) for q in percentiles]
+    labels = [f"p{q:g}" for q in percentiles]
+    prob_bands = np.percentile(probs, percentiles, axis=1)
+    gpa_bands = np.percentile(paths, percentiles, axis=0)
+
+    terms = []
+    for s in range(horizon):
+        completed = len(filled) + s + 1
+        median_prob = float(np.median(probs[s]))
+        terms.append({
+            "term": TERM_NAMES[start + s],
+            "terms_completed": completed,
+            "model_key": predictor.get_model_for_term(completed),
+            "model_backend": backends[s, 0],
+            "mean_probability": float(probs[s].mean()),
+            "probability_percentiles": dict(zip(labels, prob_bands[:, s].tolist())),
+            "median_risk_level": predictor.get_risk(median_prob)[0],
+            "dropout_share": float(preds[s].mean()),
+            "gpa_percentiles": dict(zip(labels, gpa_bands[:, s].tolist())),
+        })
+
+    return {
+        "n_paths": n_paths,
+        "distribution": distribution,
+        "gpa_center": center,
+        "gpa_sd": gpa_sd,
+        "seed": seed,
+        "terms": terms,
+    }
@@ -0,0 +1,66 @@
+import json
+import logging
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+from .. import IMPORT_STARTED
+from ..config import resolve_path, settings
+
+logger = logging.getLogger(__name__)
+
+
+class StartupReport:
+    """
+    จับเวลาแต่ละขั้นตอนตอนเริ่ม service (import, executors, โหลด model, ...)
+    เมื่อเสร็จจะต่อท้ายรายงานลงไฟล์ JSONL เพื่อเทียบเวลา startup ระหว่าง release ได้
+    """
+
+    def __init__(self, report_path: str = ""):
+        self.report_path = report_path
+        # app/__init__ ถูก import ก่อน module อื่นของ app เสมอ ใช้เป็นจุดเริ่มนับเวลา import
+        self._started = IMPORT_STARTED
+        self._stages: Dict[str, float] = {}
+        self._report: Optional[Dict[str, Any]] = None
+
+    def mark(self, stage: str):
+        """บันทึกเวลาตั้งแต่เริ่ม import จนถึงตอนนี้ (เช่น imports เสร็จ)"""
+        self._stages[stage] = round((time.perf_counter() - self._started) * 1000, 2)
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._stages[name] = round((time.perf_counter() - started) * 1000, 2)
+
+    def finish(self, **details) -> Dict[str, Any]:
+        """สรุปรายงาน (เวลารวมนับจาก import) แล้วเขียนลงไฟล์ถ้าตั้งค่าไว้"""
+        self._report = {
+            "time": datetime.now().isoformat(),
+            "version": settings.VERSION,
+            "total_ms": round((time.perf_counter() - self._started) * 1000, 2),
+            "stages_ms": dict(self._stages),
+            **details,
+        }
+        logger.info("🚀 Startup finished in %.0f ms", self._report["total_ms"])
+        if self.report_path:
+            self._write(self._report)
+        return self._report
+
+    def report(self) -> Optional[Dict[str, Any]]:
+        return self._report
+
+    def _write(self, report: Dict[str, Any]):
+        path = Path(self.report_path)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(report, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.warning("⚠️ Cannot write startup report %s: %s", path, e)
+
+
+startup_report = StartupReport(resolve_path(settings.STARTUP_REPORT_PATH))
@@ -0,0 +1,266 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional
+from . import cohort_stats
+from .ingestion import OPTIONAL_TERM_COLUMNS, REQUIRED_COLUMNS
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# คอลัมน์เกรดรายเทอม (ชื่อเดียวกับไฟล์อัปโหลด /batch-predict)
+TERM_COLUMNS = REQUIRED_COLUMNS[4:] + OPTIONAL_TERM_COLUMNS
+STUDENT_COLUMNS = ["student_id", "name", "faculty", "gender", "gpax", "count_f", *TERM_COLUMNS, "num_terms"]
+PREDICTION_COLUMNS = [
+    "student_id", "prediction", "probability", "risk_level", "model_key", "model_backend",
+    "model_version", "explanations", "top_features", "faculty", "num_terms",
+]
+# index เรียงตามความเสี่ยงสำหรับ ranking(): หนึ่ง index ต่อชุดตัวกรอง (ตัวกรองเป็นคอลัมน์นำหน้า)
+RANKING_INDEXES = {
+    "predictions_rank": (),
+    "predictions_rank_faculty": ("faculty",),
+    "predictions_rank_terms": ("num_terms",),
+    "predictions_rank_risk": ("risk_level",),
+    "predictions_rank_faculty_terms": ("faculty", "num_terms"),
+}
+RANKING_FILTERS = ("faculty", "num_terms", "risk_level")
+# จำนวน student_id ต่อหนึ่ง query (ต่ำกว่าขีดจำกัดจำนวน parameter ของ SQLite)
+LOOKUP_CHUNK = 500
+
+
+class StudentStore:
+    """
+    ข้อมูลนักศึกษา (เกรดรายเทอมในรูปแบบเดียวกับไฟล์อัปโหลด) และผลทำนายล่าสุดของแต่ละคนใน SQLite
+    อ่านความเสี่ยงปัจจุบันได้จากตาราง predictions โดยไม่ต้องคำนวณใหม่
+    predictions เก็บคณะ (ตามกลุ่มของ cohort) และจำนวนเทอมซ้ำไว้ด้วย เพื่อให้ index เรียงตามความเสี่ยงกรองได้ในตารางเดียว
+    การเขียนหลายแถวทำใน transaction เดียว (students + predictions + ตารางสรุป cohort_stats พร้อมกัน)
+    students.version เพิ่มขึ้นทุกครั้งที่แถวถูกเขียน: save() ตรวจ version ที่อ่านไปตอน load() เพื่อไม่ให้เขียนทับ
+    ค่าที่ process อื่น (worker อื่นของ pre-fork server) เขียนไปแล้วระหว่างนั้น
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def open(self):
+        with self._lock:
+            if self._conn is not None:
+                return
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            terms = ",\n".join(f"                    {col} REAL" for col in TERM_COLUMNS)
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS students (
+                    student_id TEXT PRIMARY KEY,
+                    name TEXT,
+                    faculty TEXT NOT NULL,
+                    gender TEXT NOT NULL,
+                    gpax REAL,
+                    count_f INTEGER NOT NULL,
+{terms},
+                    num_terms INTEGER NOT NULL,
+                    updated_at REAL NOT NULL,
+                    version INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            if "version" not in {row["name"] for row in conn.execute("PRAGMA table_info(students)")}:
+                conn.execute("ALTER TABLE students ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS predictions (
+                    student_id TEXT PRIMARY KEY,
+                    prediction INTEGER NOT NULL,
+                    probability REAL NOT NULL,
+                    risk_level TEXT NOT NULL,
+                    model_key TEXT NOT NULL,
+                    model_backend TEXT NOT NULL,
+                    model_version TEXT,
+                    explanations BLOB NOT NULL,
+                    top_features BLOB,
+                    scored_at REAL NOT NULL
+                )
+            """)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(predictions)")}
+            if "faculty" not in columns:
+                # ฐานข้อมูลที่สร้างก่อนมี ranking: เพิ่มคอลัมน์แล้วเติมจากตาราง students
+                conn.execute("ALTER TABLE predictions ADD COLUMN faculty TEXT")
+                conn.execute("ALTER TABLE predictions ADD COLUMN num_terms INTEGER")
+                conn.execute(
+                    f"UPDATE predictions SET faculty = {cohort_stats.FACULTY_SQL}, num_terms = s.num_terms "
+                    "FROM students AS s WHERE s.student_id = predictions.student_id"
+                )
+            for name, filters in RANKING_INDEXES.items():
+                conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS {name} "
+                    f"ON predictions ({', '.join([*filters, 'probability', 'student_id'])})"
+                )
+            has_cohort_stats = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'cohort_stats'"
+            ).fetchone()
+            cohort_stats.create_tables(conn)
+            if not has_cohort_stats:
+                # ฐานข้อมูลที่สร้างก่อนมีตารางสรุป: คำนวณจากผลทำนายที่มีอยู่ครั้งเดียว
+                cohort_stats.rebuild(conn)
+            self._conn = conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.open()
+        return self._conn
+
+    def load(self, student_ids: Optional[Iterable[str]] = None) -> "pd.DataFrame":
+        """
+        นักศึกษาเป็น DataFrame รูปแบบเดียวกับไฟล์อัปโหลด (ใช้กับ score_dataframe_columns ได้ทันที)
+        พร้อมคอลัมน์ version สำหรับส่งกลับให้ save() ตรวจว่าไม่มีใครเขียนแทรก
+        student_ids: เฉพาะคนเหล่านี้ที่มีใน store (None = ทุกคน)
+        """
+        import pandas as pd
+
+        # tuple ธรรมดาแทน sqlite3.Row: สร้าง DataFrame จากหลายหมื่นแถวได้เร็วกว่ามาก
+        cursor = self._connection().cursor()
+        cursor.row_factory = None
+        select = f"SELECT {', '.join(STUDENT_COLUMNS)}, version FROM students"
+        with self._lock:
+            if student_ids is None:
+                rows = cursor.execute(f"{select} ORDER BY student_id").fetchall()
+            else:
+                ids = list(dict.fromkeys(student_ids))
+                rows = []
+                for start in range(0, len(ids), LOOKUP_CHUNK):
+                    chunk = ids[start:start + LOOKUP_CHUNK]
+                    rows.extend(cursor.execute(
+                        f"{select} WHERE student_id IN ({','.join('?' * len(chunk))})", chunk
+                    ).fetchall())
+        df = pd.DataFrame.from_records(rows, columns=[*STUDENT_COLUMNS, "version"])
+        # ช่องเกรดที่ว่างเป็น NaN (ไม่ใช่ None) เหมือนไฟล์อัปโหลด
+        df[TERM_COLUMNS] = df[TERM_COLUMNS].astype(float)
+        return df
+
+    def existing_ids(self, student_ids: Iterable[str]) -> set:
+        conn = self._connection()
+        ids = list(dict.fromkeys(student_ids))
+        found = set()
+        with self._lock:
+            for start in range(0, len(ids), LOOKUP_CHUNK):
+                chunk = ids[start:start + LOOKUP_CHUNK]
+                found.update(r[0] for r in conn.execute(
+                    f"SELECT student_id FROM students WHERE student_id IN ({','.join('?' * len(chunk))})", chunk
+                ))
+        return found
+
+    def save(self, students: List[tuple], predictions: List[tuple],
+             versions: Optional[Dict[str, int]] = None) -> List[str]:
+        """
+        เขียนนักศึกษาและผลทำนายของพวกเขาใน transaction เดียว พร้อมปรับตารางสรุป cohort_stats เฉพาะคนเหล่านี้
+        students: tuple ตามลำดับ STUDENT_COLUMNS, predictions: tuple ตามลำดับ PREDICTION_COLUMNS
+        versions: {student_id: version ที่อ่านจาก load()} คนที่ version ใน store เปลี่ยนไปแล้วจะไม่ถูกเขียน
+        คืน student_id ที่ไม่ได้เขียนเพราะ version ไม่ตรง (ผู้เรียก load ใหม่แล้วคำนวณซ้ำ)
+        """
+        conn = self._connection()
+        now = time.time()
+        with self._lock:
+            # IMMEDIATE: ตรวจ version, อ่านค่าเดิมและเขียนค่าใหม่ของตารางสรุปโดยไม่มี process อื่นเขียนแทรก
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conflicts = []
+                if versions:
+                    conflicts = self._changed_since(conn, versions)
+                if conflicts:
+                    skip = set(conflicts)
+                    students = [row for row in students if row[0] not in skip]
+                    predictions = [row for row in predictions if row[0] not in skip]
+                cohort_stats.mark_changed(conn, [row[0] for row in students] + [row[0] for row in predictions])
+                cohort_stats.subtract_changed(conn)
+                if students:
+                    conn.executemany(
+                        f"INSERT OR REPLACE INTO students ({', '.join(STUDENT_COLUMNS)}, updated_at, version) "
+                        f"VALUES ({', '.join('?' * (len(STUDENT_COLUMNS) + 1))}, "
+                        "COALESCE((SELECT version FROM students WHERE student_id = ?), 0) + 1)",
+                        [(*row, now, row[0]) for row in students],
+                    )
+                if predictions:
+                    conn.executemany(
+                        f"INSERT OR REPLACE INTO predictions ({', '.join(PREDICTION_COLUMNS)}, scored_at) "
+                        f"VALUES ({', '.join('?' * (len(PREDICTION_COLUMNS) + 1))})",
+                        [(*row, now) for row in predictions],
+                    )
+                cohort_stats.add_changed(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return conflicts
+
+    @staticmethod
+    def _changed_since(conn: sqlite3.Connection, versions: Dict[str, int]) -> List[str]:
+        ids = list(versions)
+        current = {}
+        for start in range(0, len(ids), LOOKUP_CHUNK):
+            chunk = ids[start:start + LOOKUP_CHUNK]
+            current.update((row[0], row[1]) for row in conn.execute(
+                f"SELECT student_id, version FROM students WHERE student_id IN ({','.join('?' * len(chunk))})", chunk
+            ))
+        return [sid for sid in ids if current.get(sid) != versions[sid]]
+
+    def get(self, student_id: str) -> Optional[Dict[str, Any]]:
+        """ข้อมูลนักศึกษาและผลทำนายล่าสุด (key prediction = None ถ้ายังไม่เคยทำนาย)"""
+        conn = self._connection()
+        with self._lock:
+            student = conn.execute("SELECT * FROM students WHERE student_id = ?", (student_id,)).fetchone()
+            if student is None:
+                return None
+            prediction = conn.execute("SELECT * FROM predictions WHERE student_id = ?", (student_id,)).fetchone()
+        record = dict(student)
+        record["prediction"] = dict(prediction) if prediction is not None else None
+        return record
+
+    def ranking(self, limit: int, filters: Optional[Dict[str, Any]] = None,
+                after: Optional[tuple] = None) -> List[Dict[str, Any]]:
+        """
+        นักศึกษาเรียงตามความน่าจะเป็นที่จะออกกลางคันจากมากไปน้อย (เท่ากันเรียงตาม student_id จากมากไปน้อย)
+        filters: {faculty, num_terms, risk_level} ที่ต้องตรง, after: (probability, student_id) ของแถวสุดท้ายในหน้าก่อน
+        อ่านจาก index ตามลำดับและหยุดที่ limit แถว เวลาจึงไม่ขึ้นกับจำนวนนักศึกษาทั้งหมด
+        """
+        filters = {k: v for k, v in (filters or {}).items() if v is not None}
+        unknown = [key for key in filters if key not in RANKING_FILTERS]
+        if unknown:
+            raise ValueError(f"Unknown ranking filter: {', '.join(unknown)}")
+        conditions = [f"p.{key} = :{key}" for key in filters]
+        params: Dict[str, Any] = {**filters, "limit": limit}
+        if after is not None:
+            conditions.append("(p.probability, p.student_id) < (:after_probability, :after_student_id)")
+            params.update(after_probability=after[0], after_student_id=after[1])
+        conn = self._connection()
+        with self._lock:
+            rows = conn.execute(
+                "SELECT p.student_id, s.name, p.faculty, p.num_terms, p.prediction, p.probability, p.risk_level, "
+                "p.model_key, p.model_version, p.scored_at "
+                "FROM predictions p JOIN students s ON s.student_id = p.student_id "
+                f"WHERE {' AND '.join(conditions) or '1'} "
+                "ORDER BY p.probability DESC, p.student_id DESC LIMIT :limit",
+                params,
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def cohort(self, group_by: List[str], filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """สรุปความเสี่ยงรายกลุ่มจากตาราง cohort_stats (ดู cohort_stats.query)"""
+        conn = self._connection()
+        with self._lock:
+            return cohort_stats.query(conn, group_by, filters)
+
+    def stats(self) -> Dict[str, int]:
+        conn = self._connection()
+        with self._lock:
+            (students,) = conn.execute("SELECT COUNT(*) FROM students").fetchone()
+            (predictions,) = conn.execute("SELECT COUNT(*) FROM predictions").fetchone()
+        return {"students": students, "predictions": predictions}
@@ -0,0 +1,317 @@
+import base64
+import binascii
+import logging
+import threading
+import time
+from collections import Counter
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+import numpy as np
+from ..config import resolve_path, settings
+from ..models.ml_model import DropoutPredictor, predictor
+from ..utils.feature_engineering import FEATURE_LABELS, FeatureEngineer
+from .batch_scoring import score_dataframe_columns
+from .cohort_stats import HISTOGRAM_BINS, cohort_faculty
+from .result_formats import PREDICTION_LABELS, dumps, loads
+from .student_store import STUDENT_COLUMNS, TERM_COLUMNS, StudentStore
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# จำนวนรอบที่อ่านใหม่แล้วคำนวณซ้ำ เมื่อคำขออื่นเขียนนักศึกษาคนเดียวกันแทรกระหว่างอ่านกับเขียน
+WRITE_ATTEMPTS = 5
+
+
+class StudentWriteConflict(RuntimeError):
+    """นักศึกษาถูกคำขออื่นเขียนแทรกทุกรอบจนครบ WRITE_ATTEMPTS"""
+
+
+class StudentService:
+    """
+    ลงทะเบียนนักศึกษาและเพิ่มเกรดทีละเทอมให้ทั้งรุ่นใน StudentStore แล้วทำนายใหม่เฉพาะคนที่ข้อมูลเปลี่ยน
+    model ของแต่ละคนเปลี่ยนตามจำนวนเทอมที่มีเกรด (term1 -> term2 -> term3) ผ่าน score_dataframe_columns
+    การเขียนใน process เดียวกันทำทีละคำขอ (write lock) ส่วนคำขอจาก worker อื่นของ pre-fork server
+    ตรวจด้วย version ของแต่ละแถวตอนบันทึก: คนที่ถูกเขียนแทรกหลังอ่านจะถูกอ่านใหม่แล้วคำนวณซ้ำ (ไม่เขียนทับเกรดที่เพิ่งเพิ่ม)
+    """
+
+    def __init__(self, store: StudentStore, predictor: DropoutPredictor):
+        self.store = store
+        self.predictor = predictor
+        self.feature_engineer = FeatureEngineer()
+        self._write_lock = threading.Lock()
+
+    def register(self, df: "pd.DataFrame") -> Dict[str, Any]:
+        """
+        เพิ่ม/แทนที่นักศึกษาจาก DataFrame รูปแบบไฟล์อัปโหลด /batch-predict (ต้องมี student_id) แล้วทำนายทุกคนในไฟล์
+        แถวที่ไม่มี student_id ถูกข้าม, student_id ซ้ำในไฟล์ใช้แถวสุดท้าย
+        """
+        started = time.perf_counter()
+        received = len(df)
+        df = df[df["student_id"].notna()].copy()
+        df["student_id"] = df["student_id"].astype(str)
+        df = df.drop_duplicates("student_id", keep="last")
+
+        students = df.reindex(columns=STUDENT_COLUMNS)
+        # ชนิดข้อมูลเดียวกับที่ batch scoring ใช้ (normalize_inputs)
+        students[["faculty", "gender"]] = students[["faculty", "gender"]].astype(str)
+        students["count_f"] = students["count_f"].astype(float).astype(int)
+        students[TERM_COLUMNS] = students[TERM_COLUMNS].astype(float)
+        students["num_terms"] = students[TERM_COLUMNS].notna().sum(axis=1)
+
+        with self._write_lock:
+            existing = self.store.existing_ids(students["student_id"])
+            self._score_and_save(students)
+        return {
+            "received": received,
+            "registered": len(students),
+            "inserted": len(students) - len(existing),
+            "updated": len(existing),
+            "skipped": received - len(df),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    def append_term(self, grades: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        เพิ่มเกรดของเทอมถัดไป (ต่อจากเทอมล่าสุดที่มีเกรด) ให้นักศึกษาหลายคนในครั้งเดียว แล้วทำนายใหม่เฉพาะคนเหล่านี้
+        grades: [{"student_id", "gpa", "gpax": ไม่ส่ง = ค่าเฉลี่ยเกรดทุกเทอม, "count_f": ไม่ส่ง = เท่าเดิม}, ...]
+        """
+        started = time.perf_counter()
+        ids = [str(g["student_id"]) for g in grades]
+        duplicates = sorted(sid for sid, n in Counter(ids).items() if n > 1)
+        if duplicates:
+            raise ValueError(f"Duplicate student_id in request: {', '.join(duplicates[:10])}")
+        by_id = dict(zip(ids, grades))
+
+        appended = 0
+        not_found: List[str] = []
+        terms_full: List[str] = []
+        model_changes: Counter = Counter()
+        pending = ids
+        with self._write_lock:
+            for _ in range(WRITE_ATTEMPTS):
+                students = self.store.load(pending)
+                found = set(students["student_id"])
+                not_found += [sid for sid in pending if sid not in found]
+
+                terms = students[TERM_COLUMNS].to_numpy(dtype=float)
+                present = ~np.isnan(terms)
+                # ช่องถัดจากเทอมล่าสุดที่มีเกรด (เทอมที่ว่างคั่นกลางยังคงว่าง)
+                next_slot = np.where(present.any(axis=1), len(TERM_COLUMNS) - np.argmax(present[:, ::-1], axis=1), 0)
+                full = next_slot >= len(TERM_COLUMNS)
+                terms_full += students["student_id"][full].tolist()
+
+                students = students[~full].copy()
+                terms = terms[~full]
+                rows = np.arange(len(students))
+                request = [by_id[sid] for sid in students["student_id"]]
+                terms[rows, next_slot[~full]] = [g["gpa"] for g in request]
+
+                before = students["num_terms"].tolist()
+                students[TERM_COLUMNS] = terms
+                students["num_terms"] = (~np.isnan(terms)).sum(axis=1)
+                mean_gpa = np.nanmean(terms, axis=1) if len(terms) else np.zeros(0)
+                students["gpax"] = [
+                    float(g["gpax"]) if g.get("gpax") is not None else round(float(mean_gpa[i]), 2)
+                    for i, g in enumerate(request)
+                ]
+                students["count_f"] = [
+                    int(g["count_f"]) if g.get("count_f") is not None else int(count_f)
+                    for g, count_f in zip(request, students["count_f"])
+                ]
+                conflicts = self._score_and_save(students) if len(students) else []
+
+                written = ~students["student_id"].isin(conflicts).to_numpy()
+                appended += int(written.sum())
+                model_changes.update(
+                    f"{self.predictor.get_model_for_term(a)}->{self.predictor.get_model_for_term(b)}"
+                    for a, b, ok in zip(before, students["num_terms"].tolist(), written)
+                    if ok and self.predictor.get_model_for_term(a) != self.predictor.get_model_for_term(b)
+                )
+                if not conflicts:
+                    break
+                # worker อื่นเขียนคนเหล่านี้ระหว่างที่คำนวณ: อ่านเกรดล่าสุดแล้วเพิ่มเทอมนี้ต่อจากนั้น
+                pending = conflicts
+            else:
+                raise StudentWriteConflict(f"Students modified concurrently, please retry: {', '.join(pending[:10])}")
+
+        return {
+            "received": len(grades),
+            "appended": appended,
+            "rescored": appended,
+            "not_found": not_found,
+            "terms_full": terms_full,
+            "model_changes": dict(model_changes),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    def rescore(self) -> Dict[str, Any]:
+        """ทำนายนักศึกษาทุกคนใน store ใหม่ (เช่น หลังเปลี่ยนชุด model)"""
+        started = time.perf_counter()
+        with self._write_lock:
+            students = self.store.load()
+            rescored = len(students)
+            for _ in range(WRITE_ATTEMPTS):
+                conflicts = self._score_and_save(students, save_students=False) if len(students) else []
+                if not conflicts:
+                    break
+                # มีการเพิ่มเกรด/ลงทะเบียนซ้ำระหว่างคำนวณ: ทำนายคนเหล่านั้นใหม่จากข้อมูลล่าสุด
+                students = self.store.load(conflicts)
+            else:
+                raise StudentWriteConflict(f"Students modified concurrently, please retry: {', '.join(conflicts[:10])}")
+        return {
+            "rescored": rescored,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    def ranking(self, limit: int, filters: Optional[Dict[str, Any]] = None,
+                cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        นักศึกษาที่เสี่ยงที่สุด limit คน (เรียงตาม dropout_probability จากมากไปน้อย) จาก index ของ store
+        cursor: next_cursor ของหน้าก่อน (ได้หน้าถัดไปต่อจากแถวสุดท้ายของหน้านั้น)
+        """
+        started = time.perf_counter()
+        after = _decode_cursor(cursor) if cursor else None
+        # อ่านเกินหนึ่งแถวเพื่อรู้ว่ามีหน้าถัดไปหรือไม่
+        rows = self.store.ranking(limit + 1, filters, after)
+        page = rows[:limit]
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = _encode_cursor(page[-1]["probability"], page[-1]["student_id"])
+        return {
+            "students": [self._ranking_view(row) for row in page],
+            "next_cursor": next_cursor,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+
+    def _ranking_view(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        probability = row["probability"]
+        return {
+            "student_id": row["student_id"],
+            "name": row["name"],
+            "faculty": row["faculty"],
+            "num_terms": row["num_terms"],
+            "prediction": row["prediction"],
+            "prediction_label": PREDICTION_LABELS[row["prediction"]],
+            "dropout_probability": probability,
+            "dropout_percentage": f"{probability*100:.1f}%",
+            "risk_level": row["risk_level"],
+            "risk_color": self.predictor.get_risk(probability)[1],
+            "model_key": row["model_key"],
+            "stale": row["model_version"] != self.predictor.model_version,
+            "scored_at": row["scored_at"],
+        }
+
+    def cohort(self, group_by: List[str], filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """จำนวน ค่าเฉลี่ย และ histogram ความน่าจะเป็นของนักศึกษาใน store แยกตาม group_by"""
+        started = time.perf_counter()
+        groups = self.store.cohort(group_by, filters)
+        return {
+            "group_by": group_by,
+            "students": sum(g["students"] for g in groups),
+            "histogram_edges": [round(i / HISTOGRAM_BINS, 4) for i in range(HISTOGRAM_BINS + 1)],
+            "groups": groups,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+
+    def trends(self, group_by: List[str], filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """แนวโน้มความเสี่ยงตามจำนวนเทอมที่มีเกรด: หนึ่ง series ต่อกลุ่มของ group_by เรียงตาม num_terms"""
+        started = time.perf_counter()
+        group_by = [dim for dim in group_by if dim != "num_terms"]
+        series: Dict[tuple, Dict[str, Any]] = {}
+        for group in self.store.cohort([*group_by, "num_terms"], filters):
+            key = tuple(group.pop(dim) for dim in group_by)
+            if key not in series:
+                series[key] = {**dict(zip(group_by, key)), "points": []}
+            series[key]["points"].append(group)
+        return {
+            "group_by": group_by,
+            "histogram_edges": [round(i / HISTOGRAM_BINS, 4) for i in range(HISTOGRAM_BINS + 1)],
+            "series": list(series.values()),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+
+    def _score_and_save(self, students: "pd.DataFrame", save_students: bool = True) -> List[str]:
+        """
+        ทำนายแล้วบันทึก คืน student_id ที่ไม่ได้บันทึกเพราะถูกเขียนแทรก
+        (ตรวจเฉพาะเมื่อ students มาจาก store.load ซึ่งมีคอลัมน์ version)
+        """
+        students = students.reset_index(drop=True)
+        columns, _ = score_dataframe_columns(students, self.predictor, self.feature_engineer)
+        model_version = self.predictor.model_version
+        predictions = [
+            (
+                sid, columns["prediction"][i], columns["dropout_probability"][i], columns["risk_level"][i],
+                self.predictor.get_model_for_term(int(n)), columns["model_backend"][i], model_version,
+                dumps(columns["explanations"][i]),
+                None if columns["top_features"][i] is None else dumps(columns["top_features"][i]),
+                cohort_faculty(faculty), int(n),
+            )
+            for i, (sid, faculty, n) in enumerate(zip(students["student_id"], students["faculty"], students["num_terms"]))
+        ]
+        rows = []
+        if save_students:
+            values = students[STUDENT_COLUMNS].astype(object)
+            rows = list(values.where(values.notna(), None).itertuples(index=False, name=None))
+        versions = None
+        if "version" in students.columns:
+            versions = dict(zip(students["student_id"], students["version"].astype(int).tolist()))
+        conflicts = self.store.save(rows, predictions, versions)
+        logger.info("🎓 Scored %d stored students", len(predictions) - len(conflicts))
+        if conflicts:
+            logger.warning("⚠️ %d students changed by another request while scoring, retrying", len(conflicts))
+        return conflicts
+
+    def get(self, student_id: str) -> Optional[Dict[str, Any]]:
+        """ข้อมูลนักศึกษาและความเสี่ยงล่าสุดจาก store (ไม่คำนวณใหม่)"""
+        record = self.store.get(student_id)
+        if record is None:
+            return None
+        stored = record.pop("prediction")
+        student = {key: record[key] for key in STUDENT_COLUMNS if key not in TERM_COLUMNS}
+        student["term_gpas"] = {col: record[col] for col in TERM_COLUMNS}
+        student["updated_at"] = record["updated_at"]
+        student["prediction"] = None if stored is None else self._prediction_view(stored)
+        return student
+
+    def _prediction_view(self, stored: Dict[str, Any]) -> Dict[str, Any]:
+        probability = stored["probability"]
+        top_features = None if stored["top_features"] is None else loads(stored["top_features"])
+        return {
+            "prediction": stored["prediction"],
+            "prediction_label": PREDICTION_LABELS[stored["prediction"]],
+            "dropout_probability": probability,
+            "dropout_percentage": f"{probability*100:.1f}%",
+            "risk_level": stored["risk_level"],
+            "risk_color": self.predictor.get_risk(probability)[1],
+            "feature_explanations": {
+                code: self.feature_engineer.render_explanation(code, value)
+                for code, value in loads(stored["explanations"])
+            },
+            "top_features": None if top_features is None else [
+                {"feature": feature, "label": FEATURE_LABELS.get(feature, feature),
+                 "value": value, "contribution": contribution}
+                for feature, value, contribution in top_features
+            ],
+            "model_key": stored["model_key"],
+            "model_backend": stored["model_backend"],
+            "model_version": stored["model_version"],
+            # ผลจากชุด model ก่อนหน้า: เรียก /students/rescore เพื่อคำนวณใหม่
+            "stale": stored["model_version"] != self.predictor.model_version,
+            "scored_at": stored["scored_at"],
+        }
+
+
+def _encode_cursor(probability: float, student_id: str) -> str:
+    return base64.urlsafe_b64encode(dumps([probability, student_id])).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple:
+    try:
+        probability, student_id = loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return float(probability), str(student_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+student_service = StudentService(StudentStore(resolve_path(settings.STUDENT_DB_PATH)), predictor)
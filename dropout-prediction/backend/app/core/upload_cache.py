@@ -0,0 +1,111 @@
+import hashlib
+import logging
+import os
+import uuid
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Optional, Sequence
+from ..config import resolve_path, settings
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# เปลี่ยนเมื่อวิธี parse เปลี่ยน (ไฟล์ cache เดิมจะไม่ถูกใช้และถูกลบออกตามขนาด)
+PARSER_VERSION = "1"
+
+
+class UploadCache:
+    """
+    เก็บ DataFrame ที่ parse แล้วเป็น Parquet บนดิสก์ ชื่อไฟล์ = hash ของเนื้อไฟล์ที่อัปโหลด
+    อัปโหลดไฟล์เดิมซ้ำ (แม้ชื่อไฟล์ต่างกัน) อ่าน Parquet แทนการ parse ใหม่
+    ขนาดรวมเกิน max_bytes จะลบไฟล์ที่ใช้ล่าสุดนานที่สุดก่อน (mtime ถูกอัปเดตทุกครั้งที่ใช้)
+    ใช้พร้อมกันได้จากหลาย process: เขียนไฟล์ชั่วคราวแล้ว rename
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        # ปิดเมื่อ max_bytes = 0 หรือเขียน Parquet ไม่ได้ (ไม่มี pyarrow)
+        self.enabled = max_bytes > 0
+
+    def key(self, content: bytes, kind: str, columns: Sequence[str]) -> str:
+        digest = hashlib.sha256(content)
+        digest.update(f"\0{PARSER_VERSION}\0{kind}\0{','.join(columns)}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.parquet"
+
+    def get(self, key: str) -> Optional["pd.DataFrame"]:
+        if not self.enabled:
+            return None
+        import pandas as pd
+
+        path = self._path(key)
+        try:
+            df = pd.read_parquet(path)
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("⚠️ Discarding unreadable upload cache file %s: %s", path.name, e)
+            path.unlink(missing_ok=True)
+            return None
+        logger.debug("📦 Upload cache hit %s (%d rows)", key[:12], len(df))
+        return df
+
+    def put(self, key: str, df: "pd.DataFrame"):
+        # Parquet เก็บจำนวนแถวของตารางที่ไม่มีคอลัมน์ไม่ได้ (ไฟล์ที่ไม่มีคอลัมน์ที่ต้องใช้เลย)
+        if not self.enabled or len(df.columns) == 0:
+            return
+        path = self._path(key)
+        tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            df.to_parquet(tmp, compression="zstd")
+            os.replace(tmp, path)
+        except ImportError as e:
+            logger.warning("⚠️ Upload cache disabled: %s", e)
+            self.enabled = False
+            return
+        except Exception as e:
+            # เช่น คอลัมน์ที่มีทั้งตัวเลขและข้อความปนกัน: ใช้ผล parse ตามปกติ แค่ไม่ cache
+            logger.info("ℹ️ Upload not cached: %s", e)
+            return
+        finally:
+            tmp.unlink(missing_ok=True)
+        self._evict()
+
+    def _files(self):
+        """[(mtime, size, path), ...] ของไฟล์ cache ทั้งหมด (ไฟล์ที่ process อื่นเพิ่งลบถูกข้าม)"""
+        files = []
+        if not self.directory.exists():
+            return files
+        for path in self.directory.glob("*.parquet"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def _evict(self):
+        files = self._files()
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files, key=lambda f: f[0]):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def stats(self) -> Dict[str, int]:
+        files = self._files()
+        return {
+            "files": len(files),
+            "bytes": sum(size for _, size, _ in files),
+            "max_bytes": self.max_bytes,
+        }
+
+
+upload_cache = UploadCache(resolve_path(settings.UPLOAD_CACHE_DIR), settings.UPLOAD_CACHE_MAX_MB * 1024 * 1024)
@@ -1,16 +1,48 @@
-﻿from fastapi import FastAPI
+﻿import logging
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
 from .config import settings
 from .api.v1.api import router as api_router
-from .models.ml_model import predictor
+from .core.executors import start_executors, shutdown_executors
+from .core.jobs import job_manager
+from .core.metrics import MetricsMiddleware, metrics
+from .core.model_registry import model_registry
+from .core import prefork
+from .core.score_memo import score_memo
+from .core.students import student_service
+from .core.startup import startup_report
+
+logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logging.getLogger("app").setLevel(settings.LOG_LEVEL.upper())
+logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    print("Starting up...")
-    predictor.load_models()
+    logger.info("Starting up...")
+    startup_report.mark("imports")
+    with startup_report.stage("executors"):
+        start_executors()
+    with startup_report.stage("models"):
+        model_registry.start()
+    with startup_report.stage("jobs"):
+        job_manager.start(resume=prefork.is_primary())
+    active = model_registry.predictor.active_set
+    startup_report.finish(
+        backend=model_registry.predictor.backend,
+        model_version=active.version if active is not None else None,
+        model_load=active.load_report if active is not None else {},
+        validation_ms=active.validation.get("ms") if active is not None and active.validation else None,
+        worker=prefork.worker_index,
+    )
     yield
-    print("Shutting down...")
+    logger.info("Shutting down...")
+    job_manager.shutdown()
+    score_memo.close()
+    student_service.store.close()
+    model_registry.shutdown()
+    shutdown_executors()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -27,8 +59,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    def prometheus_metrics():
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 def root():
     return {
@@ -0,0 +1,130 @@
+import json
+import numpy as np
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Union
+
+# features ที่ logistic model ใช้แต่ FeatureEngineer ไม่ได้สร้าง: ผลคูณของสอง feature
+DERIVED_FEATURES = {
+    "avg_gpa_squared": ("avg_gpa_up_to_now", "avg_gpa_up_to_now"),
+    "COUNT_F_squared": ("COUNT_F", "COUNT_F"),
+    "avg_gpa_x_COUNT_F": ("avg_gpa_up_to_now", "COUNT_F"),
+    "avg_gpa_x_trend": ("avg_gpa_up_to_now", "gpa_change_from_start"),
+    "TERM1_x_TERM2": ("TERM1", "TERM2"),
+}
+
+
+class LogisticModel:
+    """
+    Logistic regression (StandardScaler + LogisticRegression จาก Logis/) ที่ทำนายด้วย NumPy ล้วน
+    รวม scaler เข้ากับค่าสัมประสิทธิ์ไว้ล่วงหน้า: logit = X @ weights + bias (dot product ครั้งเดียวต่อ batch)
+    ถูกกว่า tree model มาก จึงใช้เป็น fallback ตอน overload / tree model หาย และใช้ผสมแบบ ensemble
+    """
+
+    def __init__(self, feature_names: List[str], weights: np.ndarray, bias: float,
+                 mean: Optional[np.ndarray] = None):
+        self.feature_names = list(feature_names)
+        self.weights = np.asarray(weights, dtype=float)
+        self.bias = float(bias)
+        # ค่าเฉลี่ยของ features ตอน train: contributions วัดเทียบกับนักศึกษาโดยเฉลี่ย
+        self.mean = np.zeros(len(self.weights)) if mean is None else np.asarray(mean, dtype=float)
+
+    @classmethod
+    def from_json(cls, path: Union[str, Path]) -> "LogisticModel":
+        """โหลดไฟล์ที่ export ด้วย export_pipeline (ค่า mean/scale ของ scaler และ coef/intercept)"""
+        spec = json.loads(Path(path).read_text(encoding="utf-8"))
+        scale = np.asarray(spec["scale"], dtype=float)
+        mean = np.asarray(spec["mean"], dtype=float)
+        coef = np.asarray(spec["coef"], dtype=float) / scale
+        bias = float(spec["intercept"]) - float(coef @ mean)
+        return cls(spec["feature_names"], coef, bias, mean)
+
+    def _column(self, columns: Mapping[str, np.ndarray], name: str,
+                idx: Optional[np.ndarray], n_rows: int) -> np.ndarray:
+        if name in DERIVED_FEATURES:
+            a, b = DERIVED_FEATURES[name]
+            return self._column(columns, a, idx, n_rows) * self._column(columns, b, idx, n_rows)
+        if name in columns:
+            column = np.asarray(columns[name], dtype=float)
+            return column if idx is None else column[idx]
+        return np.zeros(n_rows)
+
+    def feature_matrix(self, columns: Mapping[str, np.ndarray],
+                       idx: Optional[np.ndarray] = None) -> np.ndarray:
+        """matrix ของ features ตามลำดับ feature_names (รวม features ที่เป็นผลคูณ)
+        idx: เฉพาะแถวเหล่านี้ (ค่าเริ่มต้น = ทุกแถว)
+        """
+        if idx is not None:
+            n_rows = len(idx)
+        else:
+            n_rows = len(next(iter(columns.values()))) if columns else 0
+        return np.column_stack([self._column(columns, name, idx, n_rows) for name in self.feature_names])
+
+    def predict_proba_columns(self, columns: Mapping[str, np.ndarray],
+                              idx: Optional[np.ndarray] = None) -> np.ndarray:
+        """ความน่าจะเป็นของ class 1 จาก features แบบ columnar (ผลจาก create_model_features_batch)"""
+        X = self.feature_matrix(columns, idx)
+        return 1.0 / (1.0 + np.exp(-(X @ self.weights + self.bias)))
+
+    def predict_contributions(self, X: np.ndarray) -> np.ndarray:
+        """ส่วนของ logit จากแต่ละ feature เทียบกับค่าเฉลี่ย: weight * (x - mean)
+        คืนค่า (N x features+1) คอลัมน์สุดท้าย = bias (รูปแบบเดียวกับ TreeEnsemble.predict_contributions)
+        """
+        contributions = np.empty((X.shape[0], len(self.weights) + 1))
+        contributions[:, :-1] = (X - self.mean) * self.weights
+        contributions[:, -1] = self.bias + float(self.weights @ self.mean)
+        return contributions
+
+    def predict_proba_one(self, features: Mapping[str, float]) -> float:
+        """ความน่าจะเป็นของแถวเดียวจาก dict ของ create_model_features (ไม่ต้องสร้าง array)"""
+        logit = self.bias
+        for name, weight in zip(self.feature_names, self.weights):
+            if name in DERIVED_FEATURES:
+                a, b = DERIVED_FEATURES[name]
+                value = float(features.get(a) or 0) * float(features.get(b) or 0)
+            else:
+                value = float(features.get(name) or 0)
+            logit += weight * value
+        return float(1.0 / (1.0 + np.exp(-logit)))
+
+
+def export_pipeline(pickle_path: Union[str, Path], output_path: Union[str, Path]) -> Dict:
+    """
+    แปลง sklearn Pipeline (scaler + model) ที่บันทึกด้วย joblib เป็น JSON ที่ LogisticModel.from_json อ่านได้
+    ใช้ครั้งเดียวตอนอัปเดต model (ต้องมี scikit-learn) service ไม่ต้อง import sklearn
+    """
+    import sys
+    import joblib
+    import sklearn.pipeline  # noqa: F401 (import ก่อนตั้ง alias ด้านล่าง)
+
+    # ไฟล์ใน Logis/ บันทึกด้วย NumPy 2 (module numpy._core) ให้โหลดได้ด้วย NumPy 1.x
+    if not hasattr(np, "_core"):
+        import numpy.core.multiarray
+        import numpy.core.numeric
+        sys.modules.setdefault("numpy._core", np.core)
+        sys.modules.setdefault("numpy._core.multiarray", np.core.multiarray)
+        sys.modules.setdefault("numpy._core.numeric", np.core.numeric)
+
+    pipeline = joblib.load(pickle_path)
+    scaler, model = pipeline.steps[0][1], pipeline.steps[-1][1]
+    spec = {
+        "feature_names": [str(f) for f in scaler.feature_names_in_],
+        "mean": scaler.mean_.tolist(),
+        "scale": scaler.scale_.tolist(),
+        "coef": model.coef_[0].tolist(),
+        "intercept": float(model.intercept_[0]),
+        "source": Path(pickle_path).name,
+    }
+    Path(output_path).write_text(json.dumps(spec, indent=2) + "\n", encoding="utf-8")
+    return spec
+
+
+if __name__ == "__main__":
+    # python -m app.models.logistic_model <โฟลเดอร์ไฟล์ .pkl> <โฟลเดอร์ปลายทาง>
+    import sys
+
+    source_dir, target_dir = Path(sys.argv[1]), Path(sys.argv[2])
+    target_dir.mkdir(parents=True, exist_ok=True)
+    for term in (1, 2, 3):
+        out = target_dir / f"logistic_term{term}.json"
+        export_pipeline(source_dir / f"logistic_model_term{term}.pkl", out)
+        print(f"✅ {out}")
@@ -1,23 +1,97 @@
-﻿import xgboost as xgb
-import numpy as np
+﻿import numpy as np
+from datetime import datetime
 from pathlib import Path
-from typing import Dict, Tuple
-from ..config import settings
+from types import MappingProxyType
+from typing import Any, Dict, List, Optional, Tuple
+from ..config import resolve_path, settings
+from ..core.metrics import metrics, observe_fallback, observe_inference, stage_timer
+from .logistic_model import LogisticModel
+from .prediction_cache import PredictionCache
+from .tree_engine import TreeEnsemble
+from ..utils.feature_engineering import FEATURE_INDEX, FEATURE_LABELS, FeatureVector
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import logging
+import threading
 import time
 import os
 
-class DropoutPredictor:
-    def __init__(self):
-        self.models = {
-            'term1': None,
-            'term2': None, 
-            'term3': None
+logger = logging.getLogger(__name__)
+
+MODEL_BACKENDS = ("native", "xgboost")
+MODEL_KEYS = ("term1", "term2", "term3")
+# tree = model หลัก, logistic = fallback, ensemble = ผสมทั้งสอง (ENSEMBLE_LOGISTIC_WEIGHT)
+SERVING_BACKENDS = ("tree", "logistic", "ensemble")
+
+class ModelSet:
+    """
+    ชุด model ของทุก term ที่โหลดมาด้วยกันหนึ่งครั้ง มีเวอร์ชันจาก hash ของไฟล์
+    ไม่แก้ไขหลังสร้าง: การเปลี่ยน model ทำโดยสลับทั้งชุด (DropoutPredictor.activate)
+    """
+    
+    def __init__(self, models: Dict[str, Any], file_hashes: Dict[str, str], backend: str):
+        self.models = MappingProxyType({key: models.get(key) for key in MODEL_KEYS})
+        self.file_hashes = MappingProxyType(dict(file_hashes))
+        self.backend = backend
+        self.version = hashlib.sha256(
+            "|".join(f"{t}:{h}" for t, h in sorted(file_hashes.items())).encode()
+        ).hexdigest()[:12]
+        self.loaded_at = datetime.now()
+        # ผลตรวจกับ holdout batch (ModelRegistry.validate)
+        self.validation: Optional[Dict[str, Any]] = None
+        # ที่มา (json/cache) ขนาดไฟล์ และเวลาที่ใช้โหลดของแต่ละ term
+        self.load_report: Dict[str, Dict[str, Any]] = {}
+    
+    @property
+    def loaded_count(self) -> int:
+        return sum(1 for model in self.models.values() if model is not None)
+    
+    @property
+    def complete(self) -> bool:
+        return self.loaded_count == len(MODEL_KEYS)
+    
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "backend": self.backend,
+            "loaded_at": self.loaded_at.isoformat(),
+            "loaded_terms": {k: v is not None for k, v in self.models.items()},
+            "file_hashes": dict(self.file_hashes),
+            "validation": self.validation,
+            "load": self.load_report,
         }
-        self.model_loaded = False
+
+class FeatureLayout:
+    """
+    ลำดับ features ของ model หนึ่งตัวที่คำนวณไว้ครั้งเดียว: ตำแหน่งของแต่ละ feature ใน FeatureVector
+    แถวของ model จาก FeatureVector = take ครั้งเดียว (ไม่วนอ่าน dict และไม่แปลง list เป็น array)
+    """
+    
+    __slots__ = ("names", "index")
+    
+    def __init__(self, names: List[str]):
+        self.names = tuple(names)
+        self.index = np.array([FEATURE_INDEX[name] for name in names], dtype=np.intp)
+    
+    def row(self, vector: FeatureVector) -> np.ndarray:
+        return vector.values.take(self.index)
+
+class DropoutPredictor:
+    def __init__(self, backend: str = None):
+        # native = TreeEnsemble (NumPy ล้วน ไม่ต้อง import xgboost), xgboost = XGBClassifier
+        self.backend = backend or settings.MODEL_BACKEND
+        if self.backend not in MODEL_BACKENDS:
+            raise ValueError(f"Unknown model backend: {self.backend}")
+        # ชุด model ที่ใช้งานอยู่ สลับทั้งชุดด้วยการกำหนดค่าครั้งเดียว (atomic)
+        # request ที่กำลังทำงานอ่านค่านี้ครั้งเดียวตอนเริ่ม จึงใช้ชุดเดิมจนจบแม้มีการสลับระหว่างทาง
+        self._active: Optional[ModelSet] = None
+        self.cache = PredictionCache(settings.PREDICTION_CACHE_SIZE)
+        # top features ของแต่ละ feature vector (explain_columns)
+        self.explanation_cache = PredictionCache(settings.EXPLANATION_CACHE_SIZE)
+        # logistic model ต่อ term (จาก FALLBACK_MODEL_DIR) ไม่ขึ้นกับชุด tree model ที่สลับได้
+        self.logistic: Dict[str, LogisticModel] = {}
         self.model_paths = {
-            'term1': 'XG/model_term1.json',
-            'term2': 'XG/model_term2.json',
-            'term3': 'XG/model_term3.json'
+            key: f"{settings.MODEL_DIR}/model_{key}.json" for key in MODEL_KEYS
         }
         
         # Features สำหรับแต่ละ model
@@ -26,47 +100,196 @@ class DropoutPredictor:
             'term2': ['OLD_GPA_M6','GENDER_ENCODED','FAC_ENCODED','COUNT_F','COUNT_WIU','TERM1','TERM1_missing','TERM2','TERM2_missing','avg_gpa_up_to_now','min_gpa_up_to_now','max_gpa_up_to_now','gpa_change_from_start','gpa_std_up_to_now','decline_last_term','improvement_from_hs','has_F','multiple_F','low_gpa','early_warning','current_term'],
             'term3': ['OLD_GPA_M6','GENDER_ENCODED','FAC_ENCODED','COUNT_F','COUNT_WIU','TERM1','TERM1_missing','TERM2','TERM2_missing','TERM3','TERM3_missing','avg_gpa_up_to_now','min_gpa_up_to_now','max_gpa_up_to_now','gpa_change_from_start','gpa_std_up_to_now','decline_last_term','consecutive_decline_2','improvement_from_hs','has_F','multiple_F','low_gpa','early_warning','current_term']
         }
+        # ตำแหน่งของ features แต่ละ model ใน FeatureVector (เส้นทางทำนายทีละคน)
+        self.layouts = {key: FeatureLayout(names) for key, names in self.features.items()}
+    
+    @property
+    def active_set(self) -> Optional[ModelSet]:
+        return self._active
+    
+    @property
+    def models(self) -> Dict[str, Any]:
+        model_set = self._active
+        if model_set is None:
+            return {key: None for key in MODEL_KEYS}
+        return model_set.models
+    
+    @property
+    def model_loaded(self) -> bool:
+        model_set = self._active
+        return model_set is not None and model_set.loaded_count > 0
+    
+    @property
+    def ready(self) -> bool:
+        """ทำนายได้อย่างน้อยบาง term (tree model หรือ logistic fallback)"""
+        return self.model_loaded or bool(self.logistic)
+    
+    @property
+    def model_version(self) -> Optional[str]:
+        # เวอร์ชันของชุด model (hash ของไฟล์) ใช้เป็นส่วนหนึ่งของ cache key
+        model_set = self._active
+        return model_set.version if model_set is not None else None
+    
+    def model_path(self, term: str) -> Path:
+        return Path(resolve_path(self.model_paths[term]))
+    
+    def build_model_set(self, max_retries: int = 1) -> ModelSet:
+        """
+        โหลดไฟล์ model ทุก term พร้อมกัน (หนึ่ง thread ต่อ term) เป็นชุดใหม่
+        โดยยังไม่เปลี่ยนชุดที่ใช้งานอยู่
+        """
+        with ThreadPoolExecutor(max_workers=len(self.model_paths), thread_name_prefix="model-load") as pool:
+            futures = {term: pool.submit(self._load_term, term, max_retries) for term in self.model_paths}
+            results = {term: future.result() for term, future in futures.items()}
+        
+        models = {term: r[0] for term, r in results.items() if r is not None}
+        file_hashes = {term: r[1] for term, r in results.items() if r is not None}
+        model_set = ModelSet(models, file_hashes, self.backend)
+        model_set.load_report = {term: r[2] for term, r in results.items() if r is not None}
+        return model_set
+    
+    def _load_term(self, term: str, max_retries: int) -> Optional[Tuple[Any, str, Dict[str, Any]]]:
+        """โหลด model ของหนึ่ง term คืนค่า (model, hash ของไฟล์, รายละเอียดการโหลด) หรือ None"""
+        abs_path = self.model_path(term)
+        for attempt in range(max_retries):
+            try:
+                if not abs_path.exists():
+                    logger.error("❌ File not found: %s", abs_path)
+                    continue
+                
+                started = time.perf_counter()
+                # อ่านไฟล์ครั้งเดียว: hash และ model มาจาก bytes ชุดเดียวกันเสมอ
+                raw = abs_path.read_bytes()
+                file_hash = hashlib.sha256(raw).hexdigest()
+                model, source = self._load_model_bytes(abs_path, raw, file_hash)
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                logger.info("✅ %s model loaded from %s (%d bytes, %.1f ms)", term, source, len(raw), elapsed_ms)
+                return model, file_hash, {"source": source, "bytes": len(raw), "ms": round(elapsed_ms, 2)}
+            
+            except Exception as e:
+                logger.warning("❌ Error loading %s model on attempt %d/%d: %s", term, attempt + 1, max_retries, e)
+                if attempt < max_retries - 1:
+                    logger.info("⏳ Waiting 2 seconds before retry...")
+                    time.sleep(2)
+                else:
+                    logger.exception("❌ Failed to load %s model after %d attempts", term, max_retries)
+        return None
+    
+    def activate(self, model_set: ModelSet):
+        """สลับชุด model ที่ใช้งานทั้งชุดในครั้งเดียว"""
+        self._active = model_set
+        # model เปลี่ยนแล้ว ผลใน cache ใช้ไม่ได้ (key มีเวอร์ชันอยู่แล้ว ล้างเพื่อคืนหน่วยความจำ)
+        self.cache.clear()
+        self.explanation_cache.clear()
     
     def load_models(self, max_retries=3):
-        """โหลด models ทั้งหมด"""
-        loaded_count = 0
+        """โหลด models ทั้งหมดแล้วใช้งานทันที (ตอนเริ่ม service)"""
+        self.load_logistic_models()
+        model_set = self.build_model_set(max_retries=max_retries)
         
-        for term, model_path in self.model_paths.items():
-            for attempt in range(max_retries):
+        if model_set.loaded_count > 0:
+            self.activate(model_set)
+            logger.info("✅ Successfully loaded %d/3 models", model_set.loaded_count)
+            return True
+        else:
+            logger.error("❌ Failed to load any models")
+            return False
+    
+    def load_logistic_models(self) -> int:
+        """โหลด logistic model ของทุก term ที่มีไฟล์ (ไฟล์เล็ก โหลดได้ในไม่กี่มิลลิวินาที) คืนจำนวนที่โหลดได้"""
+        logistic: Dict[str, LogisticModel] = {}
+        if settings.FALLBACK_MODEL_DIR:
+            model_dir = Path(resolve_path(settings.FALLBACK_MODEL_DIR))
+            for key in MODEL_KEYS:
+                path = model_dir / f"logistic_{key}.json"
+                if not path.exists():
+                    logger.warning("⚠️ Logistic fallback model not found: %s", path)
+                    continue
                 try:
-                    # สร้าง absolute path (ไปที่โฟลเดอร์ /app)
-                    abs_path = Path(__file__).parent.parent.parent / model_path
-                    print(f"🔄 Loading {term} model - Attempt {attempt + 1}/{max_retries}")
-                    print(f"🔍 Looking for model at: {abs_path}")
-                    print(f"✅ File exists: {abs_path.exists()}")
-                    
-                    if abs_path.exists():
-                        print(f"📦 File size: {abs_path.stat().st_size} bytes")
-                        self.models[term] = xgb.XGBClassifier()
-                        self.models[term].load_model(str(abs_path))
-                        loaded_count += 1
-                        print(f"✅ {term} model loaded successfully!")
-                        break
-                    else:
-                        print(f"❌ File not found: {abs_path}")
-                        
+                    logistic[key] = LogisticModel.from_json(path)
                 except Exception as e:
-                    print(f"❌ Error loading {term} model on attempt {attempt + 1}: {e}")
-                    if attempt < max_retries - 1:
-                        print(f"⏳ Waiting 2 seconds before retry...")
-                        time.sleep(2)
-                    else:
-                        print(f"❌ Failed to load {term} model after {max_retries} attempts")
-                        import traceback
-                        traceback.print_exc()
+                    logger.warning("❌ Error loading logistic %s model: %s", key, e)
+        self.logistic = logistic
+        if logistic:
+            logger.info("✅ Loaded %d/3 logistic fallback models", len(logistic))
+        return len(logistic)
+    
+    def _load_model_bytes(self, path: Path, raw: bytes, file_hash: str) -> Tuple[Any, str]:
+        """
+        แปลงเนื้อหาไฟล์ JSON เป็น model ตาม backend ที่เลือก
+        ใช้ไฟล์ binary cache (ชื่อมี hash ของ JSON) ถ้ามี ไม่งั้น parse JSON แล้วเขียน cache ไว้ใช้ครั้งถัดไป
+        คืนค่า (model, "cache" หรือ "json")
+        """
+        cache_path = self._binary_cache_path(path, file_hash)
+        if cache_path is not None and cache_path.exists():
+            try:
+                return self._load_binary_cache(cache_path), "cache"
+            except Exception as e:
+                logger.warning("⚠️ Ignoring unreadable model cache %s: %s", cache_path.name, e)
         
-        if loaded_count > 0:
-            self.model_loaded = True
-            print(f"✅ Successfully loaded {loaded_count}/3 models")
-            return True
+        if self.backend == "native":
+            model = TreeEnsemble.from_json_bytes(raw)
         else:
-            print(f"❌ Failed to load any models")
-            return False
+            import xgboost as xgb
+            model = xgb.XGBClassifier(n_jobs=settings.XGB_NTHREAD)
+            model.load_model(bytearray(raw))
+            model.set_params(n_jobs=settings.XGB_NTHREAD)
+        
+        if cache_path is not None:
+            self._write_binary_cache(model, cache_path)
+        return model, "json"
+    
+    def _binary_cache_path(self, path: Path, file_hash: str) -> Optional[Path]:
+        # native = .npz (ตาราง node), xgboost = .ubj (Universal Binary JSON ของ xgboost)
+        if not settings.MODEL_BINARY_CACHE:
+            return None
+        cache_dir = path.parent
+        if settings.MODEL_CACHE_DIR:
+            cache_dir = Path(resolve_path(settings.MODEL_CACHE_DIR))
+        suffix = "npz" if self.backend == "native" else "ubj"
+        return cache_dir / f"{path.stem}.{file_hash[:16]}.{suffix}"
+    
+    def _load_binary_cache(self, cache_path: Path):
+        if self.backend == "native":
+            return TreeEnsemble.load_npz(cache_path)
+        
+        import xgboost as xgb
+        model = xgb.XGBClassifier(n_jobs=settings.XGB_NTHREAD)
+        model.load_model(str(cache_path))
+        model.set_params(n_jobs=settings.XGB_NTHREAD)
+        return model
+    
+    def _write_binary_cache(self, model, cache_path: Path):
+        """เขียน cache แบบ atomic แล้วลบ cache ของไฟล์เดียวกันเวอร์ชันเก่า (เขียนไม่ได้ เช่น volume แบบ read-only ก็ข้ามไป)"""
+        stem = cache_path.name.split(".", 1)[0]
+        tmp_path = cache_path.with_name(f".{cache_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            if self.backend == "native":
+                with open(tmp_path, "wb") as f:
+                    model.save_npz(f)
+            else:
+                # xgboost เลือกรูปแบบไฟล์จากนามสกุล
+                tmp_path = tmp_path.with_suffix(".ubj")
+                model.save_model(str(tmp_path))
+            os.replace(tmp_path, cache_path)
+            for stale in cache_path.parent.glob(f"{stem}.*{cache_path.suffix}"):
+                if stale != cache_path:
+                    stale.unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning("⚠️ Cannot write model cache %s: %s", cache_path, e)
+            try:
+                tmp_path.unlink(missing_ok=True)
+            except OSError:
+                pass
+    
+    def count_terms(self, data: Dict) -> int:
+        """คำนวณจำนวนเทอมจากข้อมูล (TERM1-TERM8 ที่มีค่ามากกว่า 0)"""
+        term_count = 0
+        for i in range(1, 9):
+            if (data.get(f'TERM{i}') or 0) > 0:
+                term_count += 1
+        return term_count
     
     def get_model_for_term(self, num_terms: int) -> str:
         """เลือก model ตามจำนวนเทอมที่เรียนแล้ว
@@ -80,46 +303,341 @@ class DropoutPredictor:
             # ตั้งแต่เทอม 3 ขึ้นไป (เทอม 4 ขึ้นไปก็คือ term3)
             return 'term3'
     
+    def serving_backend(self, model_key: str, model_set: Optional[ModelSet] = None) -> str:
+        """
+        backend ที่ใช้ทำนายแถวของ model_key: tree model ถ้ามี (ผสม logistic เมื่อตั้ง ENSEMBLE_LOGISTIC_WEIGHT)
+        ไม่งั้น logistic fallback, ไม่มีทั้งสองแบบ = RuntimeError
+        """
+        model_set = model_set or self._active
+        has_tree = model_set is not None and model_set.models[model_key] is not None
+        has_logistic = model_key in self.logistic
+        if has_tree:
+            if has_logistic and settings.ENSEMBLE_LOGISTIC_WEIGHT > 0:
+                return "ensemble"
+            return "tree"
+        if has_logistic:
+            return "logistic"
+        if model_set is None or model_set.loaded_count == 0:
+            raise RuntimeError("Models not loaded")
+        raise RuntimeError(f"Model {model_key} not loaded")
+    
+    def logistic_probability(self, data: Dict, model_key: str) -> float:
+        """ความน่าจะเป็นจาก logistic model ของหนึ่งแถว (dict ของ features)"""
+        started = time.perf_counter()
+        prob = self.logistic[model_key].predict_proba_one(data)
+        observe_inference(f"{model_key}_logistic", 1, time.perf_counter() - started)
+        return prob
+    
+    def predict_logistic(self, data: Dict, model_key: str) -> Tuple[int, float]:
+        prob = self.logistic_probability(data, model_key)
+        return int(prob > 0.5), prob
+    
+    def blend(self, tree_prob, logistic_prob):
+        """ผสมความน่าจะเป็นของ tree กับ logistic ตาม ENSEMBLE_LOGISTIC_WEIGHT (รับได้ทั้ง float และ array)"""
+        weight = settings.ENSEMBLE_LOGISTIC_WEIGHT
+        prob = (1 - weight) * tree_prob + weight * logistic_prob
+        if isinstance(prob, np.ndarray):
+            return (prob > 0.5).astype(int), prob
+        return int(prob > 0.5), float(prob)
+    
     def predict(self, data: Dict, num_terms: int = None) -> Tuple[int, float]:
-        """ทำนายผลลัพธ์"""
-        if not self.model_loaded:
-            print("⚠️ Models not loaded, attempting to load...")
-            if not self.load_models():
-                raise RuntimeError("Models not loaded and failed to reload")
+        """ทำนายผลลัพธ์ด้วย tree model"""
+        model_set = self._active
+        if model_set is None or model_set.loaded_count == 0:
+            raise RuntimeError("Models not loaded")
         
         # เลือก model ตามจำนวนเทอม
         if num_terms is None:
-            # คำนวณจำนวนเทอมจากข้อมูล
-            term_count = 0
-            for i in range(1, 9):
-                if data.get(f'TERM{i}', 0) > 0:
-                    term_count += 1
-            num_terms = term_count
+            num_terms = self.count_terms(data)
         
         model_key = self.get_model_for_term(num_terms)
-        model = self.models[model_key]
-        
-        if model is None:
+        if model_set.models[model_key] is None:
             raise RuntimeError(f"Model {model_key} not loaded")
         
-        print(f"🎯 Using {model_key} model for {num_terms} terms")
+        logger.debug("🎯 Using %s model for %d terms", model_key, num_terms)
         
         # เตรียม features สำหรับ model ที่เลือก
-        model_features = self.features[model_key]
-        features = []
+        with stage_timer("feature_engineering", model_key):
+            vector = self.build_feature_vector(data, model_key)
+        preds, probs = self.predict_vectors(model_key, [vector], model_set=model_set)
         
-        for feature in model_features:
+        return int(preds[0]), float(probs[0])
+    
+    def build_feature_vector(self, data: Dict, model_key: str) -> List[float]:
+        """แปลง dict ของ features (หรือ FeatureVector) เป็น vector ตามลำดับที่ model ต้องการ"""
+        if isinstance(data, FeatureVector):
+            return self.layouts[model_key].row(data)
+        features = []
+        for feature in self.features[model_key]:
             value = data.get(feature, 0)
             if isinstance(value, (int, float)):
                 features.append(float(value))
             else:
                 features.append(0.0)
+        return features
+    
+    def _snapshot(self, model_set: Optional[ModelSet] = None) -> ModelSet:
+        model_set = model_set or self._active
+        if model_set is None:
+            raise RuntimeError("Models not loaded")
+        return model_set
+    
+    def predict_matrix(self, X: np.ndarray, model_key: str,
+                       model_set: Optional[ModelSet] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """ทำนายทั้ง matrix ด้วย model เดียวในการเรียกครั้งเดียว
+        คืนค่า (predictions, probabilities) ตามลำดับแถวของ X
+        model_set: ชุด model ที่ใช้ (ค่าเริ่มต้น = ชุดที่ใช้งานอยู่)
+        """
+        model = self._snapshot(model_set).models[model_key]
+        if model is None:
+            raise RuntimeError(f"Model {model_key} not loaded")
+        
+        started = time.perf_counter()
+        probs = model.predict_proba(X)[:, 1]
+        # binary:logistic -> XGBClassifier.predict ใช้ threshold 0.5 เหมือนกัน
+        preds = (probs > 0.5).astype(int)
+        observe_inference(model_key, len(X), time.perf_counter() - started)
+        return preds, probs
+    
+    def _cache_key(self, model_key: str, vector: List[float], version: Optional[str] = None) -> Tuple:
+        # แถวจาก FeatureLayout เป็น array: tolist ให้ key เดียวกับ vector แบบ list
+        if isinstance(vector, np.ndarray):
+            vector = vector.tolist()
+        return (model_key, version or self.model_version, tuple(vector))
+    
+    def cached_prediction(self, model_key: str, vector: List[float]) -> Optional[Tuple[int, float]]:
+        """ผลทำนายจาก cache (ถ้ามี) ของ feature vector นี้"""
+        return self.cache.get(self._cache_key(model_key, vector))
+    
+    def predict_vectors(self, model_key: str, vectors: List[List[float]],
+                        lookup: bool = True,
+                        model_set: Optional[ModelSet] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """ทำนายหลาย feature vectors ของ model เดียว ผ่าน LRU cache
+        ทำนายเฉพาะแถวที่ไม่อยู่ใน cache ในการเรียก model ครั้งเดียว
+        lookup=False: ผู้เรียกตรวจ cache มาแล้ว ทำนายทุกแถวแล้วเก็บผลลง cache
+        """
+        model_set = self._snapshot(model_set)
+        preds = np.zeros(len(vectors), dtype=int)
+        probs = np.zeros(len(vectors), dtype=float)
+        keys = [self._cache_key(model_key, v, model_set.version) for v in vectors]
+        
+        missing = []
+        for i, key in enumerate(keys):
+            cached = self.cache.get(key) if lookup else None
+            if cached is None:
+                missing.append(i)
+            else:
+                preds[i], probs[i] = cached
+        
+        if missing:
+            X = np.array([vectors[i] for i in missing])
+            new_preds, new_probs = self.predict_matrix(X, model_key, model_set)
+            for j, i in enumerate(missing):
+                preds[i], probs[i] = new_preds[j], new_probs[j]
+                self.cache.put(keys[i], (int(new_preds[j]), float(new_probs[j])))
+        
+        return preds, probs
+    
+    def predict_columns(self,
+                        columns: Dict[str, np.ndarray],
+                        num_terms: np.ndarray,
+                        specialize: bool = False,
+                        model_set: Optional[ModelSet] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """ทำนายจาก features แบบ columnar (ผลจาก FeatureEngineer.create_model_features_batch)
+        จัดกลุ่มตาม model แล้วสร้าง matrix ต่อกลุ่มด้วยการเลือกคอลัมน์ ไม่ต้องวนทีละแถว
+        specialize=True: แทนค่าคอลัมน์ที่คงที่ทั้งกลุ่มลงใน trees ก่อนทำนาย (native backend)
+        เร็วกว่ามากเมื่อทุกแถวเป็นนักศึกษาคนเดียวกันที่ต่างกันเพียงบาง feature
+        """
+        model_set = self._snapshot(model_set)
+        
+        preds = np.zeros(len(num_terms), dtype=int)
+        probs = np.zeros(len(num_terms), dtype=float)
+        for model_key, idx in self._group_by_model(num_terms):
+            preds[idx], probs[idx] = self._predict_group(columns, idx, model_key, model_set, specialize)
+        
+        return preds, probs
+    
+    def score_columns(self,
+                      columns: Dict[str, np.ndarray],
+                      num_terms: np.ndarray,
+                      specialize: bool = False) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """เหมือน predict_columns แต่เลือก backend ต่อกลุ่มตาม serving_backend (fallback / ensemble)
+        คืนค่า (predictions, probabilities, backend ของแต่ละแถว)
+        """
+        model_set = self._active
+        
+        preds = np.zeros(len(num_terms), dtype=int)
+        probs = np.zeros(len(num_terms), dtype=float)
+        backends = np.empty(len(num_terms), dtype=object)
+        for model_key, idx in self._group_by_model(num_terms):
+            backend = self.serving_backend(model_key, model_set)
+            if backend == "logistic":
+                started = time.perf_counter()
+                probs[idx] = self.logistic[model_key].predict_proba_columns(columns, idx)
+                preds[idx] = probs[idx] > 0.5
+                observe_inference(f"{model_key}_logistic", len(idx), time.perf_counter() - started)
+                observe_fallback(model_key, "missing_model", len(idx))
+            else:
+                preds[idx], probs[idx] = self._predict_group(columns, idx, model_key, model_set, specialize)
+                if backend == "ensemble":
+                    preds[idx], probs[idx] = self.blend(
+                        probs[idx], self.logistic[model_key].predict_proba_columns(columns, idx)
+                    )
+            backends[idx] = backend
+        
+        return preds, probs, backends
+    
+    def _group_by_model(self, num_terms: np.ndarray) -> List[Tuple[str, np.ndarray]]:
+        """แบ่งแถวตาม model key: [(model_key, index ของแถว), ...]"""
+        num_terms = np.asarray(num_terms, dtype=int)
+        model_keys = np.empty(len(num_terms), dtype=object)
+        for n in np.unique(num_terms):
+            model_keys[num_terms == n] = self.get_model_for_term(int(n))
+        
+        groups = []
+        for model_key in self.features:
+            idx = np.flatnonzero(model_keys == model_key)
+            if len(idx):
+                groups.append((model_key, idx))
+        return groups
+    
+    def _predict_group(self, columns: Dict[str, np.ndarray], idx: np.ndarray, model_key: str,
+                       model_set: ModelSet, specialize: bool) -> Tuple[np.ndarray, np.ndarray]:
+        feature_columns = [
+            np.asarray(columns[f], dtype=float)[idx] if f in columns else np.zeros(len(idx))
+            for f in self.features[model_key]
+        ]
+        model = model_set.models[model_key]
+        if specialize and isinstance(model, TreeEnsemble):
+            return self._predict_specialized(feature_columns, model, model_key)
+        return self.predict_matrix(np.column_stack(feature_columns), model_key, model_set)
+    
+    def explain_columns(self,
+                        columns: Dict[str, np.ndarray],
+                        num_terms: np.ndarray,
+                        backends: np.ndarray,
+                        rows: Optional[np.ndarray] = None,
+                        top_k: Optional[int] = None) -> List[Optional[List[Dict[str, Any]]]]:
+        """
+        top_k features ที่มีผลต่อผลทำนายมากที่สุดของแต่ละแถว จาก contributions (log-odds) ของ model ที่ทำนายแถวนั้น
+        คำนวณครั้งเดียวต่อกลุ่ม (model, backend) เฉพาะแถวที่ไม่อยู่ใน explanation cache
+        backends: ผลจาก score_columns (ensemble ใช้ contributions ของ tree model)
+        rows: boolean mask ของแถวที่ต้องการ (ค่าเริ่มต้น = ทุกแถว) แถวอื่นได้ None
+        """
+        top_k = settings.EXPLAIN_TOP_K if top_k is None else top_k
+        model_set = self._active
+        backends = np.asarray(backends, dtype=object)
+        explanations: List[Optional[List[Dict[str, Any]]]] = [None] * len(backends)
+        
+        for model_key, idx in self._group_by_model(num_terms):
+            if rows is not None:
+                idx = idx[np.asarray(rows, dtype=bool)[idx]]
+            for backend in sorted(set(backends[idx])):
+                group = idx[backends[idx] == backend]
+                with stage_timer("explanation", model_key):
+                    if backend == "logistic":
+                        model = self.logistic[model_key]
+                        names = model.feature_names
+                        X = model.feature_matrix(columns, group)
+                        cache_prefix = (model_key, "logistic")
+                    else:
+                        model = self._snapshot(model_set).models[model_key]
+                        if model is None:
+                            raise RuntimeError(f"Model {model_key} not loaded")
+                        names = self.features[model_key]
+                        X = np.column_stack([
+                            np.asarray(columns[f], dtype=float)[group] if f in columns else np.zeros(len(group))
+                            for f in names
+                        ])
+                        cache_prefix = (model_key, model_set.version)
+                    drivers = self._explain_matrix(model, X, names, cache_prefix, top_k)
+                for j, i in enumerate(group):
+                    explanations[i] = drivers[j]
         
-        X = np.array([features])
-        pred = model.predict(X)[0]
-        prob = model.predict_proba(X)[0, 1]
+        return explanations
+    
+    def explain(self, data: Dict, num_terms: int, backend: str) -> List[Dict[str, Any]]:
+        """top features ของหนึ่งแถว (dict ของ features หรือ FeatureVector) ผลเหมือน explain_columns"""
+        if isinstance(data, FeatureVector):
+            columns = data.columns()
+        else:
+            columns = {
+                k: np.array([float(v) if isinstance(v, (int, float)) else 0.0])
+                for k, v in data.items()
+            }
+        return self.explain_columns(columns, [num_terms], [backend])[0]
+    
+    def explain_vectors(self, model_key: str, vectors: List[List[float]],
+                        model_set: Optional[ModelSet] = None) -> List[List[Dict[str, Any]]]:
+        """top features จาก tree model ของหลาย feature vectors (ลำดับตาม build_feature_vector) ผลเหมือน explain_columns
+        ใช้กับ micro-batch ที่มี vectors อยู่แล้ว จึงไม่ต้องสร้าง matrix จาก features ซ้ำ
+        """
+        model_set = self._snapshot(model_set)
+        model = model_set.models[model_key]
+        if model is None:
+            raise RuntimeError(f"Model {model_key} not loaded")
+        with stage_timer("explanation", model_key):
+            return self._explain_matrix(model, np.array(vectors, dtype=float), self.features[model_key],
+                                        (model_key, model_set.version), settings.EXPLAIN_TOP_K)
+    
+    def _explain_matrix(self, model, X: np.ndarray, names: List[str], cache_prefix: Tuple,
+                        top_k: int) -> List[List[Dict[str, Any]]]:
+        drivers: List[Optional[List[Dict[str, Any]]]] = [None] * len(X)
+        keys = None
+        missing = np.arange(len(X))
+        if self.explanation_cache.enabled:
+            keys = [(*cache_prefix, top_k, tuple(row)) for row in X.tolist()]
+            missing = []
+            for i, key in enumerate(keys):
+                cached = self.explanation_cache.get(key)
+                if cached is None:
+                    missing.append(i)
+                else:
+                    drivers[i] = cached
+            missing = np.array(missing, dtype=int)
         
-        return int(pred), float(prob)
+        if len(missing):
+            contributions = self._contributions(model, X[missing])[:, :-1]
+            # เรียงตามขนาดของผล (ไม่สนเครื่องหมาย): บวก = เพิ่มความเสี่ยง, ลบ = ลดความเสี่ยง
+            top = np.argsort(-np.abs(contributions), axis=1, kind="stable")[:, :top_k]
+            for j, i in enumerate(missing):
+                row = []
+                for f in top[j]:
+                    value = float(X[i, f])
+                    row.append({
+                        "feature": names[f],
+                        "label": FEATURE_LABELS.get(names[f], names[f]),
+                        "value": None if np.isnan(value) else value,
+                        "contribution": float(contributions[j, f]),
+                    })
+                drivers[i] = row
+                if keys is not None:
+                    self.explanation_cache.put(keys[i], row)
+        return drivers
+    
+    def _contributions(self, model, X: np.ndarray) -> np.ndarray:
+        """contributions (N x features+1, คอลัมน์สุดท้าย = bias) ตามชนิดของ model"""
+        if isinstance(model, (TreeEnsemble, LogisticModel)):
+            return model.predict_contributions(X)
+        import xgboost as xgb
+        booster = model.get_booster()
+        # approx_contribs = วิธีเดียวกับ TreeEnsemble.predict_contributions (native backend)
+        return booster.predict(
+            xgb.DMatrix(X, feature_names=booster.feature_names), pred_contribs=True, approx_contribs=True
+        )
+    
+    def _predict_specialized(self, feature_columns: List[np.ndarray], model: TreeEnsemble,
+                             model_key: str) -> Tuple[np.ndarray, np.ndarray]:
+        started = time.perf_counter()
+        fixed = {
+            j: column[0]
+            for j, column in enumerate(feature_columns)
+            if len(column) and (column == column[0]).all()
+        }
+        specialized = model.specialize(fixed)
+        probs = specialized.predict_proba_columns(feature_columns)
+        observe_inference(model_key, len(probs), time.perf_counter() - started)
+        return (probs > 0.5).astype(int), probs
     
     def get_risk(self, prob):
         """ประเมินระดับความเสี่ยง"""
@@ -130,4 +648,17 @@ class DropoutPredictor:
         else: 
             return "High", "red"
 
-predictor = DropoutPredictor()
\ No newline at end of file
+predictor = DropoutPredictor()
+
+metrics.gauge(
+    "dropout_model_info", "Active model set (value is always 1)", ("version", "backend"),
+    lambda: [((predictor.model_version, predictor.backend), 1)] if predictor.model_loaded else [],
+)
+metrics.gauge(
+    "dropout_prediction_cache_entries", "Entries in the prediction LRU cache", (),
+    lambda: [((), predictor.cache.stats()["size"])],
+)
+metrics.counter_callback(
+    "dropout_prediction_cache_lookups_total", "Prediction cache lookups by result", ("result",),
+    lambda: [((r,), predictor.cache.stats()[r]) for r in ("hits", "misses")],
+)
\ No newline at end of file
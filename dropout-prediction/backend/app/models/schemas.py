@@ -1,7 +1,10 @@
-﻿from pydantic import BaseModel, Field
-from typing import Optional, List, Dict
+﻿from pydantic import BaseModel, ConfigDict, Field
+from typing import Optional, List, Dict, Literal
 from datetime import datetime
 
+# schema ที่มี field ขึ้นต้นด้วย model_ (model_key, model_backend, ...): เป็นชื่อใน API ไม่ชนกับของ pydantic
+MODEL_FIELDS = ConfigDict(protected_namespaces=())
+
 class StudentBasicInput(BaseModel):
     """ข้อมูลพื้นฐานของนักศึกษา"""
     faculty: str = Field(..., description="คณะ")
@@ -39,7 +42,15 @@ class StudentInput(BaseModel):
     GENDER_ENCODED: int = Field(..., ge=0, le=1)
     FAC_ENCODED: int = Field(..., ge=0, le=5)
 
+class FeatureDriver(BaseModel):
+    """feature ที่มีผลต่อผลทำนาย: contribution เป็น log-odds (บวก = เพิ่มความเสี่ยง, ลบ = ลดความเสี่ยง)"""
+    feature: str
+    label: str
+    value: Optional[float] = None
+    contribution: float
+
 class PredictionOutput(BaseModel):
+    model_config = MODEL_FIELDS
     prediction: int
     prediction_label: str
     dropout_probability: float
@@ -48,6 +59,8 @@ class PredictionOutput(BaseModel):
     risk_color: str
     recommendation: str
     feature_explanations: Optional[Dict[str, str]] = None
+    top_features: Optional[List[FeatureDriver]] = Field(None, description="features ที่มีผลต่อผลทำนายมากที่สุดจาก model")
+    model_backend: str = Field("tree", description="tree, logistic (fallback) หรือ ensemble")
     timestamp: datetime = Field(default_factory=datetime.now)
 
 class FuturePredictionRequest(BaseModel):
@@ -77,9 +90,140 @@ class FuturePredictionOutput(BaseModel):
     improvement: float
     improvement_percentage: str
     recommendation: str
+    current_model_backend: str = "tree"
+    future_model_backend: str = "tree"
 
 class HealthResponse(BaseModel):
+    model_config = MODEL_FIELDS
     status: str
     model_loaded: bool
     loaded_terms: Dict[str, bool]
     loaded_count: int
+    fallback_terms: Dict[str, bool] = {}
+
+class FutureCurveRequest(StudentBasicInput):
+    """คำขอสำหรับกราฟความเสี่ยงตามเกรดเทอมถัดไป"""
+    gpa_min: float = Field(0.0, ge=0, le=4, description="เกรดเทอมถัดไปต่ำสุดของช่วง")
+    gpa_max: float = Field(4.0, ge=0, le=4, description="เกรดเทอมถัดไปสูงสุดของช่วง")
+    gpa_step: float = Field(0.05, ge=0.01, le=4, description="ระยะห่างของเกรดแต่ละจุด")
+
+class FutureCurvePoint(BaseModel):
+    future_gpa: float
+    probability: float
+    risk_level: str
+
+class FutureCurveOutput(BaseModel):
+    """กราฟความน่าจะเป็นการออกกลางคันตามเกรดเทอมถัดไป"""
+    model_config = MODEL_FIELDS
+    current_probability: float
+    current_risk_level: str
+    current_model_backend: str = "tree"
+    model_key: str
+    model_backend: str = "tree"
+    points: List[FutureCurvePoint]
+    min_gpa_for_medium: Optional[float] = Field(None, description="เกรดเทอมถัดไปต่ำสุดที่ทำให้ความเสี่ยงลดจาก High เป็น Medium หรือต่ำกว่า")
+    min_gpa_for_low: Optional[float] = Field(None, description="เกรดเทอมถัดไปต่ำสุดที่ทำให้ความเสี่ยงลดเป็น Low")
+
+class TrajectorySimulationRequest(StudentBasicInput):
+    """คำขอจำลองเส้นทางเกรดของเทอมที่เหลือแบบ Monte Carlo"""
+    n_paths: Optional[int] = Field(None, ge=100, le=20000, description="จำนวนเส้นทางเกรดที่สุ่ม (ไม่ส่ง = 10000 หรือเท่าที่ไม่เกิน SIMULATION_MAX_ROWS, ส่งมาแล้วเกิน = 422)")
+    distribution: Literal["normal", "random_walk"] = Field("normal", description="normal = สุ่มอิสระทุกเทอม, random_walk = เปลี่ยนจากเทอมก่อนหน้า")
+    gpa_sd: float = Field(0.4, ge=0, le=2, description="ส่วนเบี่ยงเบนมาตรฐานของเกรดที่สุ่มต่อเทอม")
+    recent_terms: int = Field(2, ge=1, le=10, description="จำนวนเทอมล่าสุดที่ใช้หาค่ากลางของเกรด")
+    gpa_shift: float = Field(0.0, ge=-4, le=4, description="เลื่อนค่ากลางของเกรด เช่น ผลที่คาดจากการช่วยเหลือ")
+    percentiles: List[float] = Field([5, 25, 50, 75, 95], min_length=1, max_length=20, description="percentile ที่ต้องการ (0-100)")
+    seed: Optional[int] = Field(None, description="กำหนด seed เพื่อให้ได้ผลเดิมทุกครั้ง")
+
+class TrajectoryTermBand(BaseModel):
+    model_config = MODEL_FIELDS
+    term: str
+    terms_completed: int
+    model_key: str
+    model_backend: str = "tree"
+    mean_probability: float
+    probability_percentiles: Dict[str, float]
+    median_risk_level: str
+    dropout_share: float
+    gpa_percentiles: Dict[str, float]
+
+class TrajectorySimulationOutput(BaseModel):
+    """ช่วงความน่าจะเป็นการออกกลางคันของแต่ละเทอมอนาคตจากการจำลอง"""
+    current_probability: float
+    current_risk_level: str
+    current_model_backend: str = "tree"
+    n_paths: int
+    distribution: str
+    gpa_center: float
+    gpa_sd: float
+    seed: Optional[int] = None
+    terms: List[TrajectoryTermBand]
+
+class BatchJobStatus(BaseModel):
+    """สถานะของ batch job"""
+    job_id: str
+    filename: str
+    status: str
+    total_rows: Optional[int] = None
+    rows_done: int = 0
+    progress: float = 0.0
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+
+class TermGrade(BaseModel):
+    """เกรดของเทอมถัดไปของนักศึกษาหนึ่งคน"""
+    student_id: str
+    gpa: float = Field(..., ge=0, le=4, description="เกรดเฉลี่ยของเทอมที่เพิ่ม")
+    gpax: Optional[float] = Field(None, ge=0, le=4, description="เกรดเฉลี่ยสะสมใหม่ (ไม่ส่ง = ค่าเฉลี่ยเกรดทุกเทอม)")
+    count_f: Optional[int] = Field(None, ge=0, description="จำนวนวิชาที่ได้ F ทั้งหมด (ไม่ส่ง = เท่าเดิม)")
+
+class TermAppendRequest(BaseModel):
+    grades: List[TermGrade] = Field(..., min_length=1)
+
+class TermAppendResult(BaseModel):
+    model_config = MODEL_FIELDS
+    received: int
+    appended: int
+    rescored: int
+    not_found: List[str] = Field(default_factory=list, description="student_id ที่ไม่มีใน store")
+    terms_full: List[str] = Field(default_factory=list, description="student_id ที่มีเกรดครบ 10 เทอมแล้ว")
+    model_changes: Dict[str, int] = Field(default_factory=dict, description="จำนวนนักศึกษาที่เปลี่ยน model เช่น term1->term2")
+    elapsed_ms: float
+
+class StudentRegisterResult(BaseModel):
+    received: int
+    registered: int
+    inserted: int
+    updated: int
+    skipped: int = Field(0, description="แถวที่ไม่มี student_id")
+    elapsed_ms: float
+
+class StoredPrediction(BaseModel):
+    """ผลทำนายล่าสุดที่เก็บไว้ใน student store"""
+    model_config = MODEL_FIELDS
+    prediction: int
+    prediction_label: str
+    dropout_probability: float
+    dropout_percentage: str
+    risk_level: str
+    risk_color: str
+    feature_explanations: Dict[str, str]
+    top_features: Optional[List[FeatureDriver]] = None
+    model_key: str
+    model_backend: str
+    model_version: Optional[str] = None
+    stale: bool = Field(False, description="ทำนายด้วยชุด model ก่อนหน้า")
+    scored_at: datetime
+
+class StudentRecord(BaseModel):
+    student_id: str
+    name: Optional[str] = None
+    faculty: str
+    gender: str
+    gpax: Optional[float] = None
+    count_f: int
+    num_terms: int
+    term_gpas: Dict[str, Optional[float]]
+    updated_at: datetime
+    prediction: Optional[StoredPrediction] = None
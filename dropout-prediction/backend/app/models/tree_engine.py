@@ -0,0 +1,364 @@
+import json
+import numpy as np
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Sequence, Union
+
+
+class TreeEnsemble:
+    """
+    Inference engine สำหรับ XGBoost model (binary:logistic) ที่ไม่ต้อง import xgboost
+    แปลง JSON dump ของ booster เป็นตาราง node แบบ array โดยจัดทุกต้นไม้เป็น complete binary tree
+    ความลึกเท่ากัน (node ที่ i มีลูกที่ 2i+1 / 2i+2) แล้วเดินทุกต้นไม้พร้อมกันด้วย NumPy
+    หนึ่งรอบต่อความลึกหนึ่งชั้น
+    """
+
+    # จำนวน (แถว x ต้นไม้) ต่อรอบ เลือกให้ array ชั่วคราวอยู่ใน cache ของ CPU
+    CHUNK_CELLS = 1 << 16
+    # complete tree ใช้ 2^depth leaves ต่อต้น จำกัดความลึกไว้กันหน่วยความจำบวม
+    MAX_DEPTH = 16
+    # เปลี่ยนเมื่อรูปแบบของ save_npz เปลี่ยน (ไฟล์ cache เวอร์ชันเก่าจะถูกสร้างใหม่)
+    NPZ_FORMAT_VERSION = 2
+
+    def __init__(self,
+                 feature: np.ndarray,
+                 threshold: np.ndarray,
+                 default_left: np.ndarray,
+                 leaf_value: np.ndarray,
+                 depth: int,
+                 base_margin: float,
+                 feature_names: List[str],
+                 node_value: np.ndarray):
+        # feature/threshold/default_left: (trees x internal nodes), leaf_value: (trees x leaves)
+        # node_value: ค่าเฉลี่ยของ leaf ใต้แต่ละ internal node ถ่วงด้วย hessian (ใช้คำนวณ contributions)
+        self.feature = feature
+        self.threshold = threshold
+        self.default_left = default_left
+        self.leaf_value = leaf_value
+        self.depth = depth
+        self.base_margin = base_margin
+        self.feature_names = feature_names
+        self.node_value = node_value
+
+        self._flat_feature = feature.ravel()
+        self._flat_threshold = threshold.ravel()
+        self._flat_default_right = ~default_left.ravel()
+        self._flat_leaf_value = leaf_value.ravel()
+        self._flat_node_value = node_value.ravel()
+        self._node_base = (np.arange(self.num_trees, dtype=np.int32) * feature.shape[1])[None, :]
+        self._leaf_base = (np.arange(self.num_trees, dtype=np.int32) * leaf_value.shape[1])[None, :]
+
+    @property
+    def num_trees(self) -> int:
+        return self.feature.shape[0]
+
+    @property
+    def num_features(self) -> int:
+        return len(self.feature_names)
+
+    @classmethod
+    def from_json(cls, path: Union[str, Path]) -> "TreeEnsemble":
+        """โหลดจากไฟล์ที่บันทึกด้วย Booster.save_model(...json)"""
+        return cls.from_json_bytes(Path(path).read_bytes())
+
+    @classmethod
+    def from_json_bytes(cls, raw: bytes) -> "TreeEnsemble":
+        """แปลงเนื้อหาไฟล์ JSON ของ booster (อ่านไฟล์ครั้งเดียวแล้วใช้ทั้ง hash และ parse ได้)"""
+        learner = json.loads(raw)["learner"]
+
+        objective = learner["objective"]["name"]
+        if objective != "binary:logistic":
+            raise ValueError(f"Unsupported objective: {objective}")
+
+        booster = learner["gradient_booster"]
+        if booster.get("name", "gbtree") != "gbtree":
+            raise ValueError(f"Unsupported booster: {booster.get('name')}")
+        trees = booster["model"]["trees"]
+
+        base_score = float(str(learner["learner_model_param"]["base_score"]).strip("[]"))
+        base_margin = float(np.log(base_score / (1.0 - base_score)))
+
+        depth = max(cls._tree_depth(tree) for tree in trees)
+        if depth > cls.MAX_DEPTH:
+            raise ValueError(f"Tree depth {depth} exceeds supported maximum {cls.MAX_DEPTH}")
+        n_internal = 2 ** depth - 1
+        n_leaves = 2 ** depth
+
+        # node ที่เติมเข้ามาให้ครบ complete tree: threshold = +inf จึงไปทางซ้ายเสมอ (NaN ก็ไปซ้าย)
+        feature = np.zeros((len(trees), n_internal), dtype=np.int32)
+        threshold = np.full((len(trees), n_internal), np.inf, dtype=np.float32)
+        default_left = np.ones((len(trees), n_internal), dtype=bool)
+        leaf_value = np.zeros((len(trees), n_leaves), dtype=np.float32)
+        node_value = np.zeros((len(trees), n_internal), dtype=np.float64)
+
+        for t, tree in enumerate(trees):
+            if any(tree.get("split_type", [])):
+                raise ValueError("Categorical splits are not supported")
+            left = tree["left_children"]
+            right = tree["right_children"]
+            split_index = tree["split_indices"]
+            # ค่า leaf เก็บอยู่ใน split_conditions ของ node ที่เป็น leaf
+            split_condition = tree["split_conditions"]
+            tree_default_left = tree["default_left"]
+            mean_value = cls._node_mean_values(tree)
+
+            stack = [(0, 0, 0)]  # (node id เดิม, ตำแหน่งใน complete tree, ความลึก)
+            while stack:
+                node, slot, level = stack.pop()
+                if level == depth:
+                    leaf_value[t, slot - n_internal] = split_condition[node]
+                    continue
+                node_value[t, slot] = mean_value[node]
+                if left[node] == -1:
+                    # leaf ที่ตื้นกว่าความลึกสูงสุด: ส่งค่าเดียวกันลงไปทั้งสองฝั่ง
+                    stack.append((node, 2 * slot + 1, level + 1))
+                    stack.append((node, 2 * slot + 2, level + 1))
+                    continue
+                feature[t, slot] = split_index[node]
+                threshold[t, slot] = split_condition[node]
+                default_left[t, slot] = bool(tree_default_left[node])
+                stack.append((left[node], 2 * slot + 1, level + 1))
+                stack.append((right[node], 2 * slot + 2, level + 1))
+
+        return cls(
+            feature=feature,
+            threshold=threshold,
+            default_left=default_left,
+            leaf_value=leaf_value,
+            depth=depth,
+            base_margin=base_margin,
+            feature_names=list(learner.get("feature_names", [])),
+            node_value=node_value,
+        )
+
+    def save_npz(self, fileobj: BinaryIO):
+        """บันทึกตาราง node เป็นไฟล์ .npz (ไม่บีบอัด) โหลดกลับได้เร็วกว่า parse JSON มาก"""
+        np.savez(
+            fileobj,
+            format_version=np.array(self.NPZ_FORMAT_VERSION),
+            feature=self.feature,
+            threshold=self.threshold,
+            default_left=self.default_left,
+            leaf_value=self.leaf_value,
+            depth=np.array(self.depth),
+            base_margin=np.array(self.base_margin),
+            feature_names=np.array(self.feature_names, dtype=str),
+            node_value=self.node_value,
+        )
+
+    @classmethod
+    def load_npz(cls, path: Union[str, Path]) -> "TreeEnsemble":
+        """โหลดไฟล์ที่บันทึกด้วย save_npz"""
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["format_version"]) != cls.NPZ_FORMAT_VERSION:
+                raise ValueError(f"Unsupported npz format version: {int(data['format_version'])}")
+            return cls(
+                feature=data["feature"],
+                threshold=data["threshold"],
+                default_left=data["default_left"],
+                leaf_value=data["leaf_value"],
+                depth=int(data["depth"]),
+                base_margin=float(data["base_margin"]),
+                feature_names=data["feature_names"].tolist(),
+                node_value=data["node_value"],
+            )
+
+    @staticmethod
+    def _tree_depth(tree: dict) -> int:
+        left = tree["left_children"]
+        right = tree["right_children"]
+        depth = 0
+        stack = [(0, 0)]
+        while stack:
+            node, level = stack.pop()
+            if left[node] == -1:
+                depth = max(depth, level)
+            else:
+                stack.append((left[node], level + 1))
+                stack.append((right[node], level + 1))
+        return depth
+
+    @staticmethod
+    def _node_mean_values(tree: dict) -> List[float]:
+        """ค่าเฉลี่ยของ leaf ใต้แต่ละ node ถ่วงด้วย sum_hessian (leaf = ค่าของ leaf เอง)"""
+        left = tree["left_children"]
+        right = tree["right_children"]
+        hessian = tree["sum_hessian"]
+        value = list(map(float, tree["split_conditions"]))
+        # ลูกมี id มากกว่าพ่อเสมอใน JSON ของ xgboost: ไล่จาก id มากไปน้อยจึงได้ค่าของลูกก่อน
+        for node in range(len(left) - 1, -1, -1):
+            if left[node] != -1:
+                l, r = left[node], right[node]
+                cover = hessian[l] + hessian[r]
+                value[node] = (value[l] * hessian[l] + value[r] * hessian[r]) / cover if cover > 0 else 0.0
+        return value
+
+    def leaf_indices(self, X: np.ndarray) -> np.ndarray:
+        """คืนตำแหน่ง leaf (0 .. 2^depth-1) ที่แต่ละแถวตกลงในแต่ละต้นไม้ ขนาด (N x trees)"""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.num_features:
+            raise ValueError(f"Expected X with shape (N, {self.num_features}), got {X.shape}")
+
+        n_rows = X.shape[0]
+        has_missing = bool(np.isnan(X).any())
+        leaves = np.empty((n_rows, self.num_trees), dtype=np.int32)
+        chunk = max(1, self.CHUNK_CELLS // self.num_trees)
+        for start in range(0, n_rows, chunk):
+            block = X[start:start + chunk]
+            flat = block.ravel()
+            row_offsets = (np.arange(block.shape[0], dtype=np.intp) * self.num_features)[:, None]
+            slot = np.zeros((block.shape[0], self.num_trees), dtype=np.int32)
+            for _ in range(self.depth):
+                node = slot + self._node_base
+                fvalue = flat[row_offsets + self._flat_feature[node]]
+                go_right = fvalue >= self._flat_threshold[node]
+                if has_missing:
+                    go_right = np.where(np.isnan(fvalue), self._flat_default_right[node], go_right)
+                slot = 2 * slot + 1 + go_right
+            leaves[start:start + chunk] = slot - self.feature.shape[1]
+        return leaves
+
+    def predict_contributions(self, X: np.ndarray) -> np.ndarray:
+        """
+        ส่วนของ log-odds ที่แต่ละ feature เพิ่ม/ลด (Saabas: เหมือน pred_contribs + approx_contribs ของ xgboost)
+        เดินทุกต้นไม้พร้อมกันแบบเดียวกับ leaf_indices แล้วสะสมผลต่างค่าของ node ลูกกับ node พ่อให้ feature ที่แยก
+        คืนค่า (N x features+1) คอลัมน์สุดท้าย = bias ผลรวมทุกคอลัมน์เท่ากับ predict_margin
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.num_features:
+            raise ValueError(f"Expected X with shape (N, {self.num_features}), got {X.shape}")
+
+        n_rows = X.shape[0]
+        n_internal = self.feature.shape[1]
+        has_missing = bool(np.isnan(X).any())
+        contributions = np.zeros((n_rows, self.num_features + 1), dtype=np.float64)
+        contributions[:, -1] = self.node_value[:, 0].sum() + self.base_margin
+        chunk = max(1, self.CHUNK_CELLS // self.num_trees)
+        for start in range(0, n_rows, chunk):
+            block = X[start:start + chunk]
+            n_block = block.shape[0]
+            flat = block.ravel()
+            row_offsets = (np.arange(n_block, dtype=np.intp) * self.num_features)[:, None]
+            slot = np.zeros((n_block, self.num_trees), dtype=np.int32)
+            parent_value = np.broadcast_to(self.node_value[:, 0], slot.shape)
+            block_contributions = np.zeros(n_block * self.num_features, dtype=np.float64)
+            for level in range(self.depth):
+                node = slot + self._node_base
+                feature = self._flat_feature[node]
+                fvalue = flat[row_offsets + feature]
+                go_right = fvalue >= self._flat_threshold[node]
+                if has_missing:
+                    go_right = np.where(np.isnan(fvalue), self._flat_default_right[node], go_right)
+                slot = 2 * slot + 1 + go_right
+                if level < self.depth - 1:
+                    child_value = self._flat_node_value[slot + self._node_base]
+                else:
+                    child_value = self._flat_leaf_value[slot - n_internal + self._leaf_base]
+                # node ที่เติมให้ครบ complete tree มีค่าเท่ากับพ่อ จึงได้ผลต่างเป็น 0
+                block_contributions += np.bincount(
+                    (row_offsets + feature).ravel(),
+                    weights=(child_value - parent_value).ravel(),
+                    minlength=block_contributions.size,
+                )
+                parent_value = child_value
+            contributions[start:start + n_block, :-1] = block_contributions.reshape(n_block, self.num_features)
+        return contributions
+
+    def predict_margin(self, X: np.ndarray) -> np.ndarray:
+        """ผลรวมค่า leaf + base margin (log-odds)"""
+        leaves = self.leaf_indices(X)
+        return self._flat_leaf_value[leaves + self._leaf_base].sum(axis=1, dtype=np.float64) + self.base_margin
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """รูปแบบเดียวกับ XGBClassifier.predict_proba: คอลัมน์ [P(0), P(1)]"""
+        prob = 1.0 / (1.0 + np.exp(-self.predict_margin(X)))
+        return np.column_stack([1.0 - prob, prob])
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return (self.predict_proba(X)[:, 1] > 0.5).astype(int)
+
+    def specialize(self, fixed: Dict[int, float]) -> "SpecializedEnsemble":
+        """
+        partial evaluation: แทนค่า feature ที่คงที่ (index -> ค่า) ลงในทุกต้นไม้ล่วงหน้า
+        ตัด branch ที่ไปไม่ถึง และรวมต้นไม้ที่เหลือ leaf เดียวเข้าไปใน base margin
+        เหมาะกับงานที่ทำนายหลายแถวซึ่งต่างกันเพียงไม่กี่ feature (เช่น simulation ของนักศึกษาคนเดียว)
+        """
+        feature = self.feature.tolist()
+        threshold = self.threshold.tolist()
+        default_left = self.default_left.tolist()
+        leaf_value = self.leaf_value.tolist()
+        n_internal = self.feature.shape[1]
+        # เทียบค่าแบบ float32 เหมือน leaf_indices
+        fixed = {f: float(np.float32(v)) for f, v in fixed.items()}
+
+        def build(t: int, slot: int):
+            if slot >= n_internal:
+                return np.float32(leaf_value[t][slot - n_internal])
+            thr = threshold[t][slot]
+            if thr == np.inf:
+                # node ที่เติมให้ครบ complete tree ไปทางซ้ายเสมอ
+                return build(t, 2 * slot + 1)
+            f = feature[t][slot]
+            if f in fixed:
+                value = fixed[f]
+                go_right = not default_left[t][slot] if np.isnan(value) else value >= thr
+                return build(t, 2 * slot + 2 if go_right else 2 * slot + 1)
+            left = build(t, 2 * slot + 1)
+            right = build(t, 2 * slot + 2)
+            if not isinstance(left, tuple) and not isinstance(right, tuple) and left == right:
+                return left
+            return (f, thr, default_left[t][slot], left, right)
+
+        trees = []
+        base_margin = self.base_margin
+        for t in range(self.num_trees):
+            node = build(t, 0)
+            if isinstance(node, tuple):
+                trees.append(node)
+            else:
+                base_margin += float(node)
+        return SpecializedEnsemble(trees, base_margin, self.num_features)
+
+
+class SpecializedEnsemble:
+    """
+    ผลของ TreeEnsemble.specialize: ต้นไม้ขนาดเล็กเก็บเป็น tuple (feature, threshold, default_left, left, right)
+    ประเมินทีละ node บนคอลัมน์ทั้งคอลัมน์ ไม่ต้องเดิน index ทีละแถว
+    ค่าในต้นไม้คำนวณแบบ float32 (ชนิดเดียวกับ leaf ใน model) แล้วรวมทุกต้นเป็น float64
+    """
+
+    def __init__(self, trees: list, base_margin: float, num_features: int):
+        self.trees = trees
+        self.base_margin = base_margin
+        self.num_features = num_features
+
+    @property
+    def num_trees(self) -> int:
+        return len(self.trees)
+
+    def predict_margin_columns(self, columns: Sequence[np.ndarray]) -> np.ndarray:
+        """columns: หนึ่ง array ต่อ feature ตามลำดับของ model (คอลัมน์ที่ถูก fix แล้วไม่ถูกอ่าน)"""
+        if len(columns) != self.num_features:
+            raise ValueError(f"Expected {self.num_features} columns, got {len(columns)}")
+        n_rows = len(columns[0]) if len(columns) else 0
+        cols = [np.asarray(c, dtype=np.float32) for c in columns]
+        has_missing = [bool(np.isnan(c).any()) for c in cols]
+
+        def evaluate(node):
+            if not isinstance(node, tuple):
+                return node
+            f, thr, default_left, left, right = node
+            go_right = cols[f] >= thr
+            if has_missing[f] and not default_left:
+                go_right |= np.isnan(cols[f])
+            left_value = evaluate(left)
+            # เลือกค่าด้วยเลขคณิตแทน np.where ซึ่งช้ากว่าหลายเท่าเมื่อเงื่อนไขกระจายแบบสุ่ม
+            return left_value + go_right * (evaluate(right) - left_value)
+
+        margin = np.full(n_rows, self.base_margin, dtype=np.float64)
+        for tree in self.trees:
+            margin += evaluate(tree)
+        return margin
+
+    def predict_proba_columns(self, columns: Sequence[np.ndarray]) -> np.ndarray:
+        """ความน่าจะเป็นของ class 1"""
+        return 1.0 / (1.0 + np.exp(-self.predict_margin_columns(columns)))
@@ -0,0 +1,155 @@
+"""
+รัน API หลาย worker process แบบ pre-fork
+
+    cd backend
+    python -m app.serve --host 0.0.0.0 --port 8000              # จำนวน worker ตาม WORKERS
+    python -m app.serve --workers 4
+
+parent import app และโหลด/ตรวจ model ชุดแรกครั้งเดียว แล้ว fork worker ที่รับ connection จาก socket เดียวกัน
+worker ใช้หน้า memory ของ model, pandas/numpy/xgboost ร่วมกับ parent (copy-on-write) แทนการโหลดเองทุกตัว
+(uvicorn --workers จะ spawn process ใหม่ที่ import และโหลด model เองทั้งหมด)
+worker ที่ตายจะถูก fork ใหม่จาก parent ซึ่งยังมี model ชุดเดิมอยู่ จึงไม่ต้องโหลดใหม่
+"""
+
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("app.serve")
+
+# worker ที่ตายภายในเวลานี้หลังเริ่มถือว่าเริ่มไม่สำเร็จ: รอก่อน fork ใหม่ (กันวน fork ไม่หยุด)
+RESPAWN_BACKOFF_S = 1.0
+
+
+def _bind(host: str, port: int, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Supervisor:
+    """fork worker ตามจำนวนที่กำหนด, fork ใหม่แทนตัวที่ตาย และส่ง SIGTERM ต่อให้ทุกตัวตอนปิด"""
+
+    def __init__(self, app, sock: socket.socket, workers: int, log_level: str):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.log_level = log_level
+        self.children: Dict[int, int] = {}  # pid -> worker index
+        self.started_at: Dict[int, float] = {}
+        self.stopping = False
+
+    def run(self) -> int:
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for index in range(self.workers):
+            self._spawn(index, respawn=False)
+        logger.info("👷 Started %d workers: %s", self.workers, sorted(self.children))
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            index = self.children.pop(pid, None)
+            if index is None:
+                continue
+            lifetime = time.monotonic() - self.started_at.pop(pid)
+            if self.stopping:
+                continue
+            logger.warning("⚠️ Worker %d (pid %d) exited with status %d, restarting", index, pid, status)
+            if lifetime < RESPAWN_BACKOFF_S:
+                time.sleep(RESPAWN_BACKOFF_S)
+            if not self.stopping:
+                self._spawn(index, respawn=True)
+        logger.info("👋 All workers stopped")
+        return 0
+
+    def _stop(self, signum, frame):
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _spawn(self, index: int, respawn: bool):
+        pid = os.fork()
+        if pid:
+            self.children[pid] = index
+            self.started_at[pid] = time.monotonic()
+            return
+        # child: ห้าม return กลับไปยังโค้ดของ parent ไม่ว่าจะจบแบบใด
+        code = 1
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            code = _serve_worker(self.app, self.sock, index, self.workers, self.log_level, respawn)
+        except BaseException:
+            logger.exception("❌ Worker %d crashed", index)
+        finally:
+            os._exit(code)
+
+
+def _serve_worker(app, sock: socket.socket, index: Optional[int], workers: int, log_level: str,
+                  respawn: bool = False) -> int:
+    import uvicorn
+    from .core import prefork
+
+    prefork.set_worker(index, workers, respawn)
+    server = uvicorn.Server(uvicorn.Config(app, log_level=log_level))
+    server.run(sockets=[sock])
+    return 0 if server.started else 3
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from .config import settings
+
+    parser = argparse.ArgumentParser(description="Serve the API with pre-forked workers sharing loaded models")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=settings.WORKERS,
+                        help="จำนวน worker process (ค่าเริ่มต้น = WORKERS, 0 = จำนวน CPU)")
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+
+    started = time.perf_counter()
+    from .main import app
+    from .core.model_registry import model_registry
+    from .core.prefork import process_memory
+    from .core.startup import startup_report
+
+    with startup_report.stage("preload"):
+        model_registry.preload()
+    sock = _bind(args.host, args.port, args.backlog)
+    logger.info(
+        "📦 Models preloaded in %.0f ms (parent RSS %s MB), serving on %s:%d",
+        (time.perf_counter() - started) * 1000, process_memory().get("rss_mb"), args.host, args.port,
+    )
+
+    if workers == 1:
+        return _serve_worker(app, sock, None, 1, args.log_level)
+
+    # object ที่มีอยู่ตอนนี้ (model, module ที่ import แล้ว) ไม่ถูก GC สแกน: การเขียน GC header
+    # จะทำให้หน้า memory ที่ใช้ร่วมกันถูกคัดลอกไปทุก worker
+    gc.collect()
+    gc.freeze()
+    return Supervisor(app, sock, workers, args.log_level).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
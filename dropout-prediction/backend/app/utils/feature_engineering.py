@@ -1,7 +1,137 @@
 import numpy as np
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 import math
 
+# จำนวนคอลัมน์ GPA รายเทอมสูงสุด (year1_term1 ... year5_term2)
+MAX_TERMS = 10
+
+# คำอธิบายภาษาไทยของ features ที่ model ใช้ (สำหรับ top_features ที่อธิบายผลทำนาย)
+FEATURE_LABELS = {
+    'OLD_GPA_M6': "เกรดเฉลี่ยสะสม (GPAX)",
+    'GENDER_ENCODED': "เพศ",
+    'FAC_ENCODED': "คณะ",
+    'COUNT_F': "จำนวนวิชาที่ได้ F",
+    'COUNT_WIU': "จำนวนวิชาที่ถอน (W/I/U)",
+    'TERM1': "เกรดเทอม 1",
+    'TERM2': "เกรดเทอม 2",
+    'TERM3': "เกรดเทอม 3",
+    'TERM1_missing': "ไม่มีเกรดเทอม 1",
+    'TERM2_missing': "ไม่มีเกรดเทอม 2",
+    'TERM3_missing': "ไม่มีเกรดเทอม 3",
+    'avg_gpa_up_to_now': "เกรดเฉลี่ยรายเทอมถึงปัจจุบัน",
+    'min_gpa_up_to_now': "เกรดเทอมต่ำสุด",
+    'max_gpa_up_to_now': "เกรดเทอมสูงสุด",
+    'gpa_change_from_start': "เกรดเปลี่ยนจากเทอมแรก",
+    'gpa_std_up_to_now': "ความผันผวนของเกรด",
+    'decline_last_term': "เกรดช่วงหลังต่ำกว่าช่วงก่อน",
+    'consecutive_decline_2': "เกรดเทอมล่าสุดลดลง",
+    'improvement_from_hs': "แนวโน้มเกรด",
+    'has_F': "มีวิชาที่ได้ F",
+    'multiple_F': "ได้ F หลายวิชา",
+    'low_gpa': "GPAX ต่ำกว่า 2.0",
+    'very_low_gpa': "GPAX ต่ำกว่า 1.5",
+    'early_warning': "สัญญาณเตือน: GPAX ต่ำกว่า 2.5 และมี F",
+    'declining_trend': "แนวโน้มเกรดลดลง",
+    'current_term': "เทอมปัจจุบัน",
+    'avg_gpa_squared': "เกรดเฉลี่ย (กำลังสอง)",
+    'COUNT_F_squared': "จำนวนวิชาที่ได้ F (กำลังสอง)",
+    'avg_gpa_x_COUNT_F': "เกรดเฉลี่ย × จำนวนวิชาที่ได้ F",
+    'avg_gpa_x_trend': "เกรดเฉลี่ย × การเปลี่ยนแปลงของเกรด",
+    'TERM1_x_TERM2': "เกรดเทอม 1 × เทอม 2",
+}
+
+# ข้อความของรหัสคำอธิบาย (get_feature_explanation_codes_batch) ให้ client แทน {value} ด้วยค่าประกอบเอง
+EXPLANATION_TEMPLATES = {
+    'GPA': "เกรดเฉลี่ยสะสม: {value}",
+    'gpa_trend': "แนวโน้มเกรด: {value}",
+    'COUNT_F': "จำนวนวิชาที่ได้ F: {value} วิชา",
+    'has_f': "มีประวัติได้เกรด F",
+    'early_warning': "มีสัญญาณเตือน: เกรดต่ำและมี F",
+    'declining_trend': "แนวโน้มเกรดลดลง",
+}
+
+
+# ตำแหน่งของ features ใน FeatureVector ตามลำดับ key ของ create_model_features
+# has_f/multiple_f (ชื่อที่ UI ใช้) มีค่าเดียวกับ has_F/multiple_F จึงใช้ช่องเดียวกัน
+FEATURE_NAMES = (
+    'TERM1', 'TERM2', 'TERM3', 'TERM4', 'TERM5', 'TERM6', 'TERM7', 'TERM8',
+    'TERM1_missing', 'TERM2_missing', 'TERM3_missing',
+    'COUNT_F', 'COUNT_WIU', 'OLD_GPA_M6',
+    'avg_gpa_up_to_now', 'min_gpa_up_to_now', 'max_gpa_up_to_now', 'improvement_from_hs',
+    'GENDER_ENCODED', 'FAC_ENCODED',
+    'has_F', 'multiple_F', 'low_gpa', 'very_low_gpa', 'declining_trend', 'early_warning',
+    'gpa_change_from_start', 'gpa_std_up_to_now', 'decline_last_term', 'consecutive_decline_2',
+    'current_term',
+)
+FEATURE_ALIASES = {'has_f': 'has_F', 'multiple_f': 'multiple_F'}
+FEATURE_INDEX = {
+    **{name: i for i, name in enumerate(FEATURE_NAMES)},
+    **{alias: FEATURE_NAMES.index(name) for alias, name in FEATURE_ALIASES.items()},
+}
+
+
+class FeatureVector:
+    """
+    features ของนักศึกษาหนึ่งคนใน buffer float64 ขนาดคงที่ (ตำแหน่งตาม FEATURE_INDEX)
+    ใช้แทน dict ของ create_model_features ในเส้นทางทำนายทีละคน: model เลือกคอลัมน์ของตัวเองจาก buffer
+    ด้วย index ที่คำนวณไว้ล่วงหน้า (DropoutPredictor.layouts) ไม่ต้องวนอ่าน dict ทีละ feature
+    อ่านแบบ dict ได้ด้วย get / [] (คำอธิบาย คำแนะนำ และ logistic model)
+    """
+
+    __slots__ = ("values",)
+
+    def __init__(self):
+        self.values = np.zeros(len(FEATURE_NAMES))
+
+    def get(self, name: str, default=0):
+        i = FEATURE_INDEX.get(name)
+        return default if i is None else self.values.item(i)
+
+    def __getitem__(self, name: str) -> float:
+        return self.values.item(FEATURE_INDEX[name])
+
+    def __contains__(self, name: str) -> bool:
+        return name in FEATURE_INDEX
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """features แบบ columnar หนึ่งแถว (view ของ buffer) สำหรับฟังก์ชันที่รับผลของ create_model_features_batch"""
+        return {name: self.values[i:i + 1] for name, i in FEATURE_INDEX.items()}
+
+    def to_dict(self) -> Dict[str, float]:
+        return {name: self.values.item(i) for name, i in FEATURE_INDEX.items()}
+
+
+def _numpy_sum(values: List[float]) -> float:
+    """ผลรวมของ list สั้นๆ ตามลำดับการบวกเดียวกับ np.sum (ค่าเดียวกับ _numpy_row_sum ของแถวเดียว)"""
+    if len(values) < 8:
+        total = 0.0
+        for value in values:
+            total += value
+        return total
+    v = values
+    total = ((v[0] + v[1]) + (v[2] + v[3])) + ((v[4] + v[5]) + (v[6] + v[7]))
+    for value in values[8:]:
+        total += value
+    return total
+
+
+def _numpy_row_sum(values: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """
+    รวมค่าในแต่ละแถว (ค่าที่ใช้ชิดซ้าย ส่วนที่เหลือเป็น 0) ตามลำดับการบวกแบบเดียวกับ np.sum
+    บน list สั้นๆ: บวกเรียงตัวเมื่อมีน้อยกว่า 8 ค่า และ pairwise 8 ช่องเมื่อมีตั้งแต่ 8 ค่า
+    ทำให้ผลลัพธ์ตรงกับ np.mean/np.std ของเวอร์ชันทีละแถวทุกบิต
+    """
+    sequential = np.zeros(values.shape[0])
+    for j in range(values.shape[1]):
+        sequential = sequential + values[:, j]
+    if values.shape[1] < 8:
+        return sequential
+    v = values
+    pairwise = ((v[:, 0] + v[:, 1]) + (v[:, 2] + v[:, 3])) + ((v[:, 4] + v[:, 5]) + (v[:, 6] + v[:, 7]))
+    for j in range(8, values.shape[1]):
+        pairwise = pairwise + values[:, j]
+    return np.where(counts >= 8, pairwise, sequential)
+
 class FeatureEngineer:
     """
     Class สำหรับสร้าง features ที่จำเป็นสำหรับโมเดลจากข้อมูลพื้นฐาน
@@ -194,6 +324,168 @@ class FeatureEngineer:
         
         return features
     
+    def create_model_vector(self,
+                            faculty: str,
+                            gender: str,
+                            gpax: float,
+                            count_f: int,
+                            term_gpas: List[Optional[float]],
+                            current_term: int = 1,
+                            out: Optional[FeatureVector] = None) -> FeatureVector:
+        """
+        features เดียวกับ create_model_features ทุกบิต แต่เขียนลง FeatureVector โดยตรง
+        คำนวณด้วย float ของ Python (ไม่สร้าง dict ย่อยและไม่แปลง list เป็น numpy array ทีละขั้น)
+        out: buffer เดิมที่ต้องการเขียนทับ (ค่าเริ่มต้น = สร้างใหม่)
+        """
+        vector = out if out is not None else FeatureVector()
+        valid = [gpa for gpa in term_gpas if gpa is not None]
+        n_valid = len(valid)
+        terms = [
+            term_gpas[i] if i < len(term_gpas) and term_gpas[i] is not None else 0.0
+            for i in range(8)
+        ]
+        missing = [
+            0.0 if i < len(term_gpas) and term_gpas[i] is not None else 1.0
+            for i in range(3)
+        ]
+        
+        avg_gpa = min_gpa = max_gpa = trend = gpa_std = 0.0
+        declining_trend = decline_last_term = consecutive_decline_2 = 0.0
+        if n_valid:
+            avg_gpa = _numpy_sum(valid) / n_valid
+            min_gpa = min(valid)
+            max_gpa = max(valid)
+        if n_valid >= 2:
+            trend = valid[-1] - valid[0]
+            squares = [(gpa - avg_gpa) * (gpa - avg_gpa) for gpa in valid]
+            gpa_std = math.sqrt(_numpy_sum(squares) / n_valid)
+            recent_avg = (valid[-2] + valid[-1]) / 2
+            earlier_avg = _numpy_sum(valid[:-2]) / (n_valid - 2) if n_valid > 2 else valid[0]
+            decline_last_term = float(recent_avg < earlier_avg)
+            declining_trend = float(n_valid >= 3 and recent_avg < earlier_avg)
+            consecutive_decline_2 = float(valid[-1] < valid[-2])
+        
+        vector.values[:] = (
+            *terms,
+            *missing,
+            float(count_f), 0.0, gpax,
+            avg_gpa, min_gpa, max_gpa, trend,
+            float(self.gender_mapping.get(gender, 0)), float(self.faculty_mapping.get(faculty, 0)),
+            float(count_f > 0), float(count_f > 1), float(gpax < 2.0), float(gpax < 1.5),
+            declining_trend, float(gpax < 2.5 and count_f > 0),
+            trend, gpa_std, decline_last_term, consecutive_decline_2,
+            float(current_term),
+        )
+        return vector
+    
+    def create_model_features_batch(self,
+                                    faculty: Union[str, Sequence[str]],
+                                    gender: Union[str, Sequence[str]],
+                                    gpax: Sequence[float],
+                                    count_f: Sequence[int],
+                                    term_gpas: np.ndarray,
+                                    current_term: int = 1) -> Dict[str, np.ndarray]:
+        """
+        สร้าง features แบบทั้งชุด (columnar) ให้ผลเหมือน create_model_features ทีละแถว
+        term_gpas: array ขนาด (N x 10) ใช้ NaN แทนเทอมที่ไม่มีข้อมูล
+        faculty/gender ส่งเป็น str เดียวได้เมื่อทุกแถวเป็นนักศึกษาคนเดียวกัน
+        คืนค่า dict ของชื่อ feature -> array ยาว N
+        """
+        gpas = np.asarray(term_gpas, dtype=float)
+        if gpas.ndim != 2 or gpas.shape[1] > MAX_TERMS:
+            raise ValueError(f"term_gpas must be an (N x {MAX_TERMS}) array")
+        if gpas.shape[1] < MAX_TERMS:
+            pad = np.full((gpas.shape[0], MAX_TERMS - gpas.shape[1]), np.nan)
+            gpas = np.hstack([gpas, pad])
+        
+        n_rows = gpas.shape[0]
+        gpax = np.asarray(gpax, dtype=float)
+        count_f = np.asarray(count_f).astype(int)
+        
+        # จัดค่า GPA ที่มีอยู่ให้ชิดซ้ายตามลำดับเทอม (เทียบเท่า valid_gpas)
+        present = ~np.isnan(gpas)
+        n_valid = present.sum(axis=1)
+        if (present[:, :-1] | ~present[:, 1:]).all():
+            # ไม่มีเทอมที่ว่างคั่นกลาง ค่าชิดซ้ายอยู่แล้ว
+            valid = np.where(present, gpas, 0.0)
+        else:
+            order = np.argsort(~present, axis=1, kind='stable')
+            valid = np.take_along_axis(np.where(present, gpas, 0.0), order, axis=1)
+        slot = np.arange(MAX_TERMS)
+        in_valid = slot < n_valid[:, None]
+        has_any = n_valid > 0
+        has_two = n_valid >= 2
+        
+        rows = np.arange(n_rows)
+        first = valid[:, 0]
+        last = valid[rows, np.maximum(n_valid - 1, 0)]
+        second_last = valid[rows, np.maximum(n_valid - 2, 0)]
+        
+        # GPA features
+        safe_n = np.maximum(n_valid, 1)
+        avg_gpa = np.where(has_any, _numpy_row_sum(valid, n_valid) / safe_n, 0.0)
+        min_gpa = np.where(has_any, np.where(in_valid, valid, np.inf).min(axis=1), 0.0)
+        max_gpa = np.where(has_any, np.where(in_valid, valid, -np.inf).max(axis=1), 0.0)
+        deviation = np.where(in_valid, valid - avg_gpa[:, None], 0.0)
+        gpa_std = np.where(has_two, np.sqrt(_numpy_row_sum(deviation * deviation, n_valid) / safe_n), 0.0)
+        gpa_trend = np.where(has_two, last - first, 0.0)
+        
+        # ค่าเฉลี่ยช่วงก่อนสองเทอมล่าสุด (valid_gpas[:-2])
+        n_earlier = np.maximum(n_valid - 2, 0)
+        earlier_values = np.where(slot < n_earlier[:, None], valid, 0.0)
+        earlier_avg = _numpy_row_sum(earlier_values, n_earlier) / np.maximum(n_earlier, 1)
+        recent_avg = (second_last + last) / 2
+        
+        # declining_trend ต้องมีอย่างน้อย 3 เทอม, decline_last_term ใช้เทอมแรกเมื่อมี 2 เทอม
+        declining_trend = (n_valid >= 3) & (recent_avg < earlier_avg)
+        decline_base = np.where(n_valid > 2, earlier_avg, first)
+        decline_last_term = has_two & (recent_avg < decline_base)
+        consecutive_decline_2 = has_two & (last < second_last)
+        
+        has_f = count_f > 0
+        multiple_f = count_f > 1
+        
+        features = {}
+        # Term features (TERM1-TERM8)
+        for i in range(1, 9):
+            features[f'TERM{i}'] = np.where(present[:, i - 1], gpas[:, i - 1], 0.0)
+        # Missing indicators (TERM1-TERM3)
+        for i in range(1, 4):
+            features[f'TERM{i}_missing'] = (~present[:, i - 1]).astype(int)
+        
+        features.update({
+            'COUNT_F': count_f.astype(float),
+            'COUNT_WIU': np.zeros(n_rows),
+            'OLD_GPA_M6': gpax,
+            'avg_gpa_up_to_now': avg_gpa,
+            'min_gpa_up_to_now': min_gpa,
+            'max_gpa_up_to_now': max_gpa,
+            'improvement_from_hs': gpa_trend,
+            'GENDER_ENCODED': self._encode_batch(gender, self.gender_mapping, n_rows),
+            'FAC_ENCODED': self._encode_batch(faculty, self.faculty_mapping, n_rows),
+            'has_F': has_f.astype(float),
+            'multiple_F': multiple_f.astype(float),
+            'has_f': has_f.astype(int),
+            'multiple_f': multiple_f.astype(int),
+            'low_gpa': (gpax < 2.0).astype(int),
+            'very_low_gpa': (gpax < 1.5).astype(int),
+            'declining_trend': declining_trend.astype(int),
+            'early_warning': ((gpax < 2.5) & has_f).astype(int),
+            'gpa_change_from_start': gpa_trend,
+            'gpa_std_up_to_now': gpa_std,
+            'decline_last_term': decline_last_term.astype(int),
+            'consecutive_decline_2': consecutive_decline_2.astype(int),
+            'current_term': np.full(n_rows, float(current_term)),
+        })
+        
+        return features
+    
+    @staticmethod
+    def _encode_batch(values: Union[str, Sequence[str]], mapping: Dict[str, int], n_rows: int) -> np.ndarray:
+        if isinstance(values, str):
+            return np.full(n_rows, float(mapping.get(values, 0)))
+        return np.array([float(mapping.get(v, 0)) for v in values])
+    
     def predict_future_scenario(self, 
                               current_features: Dict[str, float],
                               future_gpa: float,
@@ -228,6 +520,27 @@ class FeatureEngineer:
         
         return future_features
     
+    def future_scenario_columns(self,
+                                current_features: Dict[str, float],
+                                future_gpas: np.ndarray,
+                                current_term: int) -> Dict[str, np.ndarray]:
+        """
+        สร้าง scenario ของหลายเกรดเทอมถัดไปพร้อมกันแบบ columnar (หนึ่งแถวต่อเกรด)
+        ค่าที่ model ใช้ได้ผลเหมือน predict_future_scenario ทีละค่า: เปลี่ยนเฉพาะ TERM ของเทอมถัดไป
+        (GPA/last_gpa/num_terms_completed/gpa_trend ที่ predict_future_scenario คำนวณใหม่ไม่ใช่ input ของ model)
+        """
+        future_gpas = np.asarray(future_gpas, dtype=float)
+        n_rows = len(future_gpas)
+        columns = {
+            key: np.full(n_rows, float(value))
+            for key, value in current_features.items()
+            if isinstance(value, (int, float))
+        }
+        next_term = current_term + 1
+        if next_term <= 8:
+            columns[f'TERM{next_term}'] = future_gpas.copy()
+        return columns
+    
     def get_feature_explanation(self, features: Dict[str, float]) -> Dict[str, str]:
         """
         อธิบายความหมายของ features ที่สำคัญ
@@ -257,3 +570,52 @@ class FeatureEngineer:
             explanations['declining_trend'] = "แนวโน้มเกรดลดลง"
         
         return explanations
+    
+    def get_feature_explanation_batch(self, features: Dict[str, np.ndarray]) -> List[Dict[str, str]]:
+        """
+        อธิบาย features ของทุกแถวจากผลลัพธ์ของ create_model_features_batch (ข้อความเดียวกับ get_feature_explanation)
+        """
+        return [
+            {code: self.render_explanation(code, value) for code, value in row}
+            for row in self.get_feature_explanation_codes_batch(features)
+        ]
+    
+    def get_feature_explanation_codes_batch(self,
+                                            features: Dict[str, np.ndarray]) -> List[List[Tuple[str, Optional[float]]]]:
+        """
+        คำอธิบายของทุกแถวในรูปรหัส: [(รหัส, ค่าประกอบหรือ None), ...] ตามเงื่อนไขเดียวกับ get_feature_explanation
+        ตรวจเงื่อนไขทีละคอลัมน์ (ไม่วนสร้าง dict ทีละแถว) ข้อความของแต่ละรหัสอยู่ใน EXPLANATION_TEMPLATES
+        """
+        n_rows = len(next(iter(features.values()))) if features else 0
+        
+        def column(key: str) -> np.ndarray:
+            if key in features:
+                return np.asarray(features[key], dtype=float)
+            return np.zeros(n_rows)
+        
+        gpa, trend, count_f = column('GPA'), column('gpa_trend'), column('COUNT_F')
+        checks = [
+            ('GPA', gpa > 0, gpa),
+            ('gpa_trend', trend != 0, trend),
+            ('COUNT_F', count_f > 0, count_f),
+            ('has_f', column('has_f') == 1, None),
+            ('early_warning', column('early_warning') == 1, None),
+            ('declining_trend', column('declining_trend') == 1, None),
+        ]
+        codes: List[List[Tuple[str, Optional[float]]]] = [[] for _ in range(n_rows)]
+        for code, mask, values in checks:
+            for i in np.flatnonzero(mask).tolist():
+                codes[i].append((code, None if values is None else float(values[i])))
+        return codes
+    
+    @staticmethod
+    def render_explanation(code: str, value: Optional[float]) -> str:
+        """ข้อความภาษาไทยของรหัสคำอธิบาย (รูปแบบเดียวกับ get_feature_explanation)"""
+        if code == 'GPA':
+            return f"เกรดเฉลี่ยสะสม: {value:.2f}"
+        if code == 'gpa_trend':
+            trend_desc = "เพิ่มขึ้น" if value > 0 else "ลดลง"
+            return f"แนวโน้มเกรด: {trend_desc} {abs(value):.2f}"
+        if code == 'COUNT_F':
+            return f"จำนวนวิชาที่ได้ F: {int(value)} วิชา"
+        return EXPLANATION_TEMPLATES[code]
@@ -0,0 +1,317 @@
+"""
+Micro-benchmark ของ feature engineering และ inference
+
+    cd backend
+    python -m benchmarks.run                                 # วัดแล้วเทียบกับ benchmarks/baseline.json (ถ้ามี)
+    python -m benchmarks.run --save-baseline                 # บันทึกผลเป็น baseline ใหม่
+    python -m benchmarks.run --sizes 1,100 --threshold 0.3   # วัดเฉพาะบางขนาด
+
+ผลลัพธ์เป็น JSON (ค่าเริ่มต้น benchmarks/results/latest.json) จะจบด้วย exit code 1
+เมื่อมีรายการที่ช้ากว่า baseline เกิน threshold
+"""
+
+import argparse
+import gc
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+
+BENCH_DIR = Path(__file__).parent
+DEFAULT_SIZES = (1, 100, 10000, 100000)
+DEFAULT_OUTPUT = BENCH_DIR / "results" / "latest.json"
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+MODEL_KEYS = ("term1", "term2", "term3")
+
+
+def time_call(fn: Callable[[], Any], min_time: float, min_repeats: int, max_repeats: int) -> Dict[str, Any]:
+    """เรียก fn ซ้ำจนครบ min_repeats และรวมเวลาอย่างน้อย min_time วินาที (ไม่เกิน max_repeats ครั้ง)"""
+    fn()  # warm-up: import/แคชภายในต่าง ๆ ไม่นับรวม
+    timings: List[float] = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        while len(timings) < max_repeats and (len(timings) < min_repeats or sum(timings) < min_time):
+            started = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - started)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return {
+        "repeats": len(timings),
+        "min_s": min(timings),
+        "median_s": statistics.median(timings),
+        "mean_s": statistics.fmean(timings),
+    }
+
+
+def build_cases(size: int, seed: int, max_calls: int) -> Dict[str, Callable[[], Any]]:
+    """สร้างรายการ benchmark สำหรับข้อมูล size แถว (ฟังก์ชันทีละแถววัดเฉพาะเมื่อ size <= max_calls)"""
+    from app.core.batch_scoring import build_features, score_dataframe, score_dataframe_columns
+    from app.core.result_formats import dumps, encode_columnar, result_labels
+    from app.core.score_memo import ScoreMemo
+    from app.models.ml_model import predictor
+    from app.utils.feature_engineering import FeatureEngineer
+    from .synthetic import generate_students, to_dataframe, to_records
+
+    feature_engineer = FeatureEngineer()
+    columns = generate_students(size, seed=seed)
+    df = to_dataframe(columns)
+    features, num_terms = build_features(df, feature_engineer)
+
+    cases: Dict[str, Callable[[], Any]] = {}
+
+    # ทีละแถว: เส้นทางเดียวกับ /predict-from-basic
+    if size <= max_calls:
+        records = to_records(columns)
+        row_features = [
+            feature_engineer.create_model_features(r["faculty"], r["gender"], r["gpax"], r["count_f"], r["term_gpas"])
+            for r in records
+        ]
+
+        def create_model_features():
+            for r in records:
+                feature_engineer.create_model_features(r["faculty"], r["gender"], r["gpax"], r["count_f"], r["term_gpas"])
+
+        def get_feature_explanation():
+            for f in row_features:
+                feature_engineer.get_feature_explanation(f)
+
+        row_vectors = [
+            feature_engineer.create_model_vector(r["faculty"], r["gender"], r["gpax"], r["count_f"], r["term_gpas"])
+            for r in records
+        ]
+
+        def create_model_vector():
+            for r in records:
+                feature_engineer.create_model_vector(r["faculty"], r["gender"], r["gpax"], r["count_f"], r["term_gpas"])
+
+        cases["create_model_features"] = create_model_features
+        cases["create_model_vector"] = create_model_vector
+        cases["get_feature_explanation"] = get_feature_explanation
+
+        for model_key in MODEL_KEYS:
+            # ทุกแถวของ benchmark นี้ใช้ model เดียวกัน: แทนจำนวนเทอมด้วยค่าที่เลือก model นั้น
+            n_terms = {"term1": 1, "term2": 2, "term3": 3}[model_key]
+
+            def predict(n_terms=n_terms):
+                for f in row_features:
+                    predictor.predict(f, num_terms=n_terms)
+
+            def predict_vector(n_terms=n_terms):
+                for v in row_vectors:
+                    predictor.predict(v, num_terms=n_terms)
+
+            cases[f"predict[{model_key}]"] = predict
+            cases[f"predict_vector[{model_key}]"] = predict_vector
+
+        # งาน CPU ทั้งหมดของ /predict-from-basic หนึ่ง request (ไม่รวม HTTP และ top_features)
+        # dict = create_model_features แบบเดิม, vector = FeatureVector + FeatureLayout
+        def request(build):
+            for r in records:
+                features = build(r["faculty"], r["gender"], r["gpax"], r["count_f"], r["term_gpas"])
+                _, prob = predictor.predict(features, num_terms=r["num_terms"])
+                predictor.get_risk(prob)
+                feature_engineer.get_feature_explanation(features)
+
+        cases["request[dict]"] = lambda: request(feature_engineer.create_model_features)
+        cases["request[vector]"] = lambda: request(feature_engineer.create_model_vector)
+
+    # แบบ vectorized: เส้นทางเดียวกับ /batch-predict
+    cases["create_model_features_batch"] = lambda: build_features(df, feature_engineer)
+    cases["get_feature_explanation_batch"] = lambda: feature_engineer.get_feature_explanation_batch(features)
+    for model_key in MODEL_KEYS:
+        X = np.column_stack([
+            np.asarray(features[f], dtype=float) if f in features else np.zeros(size)
+            for f in predictor.features[model_key]
+        ])
+        cases[f"predict_matrix[{model_key}]"] = lambda X=X, model_key=model_key: predictor.predict_matrix(X, model_key)
+        if model_key in predictor.logistic:
+            logistic = predictor.logistic[model_key]
+            cases[f"predict_logistic[{model_key}]"] = lambda logistic=logistic: logistic.predict_proba_columns(features)
+    cases["score_dataframe"] = lambda: score_dataframe(df, predictor, feature_engineer, explain="none")
+    cases["score_dataframe_columns"] = lambda: score_dataframe_columns(df, predictor, feature_engineer, explain="none")
+    # roster เดิมที่อัปโหลดซ้ำ: ทุกแถวใช้ผลจาก ScoreMemo (วัดหลังบันทึกผลครั้งแรกแล้ว)
+    memo = ScoreMemo(":memory:")
+    ids = df.assign(student_id=[f"S{i:06d}" for i in range(size)])
+    score_dataframe_columns(ids, predictor, feature_engineer, explain="none", memo=memo)
+    cases["score_dataframe_columns[memo_hit]"] = lambda: score_dataframe_columns(
+        ids, predictor, feature_engineer, explain="none", memo=memo)
+    # serialization ของผลลัพธ์: JSON ทีละแถว (ค่าเริ่มต้น) เทียบกับ columnar
+    results = score_dataframe(df, predictor, feature_engineer, explain="none")
+    result_columns, _ = score_dataframe_columns(df, predictor, feature_engineer, explain="none")
+    labels = result_labels(predictor)
+    cases["encode_json"] = lambda: dumps({"count": len(results), "results": results})
+    cases["encode_columnar"] = lambda: encode_columnar(result_columns, labels)
+    _, _, backends = predictor.score_columns(features, num_terms)
+    cases["explain_columns"] = lambda: predictor.explain_columns(features, num_terms, backends)
+    return cases
+
+
+def run(sizes: List[int], seed: int, max_calls: int, min_time: float,
+        min_repeats: int, max_repeats: int) -> Dict[str, Dict[str, Any]]:
+    results: Dict[str, Dict[str, Any]] = {}
+    for size in sizes:
+        for name, fn in build_cases(size, seed, max_calls).items():
+            stats = time_call(fn, min_time, min_repeats, max_repeats)
+            stats["rows"] = size
+            stats["per_row_us"] = stats["min_s"] / size * 1e6
+            stats["rows_per_s"] = size / stats["min_s"] if stats["min_s"] > 0 else None
+            key = f"{name}/{size}"
+            results[key] = stats
+            print(f"{key:<42} {stats['min_s'] * 1000:>11.3f} ms  {stats['per_row_us']:>10.2f} µs/row  "
+                  f"(x{stats['repeats']})", flush=True)
+    return results
+
+
+# คู่ (เดิม, ใหม่) ของเส้นทางทีละ request ที่รายงานเวลา CPU ที่ลดลงต่อ request
+SINGLE_REQUEST_PAIRS = (
+    ("create_model_features", "create_model_vector"),
+    ("request[dict]", "request[vector]"),
+)
+
+
+def single_request_savings(results: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """เวลา CPU ต่อ request (µs) ของเส้นทาง dict เทียบกับ FeatureVector ที่ทุกขนาดที่วัดแบบทีละแถว"""
+    savings = []
+    for key, stats in results.items():
+        name, size = key.rsplit("/", 1)
+        for before, after in SINGLE_REQUEST_PAIRS:
+            other = results.get(f"{after}/{size}")
+            if name != before or other is None:
+                continue
+            saved = stats["per_row_us"] - other["per_row_us"]
+            savings.append({
+                "rows": int(size), "before": before, "after": after,
+                "before_us": round(stats["per_row_us"], 2), "after_us": round(other["per_row_us"], 2),
+                "saved_us": round(saved, 2), "saved_ratio": round(saved / stats["per_row_us"], 3),
+            })
+    return savings
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            threshold: float) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    เทียบเวลาที่ดีที่สุด (min_s) ของแต่ละรายการกับ baseline
+    min_s ผันผวนน้อยที่สุดสำหรับ micro-benchmark (เวลาที่มากกว่าเกิดจากสิ่งรบกวนภายนอก)
+    """
+    report = {"regressions": [], "improvements": [], "missing": [], "new": []}
+    for key, stats in results.items():
+        base = baseline.get(key)
+        if base is None:
+            report["new"].append({"case": key})
+            continue
+        ratio = stats["min_s"] / base["min_s"] if base["min_s"] > 0 else float("inf")
+        entry = {"case": key, "baseline_s": base["min_s"], "current_s": stats["min_s"], "ratio": ratio}
+        if ratio > 1 + threshold:
+            report["regressions"].append(entry)
+        elif ratio < 1 - threshold:
+            report["improvements"].append(entry)
+    report["missing"] = [{"case": key} for key in baseline if key not in results]
+    return report
+
+
+def environment() -> Dict[str, Any]:
+    from app.config import settings
+    from app.models.ml_model import predictor
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "time": datetime.now().isoformat(),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "model_backend": predictor.backend,
+        "model_version": predictor.model_version,
+        "app_version": settings.VERSION,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark feature engineering and inference")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="จำนวนแถวที่วัด คั่นด้วย comma")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-calls", type=int, default=10000,
+                        help="จำนวนแถวสูงสุดของ benchmark แบบทีละแถว (ขนาดที่ใหญ่กว่าวัดเฉพาะแบบ batch)")
+    parser.add_argument("--min-time", type=float, default=0.5, help="เวลารวมขั้นต่ำต่อรายการ (วินาที)")
+    parser.add_argument("--min-repeats", type=int, default=3)
+    parser.add_argument("--max-repeats", type=int, default=1000)
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="สัดส่วนที่ช้าลงได้ก่อนนับเป็น regression (0.2 = ช้าลงเกิน 20%%)")
+    parser.add_argument("--save-baseline", action="store_true", help="บันทึกผลครั้งนี้เป็น baseline")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    from app.models.ml_model import predictor
+    from app.models.prediction_cache import PredictionCache
+
+    if not predictor.load_models():
+        print("❌ Cannot load models", file=sys.stderr)
+        return 2
+    # วัดเวลาคำนวณจริง ไม่ใช่ LRU cache
+    predictor.cache = PredictionCache(0)
+    predictor.explanation_cache = PredictionCache(0)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    results = run(sizes, args.seed, args.max_calls, args.min_time, args.min_repeats, args.max_repeats)
+    output = {
+        "environment": environment(),
+        "config": {
+            "sizes": sizes,
+            "seed": args.seed,
+            "max_calls": args.max_calls,
+            "min_time": args.min_time,
+            "min_repeats": args.min_repeats,
+        },
+        "results": results,
+        "single_request": single_request_savings(results),
+    }
+    for entry in output["single_request"]:
+        print(f"⏱️ {entry['before']} -> {entry['after']} ({entry['rows']} rows): "
+              f"{entry['before_us']:.1f} -> {entry['after_us']:.1f} µs/request "
+              f"(saved {entry['saved_us']:.1f} µs, {entry['saved_ratio']:.0%})")
+
+    exit_code = 0
+    if args.baseline.exists() and not args.save_baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        if baseline.get("config", {}).get("seed") != args.seed:
+            print(f"⚠️ Baseline was recorded with seed {baseline.get('config', {}).get('seed')}")
+        report = compare(results, baseline["results"], args.threshold)
+        output["comparison"] = {"baseline": str(args.baseline), "threshold": args.threshold, **report}
+        for entry in report["improvements"]:
+            print(f"✅ faster  {entry['case']:<42} x{entry['ratio']:.2f}")
+        for entry in report["regressions"]:
+            print(f"❌ slower  {entry['case']:<42} x{entry['ratio']:.2f}")
+        if report["regressions"]:
+            exit_code = 1
+        else:
+            print(f"✅ No regressions above {args.threshold:.0%} against {args.baseline}")
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(output, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    print(f"📄 Results written to {args.output}")
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(output, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"📌 Baseline saved to {args.baseline}")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
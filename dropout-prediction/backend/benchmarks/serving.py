@@ -0,0 +1,209 @@
+"""
+Benchmark ของ `python -m app.serve`: throughput และหน่วยความจำต่อ worker เมื่อเพิ่มจำนวน worker
+
+    cd backend
+    python -m benchmarks.serving                               # 1, 2, 4, ... จนถึงจำนวน CPU
+    python -m benchmarks.serving --workers 1,2,4 --duration 10 --clients 32
+
+แต่ละจำนวน worker: เริ่ม server, ยิง POST /api/v1/predict-from-basic ด้วยนักศึกษาสังเคราะห์ที่ไม่ซ้ำกัน
+(ไม่โดน prediction cache) จาก client หลาย process แบบ keep-alive แล้วอ่าน smaps_rollup ของทุก worker
+- speedup / efficiency: throughput เทียบกับ 1 worker (efficiency 1.0 = เพิ่มขึ้นเป็นเส้นตรง)
+- worker_uss_mb: หน่วยความจำที่เป็นของ worker แต่ละตัวจริง ๆ (ส่วนที่เพิ่มเมื่อเพิ่ม worker หนึ่งตัว)
+- single_process_rss_mb: หน่วยความจำของ process เดียวที่โหลดทุกอย่างเอง (ราคาต่อ worker ถ้าไม่ได้ใช้ร่วมกัน)
+client รันบนเครื่องเดียวกันและใช้ CPU ด้วย: ผลที่ใกล้ความจริงที่สุดคือเมื่อ worker + client ไม่เกินจำนวน core
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+BENCH_DIR = Path(__file__).parent
+BACKEND_DIR = BENCH_DIR.parent
+DEFAULT_OUTPUT = BENCH_DIR / "results" / "serving.json"
+ENDPOINT = "/api/v1/predict-from-basic"
+
+
+def _payloads(n_rows: int, seed: int) -> List[bytes]:
+    from .synthetic import TERM_COLUMNS, generate_students
+
+    columns = generate_students(n_rows, seed=seed)
+    payloads = []
+    for i in range(n_rows):
+        body = {
+            "faculty": columns["faculty"][i],
+            "gender": columns["gender"][i],
+            "gpax": float(columns["gpax"][i]),
+            "count_f": int(columns["count_f"][i]),
+        }
+        for col in TERM_COLUMNS:
+            value = float(columns[col][i])
+            body[col] = None if value != value else value
+        payloads.append(json.dumps(body, ensure_ascii=False).encode("utf-8"))
+    return payloads
+
+
+def _client(port: int, payloads: List[bytes], start_at: float, deadline: float, queue):
+    """หนึ่ง connection ส่ง request ต่อกันจนถึง deadline (นับเฉพาะ request ที่เริ่มหลัง start_at = หลัง warm-up)"""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    headers = {"Content-Type": "application/json"}
+    latencies: List[float] = []
+    errors = 0
+    i = 0
+    while True:
+        started = time.time()
+        if started >= deadline:
+            break
+        try:
+            conn.request("POST", ENDPOINT, payloads[i % len(payloads)], headers)
+            response = conn.getresponse()
+            response.read()
+            if started < start_at:
+                pass
+            elif response.status == 200:
+                latencies.append(time.time() - started)
+            else:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        i += 1
+    conn.close()
+    queue.put((latencies, errors))
+
+
+def _children(pid: int) -> List[int]:
+    try:
+        return [int(p) for p in Path(f"/proc/{pid}/task/{pid}/children").read_text().split()]
+    except OSError:
+        return []
+
+
+def _wait_ready(port: int, workers: int, timeout: float) -> List[int]:
+    """รอจน /stats ตอบจาก worker ครบทุกตัว คืน pid ของ worker"""
+    deadline = time.time() + timeout
+    seen = set()
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            conn.request("GET", "/api/v1/stats")
+            seen.add(json.loads(conn.getresponse().read())["process"]["pid"])
+            conn.close()
+            if len(seen) >= workers:
+                return sorted(seen)
+        except (OSError, http.client.HTTPException, ValueError, KeyError):
+            time.sleep(0.2)
+    raise RuntimeError(f"Server with {workers} workers not ready after {timeout:.0f}s (saw {len(seen)})")
+
+
+def run_level(workers: int, port: int, clients: int, duration: float, warmup: float,
+              payloads: List[bytes]) -> Dict[str, Any]:
+    from app.core.prefork import process_memory
+
+    env = {**os.environ, "STARTUP_REPORT_PATH": "", "MODEL_WATCH_INTERVAL": "0", "LOG_LEVEL": "WARNING"}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "app.serve", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    try:
+        _wait_ready(port, workers, timeout=120)
+        ctx = multiprocessing.get_context("fork")
+        queue = ctx.Queue()
+        start_at = time.time() + warmup
+        deadline = start_at + duration
+        procs = [
+            ctx.Process(target=_client, args=(port, payloads[c::clients], start_at, deadline, queue))
+            for c in range(clients)
+        ]
+        for p in procs:
+            p.start()
+        results = [queue.get() for _ in procs]
+        for p in procs:
+            p.join()
+
+        latencies = [lat for lats, _ in results for lat in lats]
+        errors = sum(e for _, e in results)
+
+        pids = [server.pid] + (_children(server.pid) if workers > 1 else [])
+        memory = {pid: process_memory(pid) for pid in pids}
+        worker_memory = [memory[pid] for pid in pids[1:]] if workers > 1 else [memory[server.pid]]
+        return {
+            "workers": workers,
+            "clients": clients,
+            "requests": len(latencies),
+            "errors": errors,
+            "requests_per_s": round(len(latencies) / duration, 1),
+            "latency_ms": {
+                "p50": round(statistics.median(latencies) * 1000, 2) if latencies else None,
+                "p99": round(sorted(latencies)[int(len(latencies) * 0.99) - 1] * 1000, 2) if latencies else None,
+            },
+            "parent_memory": memory[server.pid] if workers > 1 else None,
+            "worker_memory": worker_memory,
+            "worker_uss_mb": round(statistics.fmean(m.get("uss_mb", 0) for m in worker_memory), 1),
+            "total_pss_mb": round(sum(m.get("pss_mb", 0) for m in memory.values()), 1),
+        }
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    cpus = os.cpu_count() or 1
+    default_levels = sorted({1, *(2 ** i for i in range(1, 8) if 2 ** i <= cpus), cpus})
+    parser = argparse.ArgumentParser(description="Benchmark pre-fork serving throughput and memory")
+    parser.add_argument("--workers", default=",".join(map(str, default_levels)),
+                        help="จำนวน worker ที่วัด คั่นด้วย comma")
+    parser.add_argument("--clients", type=int, default=0, help="จำนวน client process (0 = 4 ต่อ worker สูงสุด)")
+    parser.add_argument("--duration", type=float, default=10.0, help="เวลาวัดต่อระดับ (วินาที)")
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--rows", type=int, default=20000, help="จำนวนนักศึกษาสังเคราะห์ที่ใช้เป็น payload")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    args = parser.parse_args(argv)
+
+    levels = [int(w) for w in args.workers.split(",") if w.strip()]
+    clients = args.clients or 4 * max(levels)
+    payloads = _payloads(args.rows, args.seed)
+
+    results = []
+    for workers in levels:
+        result = run_level(workers, args.port, clients, args.duration, args.warmup, payloads)
+        results.append(result)
+        # เทียบกับระดับแรก (ปกติคือ 1 worker)
+        speedup = result["requests_per_s"] / results[0]["requests_per_s"] if results[0]["requests_per_s"] else 0.0
+        result["speedup"] = round(speedup, 2)
+        result["efficiency"] = round(speedup * levels[0] / workers, 2)
+        print(f"workers={workers:<3} {result['requests_per_s']:>9.1f} req/s  x{result['speedup']:<5} "
+              f"eff {result['efficiency']:<5} p50 {result['latency_ms']['p50']} ms  "
+              f"uss/worker {result['worker_uss_mb']} MB  total pss {result['total_pss_mb']} MB  "
+              f"errors {result['errors']}", flush=True)
+
+    single = next((r for r in results if r["workers"] == 1), None)
+    output = {
+        "environment": {"cpus": cpus, "python": sys.version.split()[0]},
+        "config": {"clients": clients, "duration": args.duration, "warmup": args.warmup, "rows": args.rows},
+        "single_process_rss_mb": single["worker_memory"][0].get("rss_mb") if single else None,
+        "results": results,
+    }
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(output, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    print(f"📄 Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
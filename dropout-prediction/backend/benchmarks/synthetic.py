@@ -0,0 +1,69 @@
+import numpy as np
+from typing import Any, Dict, List, Optional
+from app.utils.feature_engineering import MAX_TERMS, FeatureEngineer
+
+# ชื่อคอลัมน์เทอมตามไฟล์อัปโหลด (year1_term1 ... year5_term2)
+TERM_COLUMNS = [f"year{year}_term{term}" for year in range(1, 6) for term in (1, 2)]
+
+# สัดส่วนจำนวนเทอมที่มีเกรด: 1 เทอม (model term1), 2 เทอม (term2), 3-10 เทอม (term3)
+HISTORY_MIX = {1: 0.25, 2: 0.25, 3: 0.5}
+# สัดส่วนนักศึกษาที่มีเทอมว่างระหว่างประวัติ (ลาพัก/ไม่มีเกรด)
+MISSING_TERM_RATE = 0.1
+
+
+def generate_students(n_rows: int, seed: int = 0) -> Dict[str, Any]:
+    """
+    สร้างนักศึกษาสังเคราะห์ในรูปแบบคอลัมน์เดียวกับไฟล์ /batch-predict (ผลเหมือนเดิมทุกครั้งเมื่อ seed เท่าเดิม)
+    ครอบคลุมประวัติ 1, 2 และ 3+ เทอม, เทอมที่ว่างระหว่างทาง และทุกคณะ/เพศใน FeatureEngineer
+    """
+    rng = np.random.default_rng(seed)
+    feature_engineer = FeatureEngineer()
+    faculties = list(feature_engineer.faculty_mapping)
+    genders = list(feature_engineer.gender_mapping)
+
+    groups = rng.choice(list(HISTORY_MIX), n_rows, p=list(HISTORY_MIX.values()))
+    num_terms = np.where(groups == 3, rng.integers(3, MAX_TERMS + 1, n_rows), groups)
+
+    level = rng.uniform(1.0, 3.8, n_rows)[:, None]
+    gpas = np.clip(rng.normal(level, 0.45, (n_rows, MAX_TERMS)), 0.0, 4.0).round(2)
+    gpas[np.arange(MAX_TERMS)[None, :] >= num_terms[:, None]] = np.nan
+
+    # เทอมว่างระหว่างทาง (ไม่ใช่เทอมแรก/เทอมล่าสุด) เฉพาะคนที่มีอย่างน้อย 3 เทอม
+    holes = np.flatnonzero((rng.random(n_rows) < MISSING_TERM_RATE) & (num_terms >= 3))
+    gpas[holes, rng.integers(1, num_terms[holes] - 1)] = np.nan
+
+    columns: Dict[str, Any] = {
+        "student_id": [f"S{i:06d}" for i in range(n_rows)],
+        "name": [f"Student {i}" for i in range(n_rows)],
+        # วนทุกคณะตามลำดับก่อนสุ่ม เพื่อให้ทุกคณะปรากฏแม้จำนวนแถวน้อย
+        "faculty": [faculties[i] for i in rng.permutation(np.arange(n_rows) % len(faculties))],
+        "gender": rng.choice(genders, n_rows).tolist(),
+        "gpax": np.nanmean(gpas, axis=1).round(2),
+        "count_f": rng.poisson(0.7, n_rows),
+    }
+    for j, col in enumerate(TERM_COLUMNS):
+        columns[col] = gpas[:, j]
+    return columns
+
+
+def to_records(columns: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """แปลงเป็นรายการ dict ทีละคน (term_gpas เป็น list ที่ใช้ None แทนเทอมที่ไม่มีเกรด)"""
+    records = []
+    for i in range(len(columns["student_id"])):
+        term_gpas: List[Optional[float]] = [
+            None if np.isnan(columns[col][i]) else float(columns[col][i]) for col in TERM_COLUMNS
+        ]
+        records.append({
+            "faculty": columns["faculty"][i],
+            "gender": columns["gender"][i],
+            "gpax": float(columns["gpax"][i]),
+            "count_f": int(columns["count_f"][i]),
+            "term_gpas": term_gpas,
+            "num_terms": sum(1 for gpa in term_gpas if gpa is not None),
+        })
+    return records
+
+
+def to_dataframe(columns: Dict[str, Any]):
+    import pandas as pd
+    return pd.DataFrame(columns)
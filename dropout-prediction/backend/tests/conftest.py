@@ -0,0 +1,15 @@
+import pytest
+
+from app.core.model_registry import model_registry
+from app.models.ml_model import predictor
+
+
+@pytest.fixture(scope="session")
+def models():
+    """ชุด model จาก MODEL_DIR (โหลดครั้งเดียวต่อการรัน test) ข้าม test ถ้าไม่มีไฟล์ model"""
+    # ไม่เขียน MODEL_STATE_PATH ทับของ server ที่อาจรันอยู่ในโฟลเดอร์เดียวกัน
+    model_registry.state_path = None
+    model_registry.preload()
+    if not predictor.ready:
+        pytest.skip("Model files not available")
+    return predictor
@@ -0,0 +1,132 @@
+"""
+/predict-from-basic ต้องตอบได้เร็วเท่าเดิมระหว่างที่มีไฟล์ batch ขนาดใหญ่กำลังถูกประมวลผล
+(ทั้งแบบ stream และแบบตอบก้อนเดียว: ทำนายทีละ chunk ใน inference pool ส่วนอ่านไฟล์/encode อยู่นอก pool
+request ทีละคนจึงแทรกเข้า pool ได้ระหว่าง chunk เสมอ)
+"""
+
+import asyncio
+import io
+import itertools
+import statistics
+import time
+
+import httpx
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.api.v1.endpoints import batch
+from app.core.executors import shutdown_executors, start_executors
+from app.core.ingestion import OPTIONAL_TERM_COLUMNS, REQUIRED_COLUMNS
+from app.main import app
+
+STUDENT = {
+    "faculty": "วิศวกรรมศาสตร์",
+    "gender": "ชาย",
+    "gpax": 2.35,
+    "count_f": 1,
+    "year1_term1": 2.5,
+    "year1_term2": 2.2,
+    "year2_term1": 2.1,
+}
+
+
+@pytest.fixture(scope="module", autouse=True)
+def executors(models):
+    start_executors()
+    yield
+    shutdown_executors()
+
+
+def large_upload(n_rows: int = 60000, seed: int = 0) -> bytes:
+    rng = np.random.default_rng(seed)
+    term_columns = REQUIRED_COLUMNS[4:] + OPTIONAL_TERM_COLUMNS
+    gpas = np.clip(rng.normal(2.6, 0.6, (n_rows, len(term_columns))), 0.0, 4.0).round(2)
+    gpas[np.arange(len(term_columns))[None, :] >= rng.integers(1, len(term_columns) + 1, n_rows)[:, None]] = np.nan
+    df = pd.DataFrame(gpas, columns=term_columns)
+    df.insert(0, "student_id", [f"S{i:06d}" for i in range(n_rows)])
+    df.insert(1, "faculty", rng.choice(["วิศวกรรมศาสตร์", "บริหารธุรกิจ", "อื่นๆ"], n_rows))
+    df.insert(2, "gender", rng.choice(["ชาย", "หญิง"], n_rows))
+    df.insert(3, "gpax", np.nanmean(gpas, axis=1).round(2))
+    df.insert(4, "count_f", rng.poisson(0.7, n_rows))
+    return df.to_csv(index=False).encode("utf-8")
+
+
+# gpax ไม่ซ้ำกันทุก request: ผลไม่อยู่ใน prediction cache จึงต้องผ่าน inference pool ทุกครั้ง
+_gpax = (round(2.0 + i * 1e-4, 4) for i in itertools.count())
+
+
+async def poll_latency(client: httpx.AsyncClient, until: asyncio.Event = None, count: int = 0):
+    """เวลาตอบ (ms) ของ /predict-from-basic ทีละ request จนกว่า until จะถูก set (หรือครบ count ครั้ง)"""
+    latencies = []
+    while (until is not None and not until.is_set()) or len(latencies) < count:
+        started = time.perf_counter()
+        response = await client.post("/api/v1/predict-from-basic", json={**STUDENT, "gpax": next(_gpax)})
+        latencies.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200
+        await asyncio.sleep(0.005)
+    return latencies
+
+
+async def measure(content: bytes, params: dict, uploads: int = 1):
+    """เวลาตอบตอนว่าง และระหว่างที่มีการอัปโหลด uploads ไฟล์พร้อมกัน"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=120) as client:
+        await poll_latency(client, count=20)
+        idle = await poll_latency(client, count=100)
+
+        done = asyncio.Event()
+        remaining = [uploads]
+
+        async def upload():
+            try:
+                return await client.post(
+                    "/api/v1/batch-predict", params=params,
+                    files={"file": ("large.csv", content, "text/csv")},
+                )
+            finally:
+                remaining[0] -= 1
+                if not remaining[0]:
+                    done.set()
+
+        *responses, busy = await asyncio.gather(*[upload() for _ in range(uploads)], poll_latency(client, until=done))
+    return idle, busy, responses
+
+
+def assert_interactive_latency(idle, busy):
+    assert len(busy) >= 20
+    # request ทีละคนไม่ต้องรอคิวหลัง chunk ของ batch: ช้าลงได้บ้างจากการแย่ง CPU แต่ไม่ควรเกินหลายเท่า
+    idle_median = statistics.median(idle)
+    busy_median = statistics.median(busy)
+    assert busy_median < max(3 * idle_median, idle_median + 15), (idle_median, busy_median, len(busy))
+
+
+def test_interactive_latency_during_large_stream_upload():
+    content = large_upload()
+    idle, busy, (response,) = asyncio.run(measure(content, {"stream": "ndjson", "incremental": "false"}))
+
+    assert response.status_code == 200
+    assert response.content.count(b"\n") == 60000
+    assert b'"error"' not in response.content[-200:]
+    assert_interactive_latency(idle, busy)
+
+
+def test_interactive_latency_during_concurrent_uploads():
+    # ค่าเริ่มต้น (ไม่ stream, format=json): ทำนายทีละ chunk ไม่ใช่งานเดียวทั้งไฟล์ใน inference pool
+    content = large_upload(n_rows=30000, seed=1)
+    params = {"incremental": "false", "explain": "none"}
+    started = time.perf_counter()
+    batch._score_columns(pd.read_csv(io.BytesIO(content)), "none", False)
+    full_file_ms = (time.perf_counter() - started) * 1000
+
+    idle, busy, responses = asyncio.run(measure(content, params, uploads=2))
+
+    for response in responses:
+        assert response.status_code == 200
+        body = response.json()
+        assert body["count"] == 30000 and body["recomputed"] == 30000
+        assert [r["student_id"] for r in body["results"][:3]] == ["S000000", "S000001", "S000002"]
+    assert responses[0].json()["results"] == responses[1].json()["results"]
+    assert_interactive_latency(idle, busy)
+    # ไม่มี request ไหนต้องรอจนทำนายเสร็จทั้งไฟล์ (สองไฟล์พร้อมกันเคยกัน inference pool ทั้งสอง thread)
+    assert max(busy) < full_file_ms, (max(busy), full_file_ms)
@@ -0,0 +1,128 @@
+"""
+MicroBatcher / predict_one: รวม request พร้อมกันเป็น batch ต่อ model, flush ตามขนาดหรือเวลา,
+ปฏิเสธเมื่อคิวเต็ม และใช้ logistic model แทนเมื่อคิวเต็ม (FALLBACK_ON_OVERLOAD)
+"""
+
+import asyncio
+import random
+
+import pytest
+
+from app.config import settings
+from app.core import batching
+from app.core.batching import BatcherOverloaded, MicroBatcher, predict_one
+from app.core.executors import shutdown_executors, start_executors
+from app.utils.feature_engineering import FeatureEngineer
+
+fe = FeatureEngineer()
+
+
+@pytest.fixture(autouse=True)
+def setup(models):
+    start_executors()
+    # ทุก test ต้องผ่านคิวจริง ไม่ใช่ผลจาก prediction cache ของ test ก่อน
+    models.cache.clear()
+    yield
+    shutdown_executors()
+
+
+def students(n: int, seed: int = 0):
+    """(features, จำนวนเทอม) สุ่ม 1-3 เทอม = ใช้ model term1/term2/term3 ปนกัน"""
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(n):
+        n_terms = rng.randint(1, 3)
+        features = fe.create_model_features(
+            faculty=rng.choice(list(fe.faculty_mapping)),
+            gender=rng.choice(list(fe.gender_mapping)),
+            gpax=round(rng.uniform(1.5, 3.8), 2),
+            count_f=rng.randint(0, 3),
+            term_gpas=[round(rng.uniform(0.5, 4.0), 2) for _ in range(n_terms)],
+        )
+        rows.append((features, n_terms))
+    return rows
+
+
+async def gather_predictions(batcher: MicroBatcher, rows, return_exceptions: bool = False):
+    return await asyncio.gather(
+        *[batcher.predict(features, num_terms=n) for features, n in rows],
+        return_exceptions=return_exceptions,
+    )
+
+
+def test_concurrent_mixed_models_get_their_own_results(models):
+    rows = students(60)
+    batcher = MicroBatcher(models, max_batch_size=64, max_wait_ms=5)
+    results = asyncio.run(gather_predictions(batcher, rows))
+
+    models.cache.clear()
+    for (features, n), (pred, prob, top_features) in zip(rows, results):
+        assert (pred, prob) == models.predict(features, num_terms=n)
+        assert top_features is None
+    stats = batcher.stats()
+    # หนึ่ง batch ต่อ model key
+    assert stats["batches"] == len({models.get_model_for_term(n) for _, n in rows})
+    assert stats["rows"] == len(rows)
+    assert stats["queue_depth"] == 0
+
+
+def test_flush_when_batch_is_full(models):
+    rows = [(features, 3) for features, _ in students(8, seed=1)]
+    # รอได้นานมาก: ถ้าไม่ flush ตามขนาด test จะค้าง
+    batcher = MicroBatcher(models, max_batch_size=4, max_wait_ms=60_000)
+
+    async def run():
+        return await asyncio.wait_for(gather_predictions(batcher, rows), timeout=10)
+
+    results = asyncio.run(run())
+    assert len(results) == 8
+    stats = batcher.stats()
+    assert stats["size_flushes"] == 2
+    assert stats["timeout_flushes"] == 0
+    assert stats["max_batch_size_seen"] == 4
+
+
+def test_flush_after_max_wait(models):
+    rows = [(features, 2) for features, _ in students(3, seed=2)]
+    batcher = MicroBatcher(models, max_batch_size=64, max_wait_ms=30)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        results = await gather_predictions(batcher, rows)
+        return results, loop.time() - started
+
+    results, elapsed = asyncio.run(run())
+    assert len(results) == 3
+    assert elapsed >= 0.03
+    stats = batcher.stats()
+    assert stats["timeout_flushes"] == 1
+    assert stats["size_flushes"] == 0
+    assert stats["batches"] == 1
+
+
+def test_overloaded_when_queue_is_full(models):
+    rows = [(features, 1) for features, _ in students(5, seed=3)]
+    batcher = MicroBatcher(models, max_batch_size=64, max_wait_ms=20, max_queue=3)
+    results = asyncio.run(gather_predictions(batcher, rows, return_exceptions=True))
+
+    assert all(isinstance(r, tuple) for r in results[:3])
+    assert all(isinstance(r, BatcherOverloaded) for r in results[3:])
+    assert batcher.stats()["rejected"] == 2
+
+
+def test_predict_one_falls_back_to_logistic_on_overload(models, monkeypatch):
+    features, n = students(1, seed=4)[0]
+    model_key = models.get_model_for_term(n)
+    if model_key not in models.logistic:
+        pytest.skip("Logistic fallback model not available")
+    monkeypatch.setattr(batching, "batcher", MicroBatcher(models, max_queue=0))
+
+    monkeypatch.setattr(settings, "FALLBACK_ON_OVERLOAD", True)
+    pred, prob, backend = asyncio.run(predict_one(features, num_terms=n))
+    assert backend == "logistic"
+    assert (pred, prob) == models.predict_logistic(features, model_key)
+
+    monkeypatch.setattr(settings, "FALLBACK_ON_OVERLOAD", False)
+    with pytest.raises(BatcherOverloaded):
+        asyncio.run(predict_one(features, num_terms=n))
@@ -0,0 +1,116 @@
+"""
+app.bulk_score: รันต่อจาก shard ที่เขียนเสร็จแล้วหลังถูกขัดจังหวะ ผลรวมต้องเท่ากับการรันรวดเดียว
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import bulk_score
+from app.core.ingestion import REQUIRED_COLUMNS
+
+N_ROWS = 400
+SHARD_ROWS = 50
+N_SHARDS = N_ROWS // SHARD_ROWS
+
+
+class Interrupted(Exception):
+    """จำลองการรันที่ถูกขัดจังหวะ (เช่น Ctrl+C หรือ process ถูก kill)"""
+
+
+@pytest.fixture(autouse=True)
+def requires_pyarrow(models):
+    pytest.importorskip("pyarrow")
+
+
+@pytest.fixture
+def roster(tmp_path):
+    rng = np.random.default_rng(5)
+    term_columns = REQUIRED_COLUMNS[4:]
+    gpas = np.clip(rng.normal(2.4, 0.8, (N_ROWS, len(term_columns))), 0.0, 4.0).round(2)
+    gpas[np.arange(len(term_columns))[None, :] >= rng.integers(1, len(term_columns) + 1, N_ROWS)[:, None]] = np.nan
+    df = pd.DataFrame(gpas, columns=term_columns)
+    df.insert(0, "student_id", [f"S{i:05d}" for i in range(N_ROWS)])
+    df.insert(1, "faculty", rng.choice(["วิศวกรรมศาสตร์", "บริหารธุรกิจ", "อื่นๆ"], N_ROWS))
+    df.insert(2, "gender", rng.choice(["ชาย", "หญิง"], N_ROWS))
+    df.insert(3, "gpax", np.nanmean(gpas, axis=1).round(2))
+    df.insert(4, "count_f", rng.poisson(0.7, N_ROWS))
+    path = tmp_path / "students.csv"
+    df.to_csv(path, index=False)
+    return path
+
+
+def run(input_path, output, fmt, **kwargs):
+    kwargs.setdefault("explain", "high")
+    return bulk_score.run(input_path, output, fmt, workers=2, shard_rows=SHARD_ROWS, **kwargs)
+
+
+def interrupted_run(monkeypatch, input_path, output, fmt, **kwargs):
+    """รันแล้วหยุดทันทีที่ shard แรกเขียนเสร็จ คืนไฟล์ part ที่ค้างอยู่"""
+    progress = bulk_score._progress
+
+    def interrupt(*args):
+        progress(*args)
+        raise Interrupted()
+
+    with monkeypatch.context() as patch:
+        patch.setattr(bulk_score, "_progress", interrupt)
+        with pytest.raises(Interrupted):
+            run(input_path, output, fmt, **kwargs)
+    assert not output.exists()
+    return sorted(output.with_name(output.name + ".shards").glob(f"part-*.{fmt}"))
+
+
+def read_output(path, fmt):
+    if fmt == "csv":
+        return path.read_bytes()
+    import pyarrow.parquet as pq
+    return pq.read_table(path)
+
+
+@pytest.mark.parametrize("fmt", bulk_score.OUTPUT_FORMATS)
+def test_resume_skips_finished_shards(monkeypatch, roster, tmp_path, fmt):
+    complete = tmp_path / f"complete.{fmt}"
+    summary = run(roster, complete, fmt)
+    assert summary["rows"] == N_ROWS and summary["shards"] == N_SHARDS and summary["resumed_shards"] == 0
+    assert not complete.with_name(complete.name + ".shards").exists()
+
+    output = tmp_path / f"resumed.{fmt}"
+    parts = interrupted_run(monkeypatch, roster, output, fmt)
+    # shard ที่ส่งเข้า pool แล้วเขียนเสร็จได้ แต่ shard ที่ยังไม่ได้อ่านต้องไม่มี
+    assert 1 <= len(parts) < N_SHARDS
+    written = {part: part.stat().st_mtime_ns for part in parts}
+
+    summary = run(roster, output, fmt, keep_shards=True)
+    assert summary["resumed_shards"] == len(parts)
+    assert summary["scored_rows"] == N_ROWS - len(parts) * SHARD_ROWS
+    # part เดิมไม่ถูกเขียนใหม่
+    assert {part: part.stat().st_mtime_ns for part in parts} == written
+    assert read_output(output, fmt) == read_output(complete, fmt)
+
+
+@pytest.mark.parametrize("change", ["input", "explain", "shard_rows", "no_resume"])
+def test_changed_input_or_settings_discards_shards(monkeypatch, roster, tmp_path, change):
+    output = tmp_path / "out.parquet"
+    parts = interrupted_run(monkeypatch, roster, output, "parquet")
+    assert parts
+
+    kwargs = {}
+    if change == "input":
+        df = pd.read_csv(roster)
+        df.loc[0, "gpax"] = 3.99
+        df.to_csv(roster, index=False)
+    elif change == "explain":
+        kwargs["explain"] = "all"
+    elif change == "no_resume":
+        kwargs["resume"] = False
+    shard_rows = SHARD_ROWS * 2 if change == "shard_rows" else SHARD_ROWS
+    kwargs.setdefault("explain", "high")
+
+    summary = bulk_score.run(roster, output, "parquet", workers=2, shard_rows=shard_rows, **kwargs)
+    assert summary["resumed_shards"] == 0
+    assert summary["scored_rows"] == N_ROWS
+
+    complete = tmp_path / "complete.parquet"
+    bulk_score.run(roster, complete, "parquet", workers=2, shard_rows=shard_rows, **kwargs)
+    assert read_output(output, "parquet") == read_output(complete, "parquet")
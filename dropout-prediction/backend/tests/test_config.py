@@ -0,0 +1,41 @@
+"""
+path ใน Settings: relative = เทียบกับโฟลเดอร์ backend เสมอ (ไม่ขึ้นกับโฟลเดอร์ที่รัน process)
+"""
+
+import os
+import subprocess
+import sys
+
+from app.config import BACKEND_DIR, resolve_path
+
+
+def test_resolve_path(tmp_path):
+    assert resolve_path("data/jobs.sqlite3") == str(BACKEND_DIR / "data" / "jobs.sqlite3")
+    assert resolve_path(str(tmp_path / "x.db")) == str(tmp_path / "x.db")
+    # ค่าว่าง = ปิด
+    assert resolve_path("") == ""
+
+
+def test_data_paths_do_not_depend_on_cwd(tmp_path):
+    # import app จากโฟลเดอร์อื่น: ทุก path ต้องชี้ไปที่เดียวกับเมื่อรันจากโฟลเดอร์ backend
+    script = (
+        "from app.core.jobs import job_manager\n"
+        "from app.core.model_registry import model_registry\n"
+        "from app.core.score_memo import score_memo\n"
+        "from app.core.startup import startup_report\n"
+        "from app.core.students import student_service\n"
+        "from app.core.upload_cache import upload_cache\n"
+        "from app.models.ml_model import predictor\n"
+        "for path in (job_manager.store.db_path, job_manager.store.jobs_dir, model_registry.state_path,\n"
+        "             score_memo.db_path, startup_report.report_path, student_service.store.db_path,\n"
+        "             upload_cache.directory, predictor.model_path('term1')):\n"
+        "    print(path)\n"
+    )
+    env = {**os.environ, "PYTHONPATH": str(BACKEND_DIR)}
+    runs = [
+        subprocess.run([sys.executable, "-c", script], cwd=cwd, env=env,
+                       capture_output=True, text=True, check=True).stdout.split()
+        for cwd in (BACKEND_DIR, tmp_path)
+    ]
+    assert runs[0] == runs[1]
+    assert all(path.startswith(str(BACKEND_DIR)) for path in runs[1])
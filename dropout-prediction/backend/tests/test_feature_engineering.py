@@ -0,0 +1,104 @@
+"""
+create_model_features_batch / create_model_vector ต้องให้ค่าเดียวกับ create_model_features ทีละแถวทุก feature
+รันจากโฟลเดอร์ backend: python -m pytest -q
+"""
+
+import random
+from typing import List, Optional
+
+import numpy as np
+import pytest
+
+from app.utils.feature_engineering import FEATURE_INDEX, MAX_TERMS, FeatureEngineer
+
+fe = FeatureEngineer()
+
+FACULTIES = list(fe.faculty_mapping) + ["ไม่ทราบคณะ", ""]
+GENDERS = list(fe.gender_mapping) + ["ไม่ระบุ"]
+
+
+def random_student(rng: random.Random) -> dict:
+    """นักศึกษาสุ่ม: จำนวนเทอม 0-10, มีเทอมว่างคั่นกลาง/ท้าย, คณะและเพศที่ไม่รู้จัก"""
+    n_terms = rng.randint(0, MAX_TERMS)
+    terms: List[Optional[float]] = [
+        round(rng.uniform(0.0, 4.0), rng.choice([1, 2, 2, 2, 6])) for _ in range(n_terms)
+    ]
+    for i in range(n_terms):
+        if rng.random() < 0.15:
+            terms[i] = None
+    # บางคนส่ง list ยาวกว่าจำนวนเทอมที่มีข้อมูล (ช่องท้ายเป็น None)
+    terms += [None] * rng.randint(0, MAX_TERMS - n_terms)
+    return {
+        "faculty": rng.choice(FACULTIES),
+        "gender": rng.choice(GENDERS),
+        "gpax": round(rng.uniform(0.0, 4.0), 2),
+        "count_f": rng.choice([0, 0, 0, 1, 2, 5]),
+        "term_gpas": terms,
+    }
+
+
+def term_matrix(students: List[dict]) -> np.ndarray:
+    gpas = np.full((len(students), MAX_TERMS), np.nan)
+    for row, student in enumerate(students):
+        for col, gpa in enumerate(student["term_gpas"]):
+            if gpa is not None:
+                gpas[row, col] = gpa
+    return gpas
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("current_term", [1, 3])
+def test_batch_matches_per_row(seed, current_term):
+    rng = random.Random(seed)
+    students = [random_student(rng) for _ in range(2000)]
+    batch = fe.create_model_features_batch(
+        faculty=[s["faculty"] for s in students],
+        gender=[s["gender"] for s in students],
+        gpax=[s["gpax"] for s in students],
+        count_f=[s["count_f"] for s in students],
+        term_gpas=term_matrix(students),
+        current_term=current_term,
+    )
+
+    rows = [fe.create_model_features(**s, current_term=current_term) for s in students]
+    assert set(batch) == set(rows[0])
+    for name, column in batch.items():
+        expected = np.array([float(row[name]) for row in rows])
+        np.testing.assert_array_equal(column, expected, err_msg=name)
+
+
+def test_batch_single_student_and_short_matrix():
+    """faculty/gender เป็น str เดียวได้ และ term_gpas กว้างน้อยกว่า MAX_TERMS ถูกเติม NaN"""
+    terms = [3.1, None, 2.45, 1.9]
+    batch = fe.create_model_features_batch(
+        faculty="วิศวกรรมศาสตร์",
+        gender="หญิง",
+        gpax=[2.6, 2.6],
+        count_f=[1, 1],
+        term_gpas=np.array([[3.1, np.nan, 2.45, 1.9], [3.1, np.nan, 2.45, 1.9]]),
+    )
+    row = fe.create_model_features("วิศวกรรมศาสตร์", "หญิง", 2.6, 1, terms)
+    for name, column in batch.items():
+        np.testing.assert_array_equal(column, [float(row[name])] * 2, err_msg=name)
+
+
+def test_batch_rejects_too_many_terms():
+    with pytest.raises(ValueError):
+        fe.create_model_features_batch("อื่นๆ", "ชาย", [2.0], [0], np.zeros((1, MAX_TERMS + 1)))
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_vector_matches_per_row(seed):
+    rng = random.Random(seed)
+    vector = None
+    for _ in range(2000):
+        student = random_student(rng)
+        current_term = rng.randint(1, 3)
+        expected = fe.create_model_features(**student, current_term=current_term)
+        # ใช้ out ซ้ำเหมือน request path เพื่อให้แน่ใจว่าไม่มีค่าค้างจากแถวก่อน
+        vector = fe.create_model_vector(**student, current_term=current_term, out=vector)
+
+        assert set(expected) == set(FEATURE_INDEX)
+        for name, value in expected.items():
+            assert vector[name] == float(value), name
+        assert vector.to_dict() == {name: float(value) for name, value in expected.items()}
@@ -0,0 +1,243 @@
+"""
+JobManager/JobStore: วงจรชีวิตของ batch job (ส่ง, รอคิว, รัน, รันต่อหลัง restart, ลบ, หมดอายุ)
+"""
+
+import io
+import threading
+import time
+
+import pytest
+
+from app.core import jobs
+from app.core.job_store import JobStore
+from app.core.jobs import InvalidJobInput, JobManager, JobQueueFull, JobRunning
+from app.core.score_memo import ScoreMemo
+
+ROWS = [
+    ("S0001", "วิศวกรรมศาสตร์", "ชาย", 2.35, 1, 2.5, 2.2, 2.1),
+    ("S0002", "บริหารธุรกิจ", "หญิง", 3.10, 0, 3.2, 3.0, ""),
+    ("S0003", "อื่นๆ", "ชาย", 1.80, 3, 1.5, "", ""),
+]
+HEADER = ("student_id,faculty,gender,gpax,count_f,year1_term1,year1_term2,year2_term1,"
+          "year2_term2,year3_term1,year3_term2,year4_term1,year4_term2")
+
+
+def upload_csv(rows=ROWS) -> bytes:
+    lines = [HEADER] + [",".join(str(v) for v in row) + ",,,,," for row in rows]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+@pytest.fixture(autouse=True)
+def memo(tmp_path, monkeypatch):
+    # ไม่ใช้ score memo ของ server (SCORE_MEMO_PATH)
+    memo = ScoreMemo(str(tmp_path / "memo.db"))
+    monkeypatch.setattr(jobs, "score_memo", memo)
+    yield memo
+    memo.close()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"), str(tmp_path / "jobs"))
+    store.open()
+    yield store
+    store.close()
+
+
+def make_manager(tmp_path, predictor, **kwargs) -> JobManager:
+    kwargs.setdefault("max_workers", 1)
+    kwargs.setdefault("max_pending", 10)
+    return JobManager(JobStore(str(tmp_path / "jobs.db"), str(tmp_path / "jobs")), predictor, **kwargs)
+
+
+def wait_finished(manager: JobManager, job_id: str, timeout: float = 30.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = manager.store.get(job_id)
+        if job["status"] in ("completed", "failed"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def queue_job(store: JobStore, job_id: str, content: bytes = None, filename: str = "roster.csv"):
+    """job ที่ค้างอยู่ในคิว (เหมือนถูก submit แล้วแต่ยังไม่มี worker รับไปรัน)"""
+    input_path = store.input_path(job_id, filename)
+    input_path.parent.mkdir(parents=True, exist_ok=True)
+    input_path.write_bytes(content if content is not None else upload_csv())
+    assert store.create(job_id, filename)
+
+
+def test_submit_runs_job_to_completion(models, tmp_path):
+    manager = make_manager(tmp_path, models)
+    try:
+        job = manager.submit("roster.csv", io.BytesIO(upload_csv()))
+        job = wait_finished(manager, job["id"])
+        assert job["status"] == "completed"
+        assert job["total_rows"] == job["rows_done"] == len(ROWS)
+        assert manager.store.result_path(job["id"]).read_bytes().count(b"\n") == len(ROWS)
+        # เก็บไว้แค่ผลลัพธ์
+        assert not manager.store.input_path(job["id"], "roster.csv").exists()
+    finally:
+        manager.shutdown()
+
+
+@pytest.mark.parametrize("filename,content", [
+    ("roster.csv", b"student_id,faculty,gender\nS0001,x,y\n"),
+    ("roster.csv", b""),
+    ("roster.xlsx", b"not an excel file"),
+])
+def test_submit_rejects_bad_input(models, tmp_path, filename, content):
+    manager = make_manager(tmp_path, models)
+    try:
+        with pytest.raises(InvalidJobInput):
+            manager.submit(filename, io.BytesIO(content))
+        # ไม่มี job และไม่เหลือไฟล์อินพุตค้าง
+        assert manager.store.count_unfinished() == 0
+        assert list(manager.store.jobs_dir.iterdir()) == []
+    finally:
+        manager.shutdown()
+
+
+def test_submit_rejects_when_queue_full(models, tmp_path):
+    manager = make_manager(tmp_path, models, max_pending=2)
+    manager.start()
+    try:
+        queue_job(manager.store, "a")
+        queue_job(manager.store, "b")
+        with pytest.raises(JobQueueFull):
+            manager.submit("roster.csv", io.BytesIO(upload_csv()))
+    finally:
+        manager.shutdown()
+
+
+def test_max_pending_is_atomic_across_stores(tmp_path):
+    # แต่ละ thread มี connection ของตัวเอง เหมือน worker process แยกกันที่ใช้ฐานข้อมูลเดียวกัน
+    n_writers, limit = 8, 3
+    stores = [JobStore(str(tmp_path / "jobs.db"), str(tmp_path / "jobs")) for _ in range(n_writers)]
+    for s in stores:
+        s.open()
+    barrier = threading.Barrier(n_writers)
+    results = [None] * n_writers
+
+    def create(i):
+        barrier.wait()
+        results[i] = stores[i].create(f"job{i}", "roster.csv", max_unfinished=limit)
+
+    threads = [threading.Thread(target=create, args=(i,)) for i in range(n_writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    try:
+        assert sum(results) == limit
+        assert stores[0].count_unfinished() == limit
+    finally:
+        for s in stores:
+            s.close()
+
+
+def test_resume_after_restart(models, tmp_path, store):
+    # job หนึ่งรอคิว อีก job รันค้างอยู่ตอน process เดิมหยุด
+    queue_job(store, "queued")
+    queue_job(store, "interrupted")
+    assert store.claim("interrupted") is not None
+    store.update("interrupted", rows_done=1)
+    store.result_path("interrupted").write_bytes(b'{"partial": true}\n')
+    store.close()
+
+    manager = make_manager(tmp_path, models)
+    manager.start(resume=True)
+    try:
+        for job_id in ("queued", "interrupted"):
+            job = wait_finished(manager, job_id)
+            assert job["status"] == "completed"
+            assert job["rows_done"] == len(ROWS)
+            # รันใหม่ตั้งแต่ต้น ไม่ต่อท้ายผลลัพธ์เดิม
+            assert manager.store.result_path(job_id).read_bytes().count(b"\n") == len(ROWS)
+    finally:
+        manager.shutdown()
+
+
+def test_start_without_resume_leaves_jobs_queued(models, tmp_path, store):
+    queue_job(store, "queued")
+    store.close()
+    manager = make_manager(tmp_path, models)
+    manager.start(resume=False)
+    try:
+        time.sleep(0.1)
+        assert manager.store.get("queued")["status"] == "queued"
+    finally:
+        manager.shutdown()
+
+
+def test_purge_expired(models, tmp_path, store):
+    for job_id in ("old", "recent", "pending"):
+        queue_job(store, job_id)
+    store.update("old", status="completed")
+    store.update("old", finished_at=time.time() - 3 * 3600)
+    store.update("recent", status="failed", error="boom")
+    store.close()
+
+    manager = make_manager(tmp_path, models, retention_hours=2)
+    manager.start(resume=False)
+    try:
+        assert manager.store.get("old") is None
+        assert not manager.store.job_dir("old").exists()
+        assert manager.store.get("recent")["status"] == "failed"
+        assert manager.store.get("pending")["status"] == "queued"
+        assert manager.purge_expired() == 0
+    finally:
+        manager.shutdown()
+
+
+def test_purge_disabled_keeps_finished_jobs(models, tmp_path, store):
+    queue_job(store, "old")
+    store.update("old", status="completed")
+    store.update("old", finished_at=0.0)
+    store.close()
+    manager = make_manager(tmp_path, models, retention_hours=0)
+    manager.start(resume=False)
+    try:
+        assert manager.store.get("old") is not None
+    finally:
+        manager.shutdown()
+
+
+def test_delete_queued_job_is_never_run(models, tmp_path, store):
+    queue_job(store, "queued")
+    manager = JobManager(store, models, max_workers=1, max_pending=10)
+
+    assert manager.delete("queued") is True
+    assert store.get("queued") is None
+    assert not store.job_dir("queued").exists()
+    # worker ที่หยิบ job นี้ขึ้นมาหลังถูกลบ ต้องไม่เริ่มรัน (ไม่เปิดไฟล์อินพุตที่ไม่มีแล้ว)
+    manager._run("queued")
+    assert store.get("queued") is None
+    assert not store.job_dir("queued").exists()
+    assert manager.delete("queued") is False
+
+
+def test_delete_running_job_is_refused(models, tmp_path, store):
+    queue_job(store, "running")
+    manager = JobManager(store, models, max_workers=1, max_pending=10)
+    # worker claim ไปก่อน: ลบไม่ได้และไฟล์ยังอยู่ครบ
+    assert store.claim("running") is not None
+    with pytest.raises(JobRunning):
+        manager.delete("running")
+    assert store.get("running")["status"] == "running"
+    assert store.input_path("running", "roster.csv").exists()
+    # claim ซ้ำไม่ได้ (ไม่มี worker สองตัวรัน job เดียวกัน)
+    assert store.claim("running") is None
+
+
+def test_delete_finished_job(models, tmp_path):
+    manager = make_manager(tmp_path, models)
+    try:
+        job = manager.submit("roster.csv", io.BytesIO(upload_csv()))
+        wait_finished(manager, job["id"])
+        assert manager.delete(job["id"]) is True
+        assert not manager.store.job_dir(job["id"]).exists()
+        assert manager.delete("missing") is False
+    finally:
+        manager.shutdown()
@@ -0,0 +1,148 @@
+"""
+Logistic fallback: term ที่ไม่มี tree model ทำนายด้วย logistic model (model_backend = logistic)
+และ LogisticModel (NumPy ล้วน) ให้ผลเท่ากับ sklearn Pipeline ต้นฉบับใน Logis/
+"""
+
+import asyncio
+from pathlib import Path
+
+import httpx
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.batch_scoring import score_dataframe_columns
+from app.core.executors import shutdown_executors, start_executors
+from app.main import app
+from app.models.logistic_model import LogisticModel, export_pipeline
+from app.models.ml_model import ModelSet
+from app.utils.feature_engineering import MAX_TERMS, FeatureEngineer
+
+# ไฟล์ pickle ต้นฉบับที่ root ของ repo
+PIPELINE_DIR = Path(__file__).resolve().parents[3] / "Logis"
+# pickle บันทึกด้วย scikit-learn เวอร์ชันใหม่กว่า: predict_proba ของบางเวอร์ชันอ่าน multi_class ผิด
+# (softmax ของ [-z, z]) จึงเทียบกับ decision_function (scaler + linear ไม่ขึ้นกับเวอร์ชัน) ผ่าน sigmoid
+sklearn_pickle = pytest.mark.filterwarnings("ignore::UserWarning")
+
+STUDENT = {
+    "faculty": "วิศวกรรมศาสตร์",
+    "gender": "ชาย",
+    "gpax": 2.35,
+    "count_f": 1,
+    "year1_term1": 2.5,
+    "year1_term2": 2.2,
+}
+
+
+@pytest.fixture
+def without_term2(models):
+    """ชุด model ที่ไม่มี tree model ของ term2 (เช่น ไฟล์หายหรือโหลดไม่ได้)"""
+    if "term2" not in models.logistic:
+        pytest.skip("Logistic fallback models not available")
+    original = models.active_set
+    models.activate(ModelSet({**original.models, "term2": None},
+                             {k: h for k, h in original.file_hashes.items() if k != "term2"}, original.backend))
+    start_executors()
+    yield models
+    shutdown_executors()
+    models.activate(original)
+
+
+def sample_columns(n_rows: int = 200, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    num_terms = rng.integers(1, MAX_TERMS + 1, n_rows)
+    gpas = np.clip(rng.normal(rng.uniform(1.0, 3.8, n_rows)[:, None], 0.5, (n_rows, MAX_TERMS)), 0.0, 4.0).round(2)
+    gpas[np.arange(MAX_TERMS)[None, :] >= num_terms[:, None]] = np.nan
+    fe = FeatureEngineer()
+    return fe.create_model_features_batch(
+        faculty=rng.choice(list(fe.faculty_mapping), n_rows).tolist(),
+        gender=rng.choice(list(fe.gender_mapping), n_rows).tolist(),
+        gpax=np.nanmean(gpas, axis=1).round(2),
+        count_f=rng.poisson(0.8, n_rows),
+        term_gpas=gpas,
+    )
+
+
+async def post(path: str, payload):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post(path, json=payload)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_missing_tree_model_serves_logistic(without_term2):
+    predictor = without_term2
+    result = asyncio.run(post("/api/v1/predict-from-basic", STUDENT))
+    assert result["model_backend"] == "logistic"
+
+    features = FeatureEngineer().create_model_vector(
+        faculty=STUDENT["faculty"], gender=STUDENT["gender"], gpax=STUDENT["gpax"],
+        count_f=STUDENT["count_f"], term_gpas=[STUDENT["year1_term1"], STUDENT["year1_term2"]],
+    )
+    expected = predictor.logistic["term2"].predict_proba_one(features)
+    assert result["dropout_probability"] == pytest.approx(expected, abs=1e-12)
+
+    # term ที่ยังมี tree model ไม่เปลี่ยน
+    one_term = {k: v for k, v in STUDENT.items() if k != "year1_term2"}
+    assert asyncio.run(post("/api/v1/predict-from-basic", one_term))["model_backend"] != "logistic"
+
+
+def test_missing_tree_model_serves_logistic_in_batch(without_term2):
+    predictor = without_term2
+    df = pd.DataFrame([
+        {**STUDENT, "student_id": "S1"},
+        {**STUDENT, "student_id": "S2", "year1_term2": None},
+    ])
+    for col in ("year2_term1", "year2_term2", "year3_term1", "year3_term2", "year4_term1", "year4_term2"):
+        df[col] = np.nan
+    columns, _ = score_dataframe_columns(df, predictor, FeatureEngineer())
+    assert columns["model_backend"][0] == "logistic"
+    assert columns["model_backend"][1] != "logistic"
+
+
+def pipeline_proba(pipeline, X: np.ndarray, feature_names) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-pipeline.decision_function(pd.DataFrame(X, columns=feature_names))))
+
+
+@sklearn_pickle
+@pytest.mark.parametrize("term", [1, 2, 3])
+def test_from_json_matches_sklearn_pipeline(tmp_path, term):
+    pytest.importorskip("sklearn")
+    joblib = pytest.importorskip("joblib")
+    pickle_path = PIPELINE_DIR / f"logistic_model_term{term}.pkl"
+    if not pickle_path.exists():
+        pytest.skip("Original logistic pipelines not available")
+
+    export_pipeline(pickle_path, tmp_path / "logistic.json")
+    model = LogisticModel.from_json(tmp_path / "logistic.json")
+    pipeline = joblib.load(pickle_path)
+
+    columns = sample_columns(seed=term)
+    X = model.feature_matrix(columns)
+    expected = pipeline_proba(pipeline, X, model.feature_names)
+    np.testing.assert_allclose(model.predict_proba_columns(columns), expected, rtol=0, atol=1e-9)
+
+    row = {name: float(values[0]) for name, values in columns.items()}
+    assert model.predict_proba_one(row) == pytest.approx(expected[0], abs=1e-9)
+
+
+@sklearn_pickle
+def test_shipped_json_matches_sklearn_pipeline(models, tmp_path):
+    pytest.importorskip("sklearn")
+    joblib = pytest.importorskip("joblib")
+    if not PIPELINE_DIR.exists() or not models.logistic:
+        pytest.skip("Original logistic pipelines not available")
+    columns = sample_columns()
+    for key, model in models.logistic.items():
+        pickle_path = PIPELINE_DIR / f"logistic_model_{key}.pkl"
+        # export ใหม่ให้ผลเท่ากับไฟล์ใน FALLBACK_MODEL_DIR (ไฟล์ที่ใช้จริงไม่เก่ากว่า pickle)
+        export_pipeline(pickle_path, tmp_path / f"{key}.json")
+        exported = LogisticModel.from_json(tmp_path / f"{key}.json")
+        assert exported.feature_names == model.feature_names
+        np.testing.assert_allclose(exported.weights, model.weights, rtol=1e-12)
+
+        pipeline = joblib.load(pickle_path)
+        X = model.feature_matrix(columns)
+        expected = pipeline_proba(pipeline, X, model.feature_names)
+        np.testing.assert_allclose(model.predict_proba_columns(columns), expected, rtol=0, atol=1e-9)
@@ -0,0 +1,211 @@
+"""
+ModelRegistry: reload ที่ตรวจกับ holdout ก่อนสลับ, rollback และการทำตาม MODEL_STATE_PATH ของ worker อื่น
+"""
+
+import asyncio
+import json
+import shutil
+import time
+
+import httpx
+import pytest
+
+from app.core import prefork
+from app.core.model_registry import ModelRegistry, ModelValidationError, model_registry
+from app.main import app
+from app.models.ml_model import MODEL_KEYS, DropoutPredictor
+
+HOLDOUT = (
+    "faculty,gender,gpax,count_f,year1_term1,year1_term2,year2_term1,year2_term2,"
+    "year3_term1,year3_term2,year4_term1,year4_term2,dropout\n"
+    "วิศวกรรมศาสตร์,ชาย,1.20,4,1.1,0.9,0.8,,,,,,1\n"
+    "บริหารธุรกิจ,หญิง,3.60,0,3.7,3.8,3.6,3.9,,,,,0\n"
+    "อื่นๆ,ชาย,2.80,0,2.9,3.0,,,,,,,0\n"
+    "วิศวกรรมศาสตร์,หญิง,1.50,3,1.4,,,,,,,,1\n"
+)
+
+
+@pytest.fixture
+def model_dir(models, tmp_path):
+    model_dir = tmp_path / "models"
+    model_dir.mkdir()
+    for key in MODEL_KEYS:
+        shutil.copy(models.model_path(key), model_dir / f"model_{key}.json")
+    return model_dir
+
+
+def make_registry(model_dir, state_path="", **kwargs) -> ModelRegistry:
+    predictor = DropoutPredictor()
+    predictor.model_paths = {key: str(model_dir / f"model_{key}.json") for key in MODEL_KEYS}
+    kwargs.setdefault("watch_interval", 0)
+    registry = ModelRegistry(predictor, state_path=str(state_path), **kwargs)
+    registry.preload()
+    return registry
+
+
+def rewrite(path):
+    """model เดิมแต่ไฟล์ต่างจากเดิม (เวอร์ชันใหม่)"""
+    path.write_text(json.dumps(json.loads(path.read_text(encoding="utf-8")), indent=1), encoding="utf-8")
+
+
+def wait_for(condition, timeout: float = 20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return
+        time.sleep(0.02)
+    raise AssertionError("condition not met in time")
+
+
+def test_reload_unchanged_files(model_dir):
+    registry = make_registry(model_dir)
+    version = registry.predictor.model_version
+    assert registry.reload()["status"] == "unchanged"
+    assert registry.predictor.model_version == version
+
+
+def test_reload_then_rollback_restores_previous_set(model_dir):
+    registry = make_registry(model_dir)
+    original = registry.predictor.active_set
+
+    rewrite(model_dir / "model_term1.json")
+    result = registry.reload()
+    assert result["status"] == "activated"
+    reloaded = registry.predictor.active_set
+    assert reloaded.version != original.version
+    assert reloaded.validation["passed"]
+
+    result = registry.rollback()
+    assert result["active"]["version"] == original.version
+    # ชุดเดิมทั้งชุด (ไม่ได้โหลดจากไฟล์ใหม่)
+    assert registry.predictor.active_set is original
+    with pytest.raises(ValueError):
+        registry.rollback()
+    # กลับไปชุดใหม่ตามเวอร์ชันได้
+    registry.rollback(reloaded.version)
+    assert registry.predictor.active_set is reloaded
+    with pytest.raises(LookupError):
+        registry.rollback("unknown")
+
+
+def test_candidate_failing_holdout_is_rejected(model_dir, tmp_path):
+    holdout = tmp_path / "holdout.csv"
+    holdout.write_text(HOLDOUT, encoding="utf-8")
+    registry = make_registry(model_dir, holdout_path=str(holdout))
+    original = registry.predictor.active_set
+    assert original.validation["rows"] == 4
+    # ไม่มี model ไหนผ่านเกณฑ์นี้ได้
+    registry.min_accuracy = 1.01
+
+    rewrite(model_dir / "model_term2.json")
+    with pytest.raises(ModelValidationError) as excinfo:
+        registry.reload()
+    assert not excinfo.value.report["validation"]["passed"]
+    assert "accuracy" in excinfo.value.report["validation"]["errors"][0]
+    assert registry.predictor.active_set is original
+    assert registry.status()["events"][0]["status"] == "rejected"
+    assert [s["version"] for s in registry.status()["history"]] == [original.version]
+
+
+def test_incomplete_candidate_is_rejected(model_dir):
+    registry = make_registry(model_dir)
+    original = registry.predictor.active_set
+    (model_dir / "model_term3.json").unlink()
+    with pytest.raises(ModelValidationError, match="Missing models: term3"):
+        registry.reload()
+    assert registry.predictor.active_set is original
+    assert registry.predictor.models["term3"] is not None
+
+
+def test_second_registry_follows_state_file(model_dir, tmp_path):
+    state_path = tmp_path / "model_state.json"
+    first = make_registry(model_dir, state_path)
+    second = make_registry(model_dir, state_path, watch_interval=0.05)
+    original = first.predictor.active_set.version
+    second.start()
+    try:
+        rewrite(model_dir / "model_term1.json")
+        reloaded = first.reload(reason="api")["active"]["version"]
+        assert reloaded != original
+        wait_for(lambda: second.predictor.model_version == reloaded)
+        assert second.status()["events"][0]["action"] == "follow"
+
+        # rollback ของ worker หนึ่งมีผลกับอีก worker แม้ไฟล์ model ยังเป็นชุดใหม่
+        first.rollback()
+        wait_for(lambda: second.predictor.model_version == original)
+        time.sleep(0.3)
+        assert second.predictor.model_version == original
+    finally:
+        second.shutdown()
+
+
+def test_respawned_worker_follows_current_state(model_dir, tmp_path):
+    state_path = tmp_path / "model_state.json"
+    # parent ของ app.serve: preload ก่อน fork (worker ที่ fork ใหม่มีสำเนาของ registry นี้ตามที่เป็นตอนนั้น)
+    parent = make_registry(model_dir, state_path, watch_interval=60)
+    original = parent.predictor.model_version
+    worker = make_registry(model_dir, state_path)
+    rewrite(model_dir / "model_term1.json")
+    reloaded = worker.reload(reason="api")["active"]["version"]
+    assert parent.predictor.model_version == original
+
+    # worker ที่ถูก fork ใหม่สลับตาม state ตั้งแต่ start() ไม่ต้องรอ watcher รอบแรก (60 วินาที)
+    parent.start()
+    try:
+        assert parent.predictor.model_version == reloaded
+        assert parent.status()["events"][0]["action"] == "follow"
+    finally:
+        parent.shutdown()
+
+
+def test_respawned_worker_keeps_rolled_back_set(model_dir, tmp_path):
+    state_path = tmp_path / "model_state.json"
+    parent = make_registry(model_dir, state_path, watch_interval=0.05)
+    original = parent.predictor.model_version
+    worker = make_registry(model_dir, state_path)
+    rewrite(model_dir / "model_term1.json")
+    worker.reload(reason="api")
+    worker.rollback()
+
+    # ไฟล์ยังเป็นชุดใหม่ แต่ state คือชุดเดิม: worker ใหม่ต้องไม่ reload ตามไฟล์
+    parent.start()
+    try:
+        time.sleep(0.3)
+        assert parent.predictor.model_version == original
+        assert [e["action"] for e in parent.status()["events"]] == ["load"]
+    finally:
+        parent.shutdown()
+
+
+def post(path: str):
+    async def request():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+            return await client.post(path)
+
+    return asyncio.run(request())
+
+
+@pytest.mark.parametrize("path", ["/api/v1/models/reload", "/api/v1/models/rollback"])
+def test_reload_without_shared_state_is_refused_with_workers(models, monkeypatch, tmp_path, path):
+    monkeypatch.setattr(prefork, "worker_count", 2)
+    monkeypatch.setattr(model_registry, "state_path", None)
+    response = post(path)
+    assert response.status_code == 409
+    assert "MODEL_STATE_PATH" in response.json()["detail"]
+
+    monkeypatch.setattr(model_registry, "state_path", tmp_path / "model_state.json")
+    monkeypatch.setattr(model_registry, "watch_interval", 0)
+    assert post(path).status_code == 409
+
+
+def test_reload_with_shared_state_or_one_worker(models, monkeypatch, tmp_path):
+    version = models.model_version
+    monkeypatch.setattr(model_registry, "state_path", None)
+    assert post("/api/v1/models/reload").json()["status"] == "unchanged"
+
+    monkeypatch.setattr(prefork, "worker_count", 2)
+    monkeypatch.setattr(model_registry, "state_path", tmp_path / "model_state.json")
+    monkeypatch.setattr(model_registry, "watch_interval", 5.0)
+    assert post("/api/v1/models/reload").json()["status"] == "unchanged"
+    assert models.model_version == version
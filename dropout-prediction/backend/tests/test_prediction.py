@@ -0,0 +1,88 @@
+"""
+/predict และ /predict-from-basic: top_features คำนวณเฉพาะเมื่อขอ (explain=true) และอยู่ใน inference job เดียวกับการทำนาย
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.core import batching
+from app.core.executors import shutdown_executors, start_executors
+from app.main import app
+from app.models.schemas import StudentInput
+from app.utils.feature_engineering import FeatureEngineer
+
+STUDENT = {
+    "faculty": "วิศวกรรมศาสตร์",
+    "gender": "ชาย",
+    "gpax": 2.35,
+    "count_f": 1,
+    "year1_term1": 2.5,
+    "year1_term2": 2.2,
+    "year2_term1": 2.1,
+}
+
+
+@pytest.fixture(scope="module", autouse=True)
+def executors(models):
+    start_executors()
+    yield
+    shutdown_executors()
+
+
+@pytest.fixture
+def inference_calls(monkeypatch):
+    """ชื่อของงานที่ถูกส่งเข้า inference pool"""
+    calls = []
+    run_inference = batching.run_inference
+
+    async def counting(fn, *args, **kwargs):
+        calls.append(getattr(fn, "__name__", repr(fn)))
+        return await run_inference(fn, *args, **kwargs)
+
+    monkeypatch.setattr(batching, "run_inference", counting)
+    return calls
+
+
+async def post_many(path: str, payloads, params=None):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        responses = await asyncio.gather(*[client.post(path, json=p, params=params) for p in payloads])
+    assert all(r.status_code == 200 for r in responses)
+    return [r.json() for r in responses]
+
+
+def test_explain_is_off_by_default(inference_calls):
+    (result,) = asyncio.run(post_many("/api/v1/predict-from-basic", [STUDENT]))
+    assert result["top_features"] is None
+    assert all(name != "explain" for name in inference_calls)
+
+
+def test_explain_computed_in_the_same_batch(models, inference_calls):
+    students = [{**STUDENT, "gpax": round(2.0 + i / 50, 2)} for i in range(8)]
+    explained = asyncio.run(post_many("/api/v1/predict-from-basic", students, {"explain": "true"}))
+    plain = asyncio.run(post_many("/api/v1/predict-from-basic", students))
+
+    fe = FeatureEngineer()
+    for student, with_top, without in zip(students, explained, plain):
+        vector = fe.create_model_vector(
+            faculty=student["faculty"], gender=student["gender"], gpax=student["gpax"],
+            count_f=student["count_f"], term_gpas=[student["year1_term1"], student["year1_term2"], student["year2_term1"]],
+        )
+        assert with_top["top_features"] == models.explain(vector, 3, with_top["model_backend"])
+        assert with_top["dropout_probability"] == without["dropout_probability"]
+    # คำขอพร้อมกันรวมเป็น micro-batch เดียว: ทำนายและ explain ใน pool ครั้งเดียว ไม่มีรอบ explain แยก
+    assert inference_calls.count("_score_batch") < len(students)
+    assert "explain" not in inference_calls
+
+
+def test_predict_explain_matches_predictor(models):
+    student = {
+        "TERM1": 1.8, "TERM2": 1.5, "COUNT_F": 3, "COUNT_WIU": 0, "OLD_GPA_M6": 2.4, "GPA": 1.65,
+        "num_terms_completed": 2, "last_gpa": 1.5, "gpa_trend": -0.3, "GENDER_ENCODED": 1, "FAC_ENCODED": 2,
+    }
+    (result,) = asyncio.run(post_many("/api/v1/predict", [student], {"explain": "true"}))
+    data = StudentInput(**student).model_dump()
+    assert result["top_features"]
+    assert result["top_features"] == models.explain(data, models.count_terms(data), result["model_backend"])
@@ -0,0 +1,74 @@
+"""
+LRU cache ของผลทำนาย: ผลของชุด model เดิมต้องไม่ถูกใช้อีกหลังสลับชุด (DropoutPredictor.activate)
+"""
+
+import numpy as np
+import pytest
+
+from app.models.ml_model import DropoutPredictor, ModelSet
+from app.models.prediction_cache import PredictionCache
+
+
+class ConstantModel:
+    """model ที่ให้ความน่าจะเป็นเท่ากันทุกแถว (แยกผลของชุดใหม่ออกจากผลที่ cache ไว้ได้ชัด)"""
+
+    def __init__(self, prob: float):
+        self.prob = prob
+
+    def predict_proba(self, X):
+        return np.column_stack([np.full(len(X), 1 - self.prob), np.full(len(X), self.prob)])
+
+
+@pytest.fixture
+def predictor(models):
+    predictor = DropoutPredictor()
+    predictor.cache = PredictionCache(100)
+    predictor.activate(models.active_set)
+    return predictor
+
+
+def vectors(predictor, n=5):
+    rng = np.random.default_rng(0)
+    return rng.uniform(0, 4, (n, len(predictor.features["term1"]))).round(2).tolist()
+
+
+def test_cache_hits_within_one_version(predictor):
+    rows = vectors(predictor)
+    first = predictor.predict_vectors("term1", rows)
+    second = predictor.predict_vectors("term1", rows)
+    stats = predictor.cache.stats()
+    assert stats["misses"] == len(rows) and stats["hits"] == len(rows)
+    np.testing.assert_array_equal(first[1], second[1])
+
+
+def test_cache_hits_stop_after_swap(predictor):
+    rows = vectors(predictor)
+    old_set = predictor.active_set
+    _, old_probs = predictor.predict_vectors("term1", rows)
+    new_set = ModelSet({**old_set.models, "term1": ConstantModel(0.9)},
+                       {**old_set.file_hashes, "term1": "changed"}, old_set.backend)
+    assert new_set.version != old_set.version
+
+    predictor.activate(new_set)
+    hits = predictor.cache.stats()["hits"]
+    _, probs = predictor.predict_vectors("term1", rows)
+    assert predictor.cache.stats()["hits"] == hits
+    np.testing.assert_allclose(probs, 0.9)
+    assert not np.allclose(old_probs, 0.9)
+    assert predictor.cache.stats()["invalidations"] >= 1
+
+
+def test_in_flight_request_on_old_set_does_not_leak(predictor):
+    # request ที่เริ่มก่อนสลับชุดยังทำนายด้วยชุดเดิมและเก็บผลลง cache หลังสลับแล้ว
+    rows = vectors(predictor)
+    old_set = predictor.active_set
+    new_set = ModelSet({**old_set.models, "term1": ConstantModel(0.9)},
+                       {**old_set.file_hashes, "term1": "changed"}, old_set.backend)
+    predictor.activate(new_set)
+    _, old_probs = predictor.predict_vectors("term1", rows, model_set=old_set)
+
+    _, probs = predictor.predict_vectors("term1", rows)
+    np.testing.assert_allclose(probs, 0.9)
+    # ผลของชุดเดิมยังได้จาก cache เฉพาะ request ที่ระบุชุดเดิม
+    _, again = predictor.predict_vectors("term1", rows, model_set=old_set)
+    np.testing.assert_array_equal(again, old_probs)
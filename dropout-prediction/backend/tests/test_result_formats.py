@@ -0,0 +1,164 @@
+"""
+/batch-predict: เลือกรูปแบบผลลัพธ์ (?format= / Accept) และทุก encoder ให้ข้อมูลเดียวกับ JSON
+"""
+
+import asyncio
+import io
+import json
+
+import httpx
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core import result_formats
+from app.core.executors import shutdown_executors, start_executors
+from app.core.ingestion import REQUIRED_COLUMNS
+from app.core.result_formats import RESULT_FORMATS, negotiate_format
+from app.main import app
+
+N_ROWS = 30
+
+
+@pytest.fixture(scope="module", autouse=True)
+def executors(models):
+    start_executors()
+    yield
+    shutdown_executors()
+
+
+@pytest.fixture(scope="module")
+def roster() -> bytes:
+    rng = np.random.default_rng(3)
+    term_columns = REQUIRED_COLUMNS[4:]
+    gpas = np.clip(rng.normal(2.4, 0.8, (N_ROWS, len(term_columns))), 0.0, 4.0).round(2)
+    gpas[np.arange(len(term_columns))[None, :] >= rng.integers(1, len(term_columns) + 1, N_ROWS)[:, None]] = np.nan
+    df = pd.DataFrame(gpas, columns=term_columns)
+    df.insert(0, "student_id", [f"S{i:04d}" for i in range(N_ROWS)])
+    df.insert(1, "faculty", rng.choice(["วิศวกรรมศาสตร์", "บริหารธุรกิจ", "อื่นๆ"], N_ROWS))
+    df.insert(2, "gender", rng.choice(["ชาย", "หญิง"], N_ROWS))
+    df.insert(3, "gpax", np.nanmean(gpas, axis=1).round(2))
+    df.insert(4, "count_f", rng.poisson(0.7, N_ROWS))
+    return df.to_csv(index=False).encode("utf-8")
+
+
+def upload(content: bytes, headers=None, **params):
+    async def post():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+            return await client.post(
+                "/api/v1/batch-predict", params={"explain": "all", "incremental": "false", **params},
+                headers=headers, files={"file": ("roster.csv", content, "text/csv")},
+            )
+
+    response = asyncio.run(post())
+    assert response.status_code == 200
+    return response
+
+
+@pytest.mark.parametrize("requested,accept,expected", [
+    # ?format= มาก่อน Accept เสมอ
+    ("json", "text/csv", "json"),
+    ("csv", "application/vnd.apache.arrow.stream", "csv"),
+    # q สูงสุดชนะ ไม่ขึ้นกับลำดับ
+    (None, "text/csv;q=0.5, application/vnd.apache.parquet;q=0.9", "parquet"),
+    (None, "application/vnd.apache.arrow.stream; q=0.2, text/csv", "csv"),
+    # q เท่ากัน: ตัวที่มาก่อนชนะ
+    (None, "application/x-parquet, text/csv", "parquet"),
+    # q=0 = ไม่รับ
+    (None, "text/csv;q=0, application/vnd.dropout.columnar+json;q=0.1", "columnar"),
+    (None, "text/csv;q=0", "json"),
+    # */*, ไม่มี Accept และ type ที่ไม่รู้จักได้ json
+    (None, "*/*", "json"),
+    (None, "text/html,application/xhtml+xml,*/*;q=0.8", "json"),
+    (None, "image/webp, */*;q=0.1, text/csv;q=0.05", "csv"),
+    (None, None, "json"),
+    (None, "text/csv;q=abc", "json"),
+])
+def test_negotiate_format(requested, accept, expected):
+    assert negotiate_format(requested, accept) == expected
+
+
+def test_accept_header_selects_format(roster):
+    response = upload(roster, headers={"Accept": "text/csv;q=0.4, application/vnd.apache.parquet;q=0.8"})
+    assert response.headers["content-type"] == RESULT_FORMATS["parquet"]
+    response = upload(roster, headers={"Accept": "*/*"})
+    assert response.headers["content-type"] == RESULT_FORMATS["json"]
+    response = upload(roster, headers={"Accept": "text/csv"}, format="columnar")
+    assert response.headers["content-type"] == RESULT_FORMATS["columnar"]
+
+
+def expected_columns(results):
+    """ค่าหลักของแต่ละแถวจากผล JSON (รูปแบบอ้างอิง)"""
+    return {
+        "student_id": [r["student_id"] for r in results],
+        "prediction": [r["prediction"] for r in results],
+        "dropout_probability": [r["dropout_probability"] for r in results],
+        "risk_level": [r["risk_level"] for r in results],
+        "model_backend": [r["model_backend"] for r in results],
+        "top_features": [[d["feature"] for d in r["top_features"]] for r in results],
+    }
+
+
+def decode_arrow_table(table):
+    labels = json.loads(table.schema.metadata[b"dropout.labels"])
+    summary = json.loads(table.schema.metadata[b"dropout.summary"])
+    data = table.to_pydict()
+    assert labels["prediction"] == ["Graduate", "Dropout"]
+    assert summary == {"reused": 0, "recomputed": N_ROWS}
+    return {
+        "student_id": data["student_id"],
+        "prediction": data["prediction"],
+        "dropout_probability": data["dropout_probability"],
+        "risk_level": data["risk_level"],
+        "model_backend": data["model_backend"],
+        "top_features": [[d["feature"] for d in row] for row in data["top_features"]],
+    }
+
+
+def test_every_format_carries_the_same_results(roster):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    body = upload(roster, format="json").json()
+    assert body["count"] == N_ROWS
+    expected = expected_columns(body["results"])
+
+    columnar = upload(roster, format="columnar").json()
+    assert columnar["format"] == "columnar" and columnar["count"] == N_ROWS
+    assert columnar["recomputed"] == N_ROWS
+    decoded = {key: columnar["columns"][key] for key in expected if key != "top_features"}
+    decoded["top_features"] = [[f for f, _, _ in row] for row in columnar["columns"]["top_features"]]
+    assert decoded == expected
+    # ข้อความของรหัสคำอธิบายตรงกับที่ JSON แสดง
+    templates = columnar["labels"]["explanations"]
+    assert {code for row in columnar["columns"]["explanations"] for code, _ in row} <= set(templates)
+
+    csv = pd.read_csv(io.BytesIO(upload(roster, format="csv").content), dtype={"student_id": str})
+    assert csv["student_id"].tolist() == expected["student_id"]
+    assert csv["prediction"].tolist() == expected["prediction"]
+    np.testing.assert_allclose(csv["dropout_probability"], expected["dropout_probability"], rtol=1e-12)
+    assert [json.loads(r) for r in csv["feature_explanations"]] == \
+        [r["feature_explanations"] for r in body["results"]]
+
+    arrow = pa.ipc.open_stream(upload(roster, format="arrow").content).read_all()
+    assert decode_arrow_table(arrow) == expected
+    parquet = pq.read_table(io.BytesIO(upload(roster, format="parquet").content))
+    assert decode_arrow_table(parquet) == expected
+
+
+@pytest.mark.parametrize("result_format", ["json", "columnar"])
+def test_json_fallback_without_orjson(roster, monkeypatch, result_format):
+    if result_formats.orjson is None:
+        pytest.skip("orjson not installed")
+    with_orjson = upload(roster, format=result_format).content
+    monkeypatch.setattr(result_formats, "orjson", None)
+    assert upload(roster, format=result_format).content == with_orjson
+
+
+def test_dumps_fallback_handles_numpy(monkeypatch):
+    obj = {"ชื่อ": "ทดสอบ", "values": np.array([0.25, 1.5]), "count": np.int64(3), "prob": np.float64(0.1)}
+    expected = result_formats.dumps(obj)
+    monkeypatch.setattr(result_formats, "orjson", None)
+    assert result_formats.dumps(obj) == expected
+    assert result_formats.loads(expected) == {"ชื่อ": "ทดสอบ", "values": [0.25, 1.5], "count": 3, "prob": 0.1}
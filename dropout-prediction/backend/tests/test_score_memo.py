@@ -0,0 +1,135 @@
+"""
+/batch-predict แบบ incremental: แถวที่ข้อมูลและ signature (ชุด model, explain) ไม่เปลี่ยนใช้ผลเดิมจาก ScoreMemo
+ผลลัพธ์ต้องเหมือนการคำนวณใหม่ทั้งไฟล์ทุกประการ
+"""
+
+import asyncio
+
+import httpx
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.api.v1.endpoints import batch
+from app.core.executors import shutdown_executors, start_executors
+from app.core.ingestion import REQUIRED_COLUMNS
+from app.core.score_memo import ScoreMemo
+from app.main import app
+from app.models.ml_model import ModelSet
+
+N_ROWS = 40
+
+
+@pytest.fixture(scope="module", autouse=True)
+def executors(models):
+    start_executors()
+    yield
+    shutdown_executors()
+
+
+@pytest.fixture(autouse=True)
+def memo(tmp_path, monkeypatch):
+    memo = ScoreMemo(str(tmp_path / "memo.db"))
+    monkeypatch.setattr(batch, "score_memo", memo)
+    yield memo
+    memo.close()
+
+
+def roster(n_rows: int = N_ROWS) -> pd.DataFrame:
+    rng = np.random.default_rng(1)
+    term_columns = REQUIRED_COLUMNS[4:]
+    gpas = np.clip(rng.normal(2.5, 0.7, (n_rows, len(term_columns))), 0.0, 4.0).round(2)
+    gpas[np.arange(len(term_columns))[None, :] >= rng.integers(1, len(term_columns) + 1, n_rows)[:, None]] = np.nan
+    df = pd.DataFrame(gpas, columns=term_columns)
+    df.insert(0, "student_id", [f"S{i:04d}" for i in range(n_rows)])
+    df.insert(1, "faculty", rng.choice(["วิศวกรรมศาสตร์", "บริหารธุรกิจ", "อื่นๆ"], n_rows))
+    df.insert(2, "gender", rng.choice(["ชาย", "หญิง"], n_rows))
+    df.insert(3, "gpax", np.nanmean(gpas, axis=1).round(2))
+    df.insert(4, "count_f", rng.poisson(0.7, n_rows))
+    return df
+
+
+def upload(df: pd.DataFrame, **params):
+    async def post():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+            return await client.post(
+                "/api/v1/batch-predict", params=params,
+                files={"file": ("roster.csv", df.to_csv(index=False).encode("utf-8"), "text/csv")},
+            )
+
+    response = asyncio.run(post())
+    assert response.status_code == 200
+    return response
+
+
+def rows_reused(response):
+    return int(response.headers["X-Rows-Reused"]), int(response.headers["X-Rows-Recomputed"])
+
+
+def test_same_upload_reuses_every_row():
+    df = roster()
+    first = upload(df, explain="all")
+    assert rows_reused(first) == (0, N_ROWS)
+    second = upload(df, explain="all")
+    assert rows_reused(second) == (N_ROWS, 0)
+    assert second.json()["results"] == first.json()["results"]
+
+
+def test_changed_row_is_recomputed():
+    df = roster()
+    upload(df, explain="all")
+    changed = df.copy()
+    changed.loc[7, "gpax"] = 1.05
+    changed.loc[7, "count_f"] = 4
+
+    incremental = upload(changed, explain="all")
+    assert rows_reused(incremental) == (N_ROWS - 1, 1)
+    fresh = upload(changed, explain="all", incremental="false")
+    assert rows_reused(fresh) == (0, N_ROWS)
+    assert incremental.json()["results"] == fresh.json()["results"]
+    assert incremental.json()["results"][7] != upload(df, explain="all").json()["results"][7]
+
+
+def test_rows_without_student_id_are_always_recomputed():
+    df = roster()
+    df.loc[[3, 4], "student_id"] = None
+    upload(df)
+    assert rows_reused(upload(df)) == (N_ROWS - 2, 2)
+
+
+def test_explain_mode_change_invalidates():
+    df = roster()
+    upload(df, explain="none")
+    with_explain = upload(df, explain="all")
+    assert rows_reused(with_explain) == (0, N_ROWS)
+    assert any(r["top_features"] for r in with_explain.json()["results"])
+    assert rows_reused(upload(df, explain="all")) == (N_ROWS, 0)
+
+
+def test_model_version_change_invalidates(models):
+    df = roster()
+    first = upload(df, explain="all")
+    original = models.active_set
+    # model เดิม (ผลเหมือนเดิม) แต่เวอร์ชันต่างกัน: ผลใน memo ของเวอร์ชันเก่าต้องไม่ถูกใช้
+    models.activate(ModelSet(dict(original.models),
+                             {k: f"{h}-swapped" for k, h in original.file_hashes.items()}, original.backend))
+    try:
+        swapped = upload(df, explain="all")
+        assert rows_reused(swapped) == (0, N_ROWS)
+        assert swapped.json()["results"] == first.json()["results"]
+        assert rows_reused(upload(df, explain="all")) == (N_ROWS, 0)
+    finally:
+        models.activate(original)
+    # กลับมาชุดเดิม: ผลใน memo ถูกแทนด้วยของเวอร์ชันที่สลับไปแล้ว จึงคำนวณใหม่
+    assert rows_reused(upload(df, explain="all")) == (0, N_ROWS)
+
+
+def test_stream_uses_the_same_memo():
+    df = roster()
+    upload(df, explain="all")
+    streamed = upload(df, explain="all", stream="ndjson")
+    lines = streamed.content.splitlines()
+    assert len(lines) == N_ROWS
+    fresh = upload(df, explain="all", stream="ndjson", incremental="false")
+    assert streamed.content == fresh.content
@@ -0,0 +1,70 @@
+"""
+/simulate-trajectory: จำนวนเส้นทางต้องไม่เกิน SIMULATION_MAX_ROWS และไม่ถูกลดลงเงียบๆ
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.config import settings
+from app.core.executors import shutdown_executors, start_executors
+from app.core.simulation import DEFAULT_PATHS, SimulationTooLarge, simulate_trajectories
+from app.main import app
+from app.utils.feature_engineering import FeatureEngineer
+
+STUDENT = {
+    "faculty": "วิศวกรรมศาสตร์",
+    "gender": "ชาย",
+    "gpax": 2.35,
+    "count_f": 1,
+}
+SIX_TERMS = {**STUDENT, "year1_term1": 2.5, "year1_term2": 2.2, "year2_term1": 2.1,
+             "year2_term2": 2.4, "year3_term1": 2.0, "year3_term2": 1.9}
+
+
+@pytest.fixture(scope="module", autouse=True)
+def executors(models):
+    start_executors()
+    yield
+    shutdown_executors()
+
+
+def simulate(payload):
+    async def post():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+            return await client.post("/api/v1/simulate-trajectory", json=payload)
+
+    return asyncio.run(post())
+
+
+@pytest.mark.parametrize("student,horizon", [(STUDENT, 10), (SIX_TERMS, 4)])
+def test_default_paths_fit_the_budget(student, horizon):
+    response = simulate({**student, "seed": 1})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["n_paths"] == min(DEFAULT_PATHS, settings.SIMULATION_MAX_ROWS // horizon)
+    assert len(body["terms"]) == horizon
+
+
+def test_explicit_paths_within_budget_are_used_as_is():
+    response = simulate({**STUDENT, "n_paths": settings.SIMULATION_MAX_ROWS // 10, "seed": 1})
+    assert response.status_code == 200
+    assert response.json()["n_paths"] == settings.SIMULATION_MAX_ROWS // 10
+
+
+def test_explicit_paths_over_budget_are_rejected():
+    max_paths = settings.SIMULATION_MAX_ROWS // 10
+    response = simulate({**STUDENT, "n_paths": max_paths + 1})
+    assert response.status_code == 422
+    assert f"at most {max_paths} paths" in response.json()["detail"]
+    # เทอมที่เหลือน้อยกว่า: จำนวนเดิมพอดีกับ budget
+    assert simulate({**SIX_TERMS, "n_paths": max_paths + 1, "seed": 1}).status_code == 200
+
+
+def test_unlimited_rows(models):
+    result = simulate_trajectories(models, FeatureEngineer(), term_gpas=[], max_rows=0, seed=1, **STUDENT)
+    assert result["n_paths"] == DEFAULT_PATHS
+    with pytest.raises(SimulationTooLarge):
+        simulate_trajectories(models, FeatureEngineer(), term_gpas=[], n_paths=101, max_rows=1000, **STUDENT)
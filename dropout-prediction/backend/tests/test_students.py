@@ -0,0 +1,212 @@
+"""
+StudentService: การเพิ่มเกรด/ทำนายใหม่พร้อมกันจากหลาย process (worker ของ pre-fork server) ต้องไม่เขียนทับกัน
+"""
+
+import multiprocessing
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core import cohort_stats
+from app.core.batch_scoring import score_dataframe_columns
+from app.core.student_store import TERM_COLUMNS, StudentStore
+from app.core.students import StudentService
+
+N_STUDENTS = 300
+ROUNDS = 5
+
+
+def roster(n: int = N_STUDENTS, n_terms: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "student_id": [f"S{i:04d}" for i in range(n)],
+        "faculty": rng.choice(["วิศวกรรมศาสตร์", "บริหารธุรกิจ"], n),
+        "gender": rng.choice(["ชาย", "หญิง"], n),
+        "gpax": rng.uniform(1.5, 3.5, n).round(2),
+        "count_f": rng.integers(0, 3, n),
+    })
+    for j, col in enumerate(TERM_COLUMNS):
+        df[col] = rng.uniform(1.0, 4.0, n).round(2) if j < n_terms else np.nan
+    return df
+
+
+@pytest.fixture
+def service(models, tmp_path):
+    service = StudentService(StudentStore(str(tmp_path / "students.db")), models)
+    yield service
+    service.store.close()
+
+
+def _append_rounds(db_path: str, predictor, gpa: float, barrier):
+    service = StudentService(StudentStore(db_path), predictor)
+    ids = [f"S{i:04d}" for i in range(N_STUDENTS)]
+    for _ in range(ROUNDS):
+        barrier.wait()
+        service.append_term([{"student_id": sid, "gpa": gpa} for sid in ids])
+    service.store.close()
+
+
+def test_concurrent_appends_from_two_processes(service, models):
+    service.register(roster())
+    service.store.close()
+
+    # fork เหมือน worker ของ app.serve: ได้ model จาก parent, เปิด connection ของตัวเอง
+    context = multiprocessing.get_context("fork")
+    barrier = context.Barrier(2)
+    workers = [
+        context.Process(target=_append_rounds, args=(str(service.store.db_path), models, gpa, barrier))
+        for gpa in (1.0, 3.0)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=120)
+        assert worker.exitcode == 0
+
+    students = service.store.load()
+    terms = students[TERM_COLUMNS].to_numpy()
+    # ไม่มีเกรดหาย: ทุกคนได้ 5 เทอมจากแต่ละ process รวม 10 เทอม
+    assert (students["num_terms"] == 2 * ROUNDS).all()
+    assert ((terms == 1.0).sum(axis=1) == ROUNDS).all()
+    assert ((terms == 3.0).sum(axis=1) == ROUNDS).all()
+    assert (students["version"] == 1 + 2 * ROUNDS).all()
+    assert_predictions_current(service, students)
+
+
+def assert_predictions_current(service: StudentService, students: pd.DataFrame):
+    """ผลทำนายใน store ต้องเท่ากับการทำนายใหม่จากข้อมูลนักศึกษาล่าสุด"""
+    expected, _ = score_dataframe_columns(students, service.predictor, service.feature_engineer)
+    for i, sid in enumerate(students["student_id"]):
+        stored = service.store.get(sid)["prediction"]
+        assert stored["probability"] == expected["dropout_probability"][i], sid
+        assert stored["num_terms"] == students["num_terms"][i]
+
+
+def interleave_append(monkeypatch, service: StudentService, other: StudentService, gpa: float):
+    """ให้ other เพิ่มเกรด gpa หลังจากที่ service อ่านนักศึกษาไปแล้วครั้งแรก (ก่อน service บันทึก)"""
+    load = service.store.load
+    calls = []
+
+    def load_then_interleave(student_ids=None):
+        students = load(student_ids)
+        if not calls:
+            other.append_term([{"student_id": sid, "gpa": gpa} for sid in students["student_id"]])
+        calls.append(student_ids)
+        return students
+
+    monkeypatch.setattr(service.store, "load", load_then_interleave)
+    return calls
+
+
+def test_append_retries_students_written_in_between(service, monkeypatch):
+    service.register(roster(n=20, n_terms=2))
+    other = StudentService(StudentStore(str(service.store.db_path)), service.predictor)
+    calls = interleave_append(monkeypatch, service, other, gpa=1.0)
+
+    result = service.append_term([{"student_id": f"S{i:04d}", "gpa": 3.0} for i in range(20)])
+
+    assert result["appended"] == 20
+    assert len(calls) == 2 and len(calls[1]) == 20
+    students = other.store.load()
+    assert (students["num_terms"] == 4).all()
+    assert (students["year2_term1"] == 1.0).all() and (students["year2_term2"] == 3.0).all()
+    assert_predictions_current(service, students)
+    other.store.close()
+
+
+def test_rescore_does_not_overwrite_newer_append(service, monkeypatch):
+    service.register(roster(n=20, n_terms=2))
+    other = StudentService(StudentStore(str(service.store.db_path)), service.predictor)
+    calls = interleave_append(monkeypatch, service, other, gpa=0.5)
+
+    result = service.rescore()
+
+    assert result["rescored"] == 20
+    assert len(calls) == 2 and sorted(calls[1]) == [f"S{i:04d}" for i in range(20)]
+    students = other.store.load()
+    assert (students["num_terms"] == 3).all()
+    assert_predictions_current(service, students)
+    other.store.close()
+
+
+
+def cohort_table(conn: sqlite3.Connection):
+    rows = conn.execute(
+        "SELECT faculty, gender, num_terms, risk_level, bucket, students, probability_sum, gpax_sum, "
+        "gpax_count, predicted_dropout FROM cohort_stats WHERE students != 0 ORDER BY 1, 2, 3, 4, 5"
+    ).fetchall()
+    return [(*row[:6], round(row[6], 9), round(row[7], 9), *row[8:]) for row in rows]
+
+
+def assert_cohort_stats_match_recompute(service: StudentService):
+    """ตารางสรุปที่ปรับทีละส่วนต้องเท่ากับการคำนวณใหม่จากทุกแถว (rebuild แล้ว rollback)"""
+    conn = sqlite3.connect(str(service.store.db_path), isolation_level=None)
+    try:
+        incremental = cohort_table(conn)
+        conn.execute("BEGIN")
+        cohort_stats.rebuild(conn)
+        recomputed = cohort_table(conn)
+        conn.execute("ROLLBACK")
+    finally:
+        conn.close()
+    assert incremental == recomputed
+    assert sum(row[5] for row in incremental) == service.store.stats()["predictions"]
+
+
+def test_cohort_stats_follow_every_write(service):
+    df = roster(n_terms=1)
+    service.register(df)
+    assert_cohort_stats_match_recompute(service)
+
+    # แทนที่นักศึกษาบางคน: ย้ายคณะ/เพศ เปลี่ยน gpax (ย้ายกลุ่มและช่อง histogram)
+    changed = df.iloc[:100].copy()
+    changed["faculty"] = np.where(changed["faculty"] == "วิศวกรรมศาสตร์", "คณะที่ไม่รู้จัก", "วิศวกรรมศาสตร์")
+    changed["gender"] = np.where(changed["gender"] == "ชาย", "หญิง", "ชาย")
+    changed["gpax"] = (changed["gpax"] - 1.0).clip(lower=0)
+    changed.loc[changed.index[:10], "gpax"] = np.nan
+    service.register(changed)
+    assert_cohort_stats_match_recompute(service)
+
+    service.append_term([{"student_id": f"S{i:04d}", "gpa": 0.5 + (i % 7) / 2} for i in range(0, N_STUDENTS, 3)])
+    assert_cohort_stats_match_recompute(service)
+
+    service.rescore()
+    assert_cohort_stats_match_recompute(service)
+
+    result = service.cohort(["faculty", "num_terms"])
+    assert result["students"] == N_STUDENTS
+    assert {g["faculty"] for g in result["groups"]} <= {"วิศวกรรมศาสตร์", "บริหารธุรกิจ", cohort_stats.OTHER_FACULTY}
+
+
+def tied_roster(n: int = 120) -> pd.DataFrame:
+    """นักศึกษาส่วนใหญ่มีข้อมูลเหมือนกันเป็นกลุ่ม: ความน่าจะเป็นเท่ากันหลายสิบคน"""
+    df = roster(n=n, n_terms=2)
+    for start, stop in ((0, 40), (40, 75), (75, 90)):
+        df.iloc[start:stop, 1:] = df.iloc[start, 1:].to_numpy()
+    # student_id ไม่เรียงตามกลุ่ม: แถวที่เสมอกันกระจายอยู่ทั่ว index
+    df["student_id"] = [f"S{(i * 37) % n:04d}" for i in range(n)]
+    return df
+
+
+@pytest.mark.parametrize("limit", [1, 7, 40])
+@pytest.mark.parametrize("filters", [{}, {"faculty": "วิศวกรรมศาสตร์"}, {"num_terms": 2, "risk_level": "High"}])
+def test_ranking_pages_have_no_duplicates_or_gaps(service, limit, filters):
+    service.register(tied_roster())
+    everyone = service.store.ranking(10 ** 6, filters)
+    probabilities = [row["probability"] for row in everyone]
+    assert len(set(probabilities)) < len(probabilities)
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        page = service.ranking(limit, filters, cursor)
+        assert len(page["students"]) <= limit
+        seen.extend((s["dropout_probability"], s["student_id"]) for s in page["students"])
+        cursor = page["next_cursor"]
+        pages += 1
+        if cursor is None:
+            break
+    assert seen == [(row["probability"], row["student_id"]) for row in everyone]
+    assert len(set(seen)) == len(seen)
+    assert pages == max(1, -(-len(everyone) // limit))
@@ -0,0 +1,109 @@
+"""
+TreeEnsemble (MODEL_BACKEND=native) ต้องให้ความน่าจะเป็นเท่ากับ XGBClassifier.predict_proba
+ทั้งแบบทั่วไปและแบบ specialize (แทนค่า feature ที่คงที่ล่วงหน้า)
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.models.tree_engine import TreeEnsemble
+
+xgb = pytest.importorskip("xgboost")
+
+TOLERANCE = 1e-6
+FEATURES = ["OLD_GPA_M6", "FAC_ENCODED", "COUNT_F", "TERM1", "TERM2", "TERM3", "avg_gpa_up_to_now"]
+
+
+def training_data(n_rows: int = 3000, seed: int = 0):
+    """ข้อมูลคล้ายนักศึกษา: TERM2/TERM3 เป็น NaN สำหรับคนที่ยังเรียนไม่ถึงเทอมนั้น และมี NaN กระจายทั่วไป"""
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame({
+        "OLD_GPA_M6": rng.uniform(1.5, 4.0, n_rows),
+        "FAC_ENCODED": rng.integers(0, 8, n_rows).astype(float),
+        "COUNT_F": rng.poisson(0.8, n_rows).astype(float),
+        "TERM1": rng.uniform(0.0, 4.0, n_rows),
+        "TERM2": rng.uniform(0.0, 4.0, n_rows),
+        "TERM3": rng.uniform(0.0, 4.0, n_rows),
+    })
+    n_terms = rng.integers(1, 4, n_rows)
+    X.loc[n_terms < 2, "TERM2"] = np.nan
+    X.loc[n_terms < 3, "TERM3"] = np.nan
+    X.loc[rng.random(n_rows) < 0.05, "OLD_GPA_M6"] = np.nan
+    X["avg_gpa_up_to_now"] = X[["TERM1", "TERM2", "TERM3"]].mean(axis=1)
+    logit = 2.5 - 1.2 * X["avg_gpa_up_to_now"] + 0.6 * X["COUNT_F"] - 0.3 * X["OLD_GPA_M6"].fillna(2.5)
+    y = (rng.random(n_rows) < 1.0 / (1.0 + np.exp(-logit))).astype(int)
+    return X[FEATURES], y
+
+
+@pytest.fixture(scope="module", params=[3, 5], ids=["depth3", "depth5"])
+def fitted(request, tmp_path_factory):
+    X, y = training_data()
+    clf = xgb.XGBClassifier(n_estimators=60, max_depth=request.param, learning_rate=0.2, n_jobs=1)
+    clf.fit(X, y)
+    path = tmp_path_factory.mktemp("xgb") / f"model_depth{request.param}.json"
+    clf.save_model(str(path))
+    return clf, TreeEnsemble.from_json(path)
+
+
+def test_predict_proba_matches_xgboost(fitted):
+    clf, engine = fitted
+    X, _ = training_data(n_rows=2000, seed=1)
+    # แถวที่ทุก feature ว่าง และค่าที่ตรงกับ threshold พอดี
+    X.loc[0] = np.nan
+    X.loc[1, "TERM1"] = float(engine.threshold[engine.feature == FEATURES.index("TERM1")][0])
+
+    expected = clf.predict_proba(X)
+    actual = engine.predict_proba(X.to_numpy(dtype=np.float64))
+
+    assert engine.feature_names == FEATURES
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=TOLERANCE)
+    assert (engine.predict(X.to_numpy()) == clf.predict(X)).all()
+
+
+@pytest.mark.parametrize("fixed_columns", [
+    ["OLD_GPA_M6", "FAC_ENCODED", "COUNT_F", "TERM1"],
+    ["OLD_GPA_M6", "FAC_ENCODED", "COUNT_F", "TERM1", "TERM2", "TERM3"],
+])
+def test_specialized_matches_xgboost(fitted, fixed_columns):
+    clf, engine = fitted
+    X, _ = training_data(n_rows=500, seed=2)
+    for student in (0, 1, 2):
+        # แถวที่ค่าคงที่เหมือนนักศึกษาคนเดียว ส่วนคอลัมน์ที่เหลือต่างกันไป (เช่น ผลของ simulation)
+        rows = X.copy()
+        for col in fixed_columns:
+            rows[col] = X[col].iloc[student]
+        if student == 2:
+            # เทอมที่ยังไม่มีเกรด: ทั้งแบบค่าคงที่ (NaN ทุกแถว) และแบบว่างบางแถว
+            rows["TERM3"] = np.nan
+            if "TERM2" not in fixed_columns:
+                rows.loc[rows.index[::3], "TERM2"] = np.nan
+        fixed = {FEATURES.index(col): rows[col].iloc[0] for col in fixed_columns}
+        specialized = engine.specialize(fixed)
+
+        expected = clf.predict_proba(rows)[:, 1]
+        actual = specialized.predict_proba_columns([rows[col].to_numpy() for col in FEATURES])
+
+        assert specialized.num_trees <= engine.num_trees
+        np.testing.assert_allclose(actual, expected, rtol=0, atol=TOLERANCE)
+
+
+@pytest.mark.parametrize("term", ["term1", "term2", "term3"])
+def test_shipped_models_match_xgboost(term):
+    """model จริงใน MODEL_DIR: ความน่าจะเป็นต่างไม่เกิน TOLERANCE และไม่มี label ที่พลิก"""
+    from app.models.ml_model import predictor
+
+    path = predictor.model_path(term)
+    if not path.exists():
+        pytest.skip(f"{path} not available")
+    clf = xgb.XGBClassifier()
+    clf.load_model(str(path))
+    engine = TreeEnsemble.from_json(path)
+
+    rng = np.random.default_rng(3)
+    X = rng.uniform(0.0, 4.0, (5000, engine.num_features))
+    X[rng.random(X.shape) < 0.1] = np.nan
+
+    expected = clf.predict_proba(X)
+    np.testing.assert_allclose(engine.predict_proba(X), expected, rtol=0, atol=TOLERANCE)
+    assert (engine.predict(X) == clf.predict(X)).all()